@@ -1,7 +1,20 @@
-from flask import Flask
+from flask import Flask, Request
 from flask_mail import Mail
 from cvp.model.ocr_model import OCR_Model
+from cvp.model.ocr_cache import OCRCache
+from cvp.model.ocr_backend import create_backend
+from cvp.model.templates import default_registry
+from cvp.app.services.job_queue import JobQueue
+from cvp.app.services.hashing import HashingService
+from cvp.app.services.verdict_cache import VerdictCache
+from cvp.app.services.chain_writer import ChainWriter
+from cvp.data.merkle import MerkleTree, merkle_path
+from cvp.data.history_log import HistoryLog
+from cvp.data.rel_database import HISTORY_LOG_PATH, HISTORY_LOG_TSV_PATH, get_pool
+from cvp.features.preflight import DuplicateDetector
+from cvp.features.transform import DEFAULT_ITERATIONS
 from dotenv import load_dotenv
+import io
 import os
 
 load_dotenv()
@@ -11,16 +24,44 @@ db_path = 'dataset/external/cvp.db'
 cdc_db_path = 'dataset/external/cdc.db'
 account_table = 'account'
 profile_table = 'profile'
+DB_POOL_SIZE = 8  # idle connections kept by database
+DB_IDLE_TIMEOUT = 300  # seconds an idle connection is kept
+DB_CACHED_STATEMENTS = 128  # prepared statements cached by connection
+DB_PROFILE = 'read_heavy'  # pragmas of the connections, see cvp.data.rel_database.PRAGMA_PROFILES
 
 # AWS S3 bucket
 bucket_name = 'covapass-photo'
 profile_bucket = 'profile_photo/'
 
+# Uploads
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # bytes, larger requests are rejected with 413 before being read
+
+# Password hashes, calibrate with `python cvp/features/transform.py --target <seconds>`
+PASSWORD_ITERATIONS = int(os.environ.get('password_iterations', DEFAULT_ITERATIONS))
+
+# OCR jobs
+OCR_WORKERS = 4  # cards read at once
+OCR_MAX_PENDING = 32  # cards waiting or being read, registrations are refused beyond
+OCR_TIMEOUT = 60  # seconds to read a card
+
+# Merkle tree of the profile chain, its root is signed with this key
+MERKLE_KEY = os.environ.get('merkle_key', os.environ['secret_key']).encode('utf-8')
+
+
+class InMemoryRequest(Request):
+    """Request keeping uploaded files in memory instead of spooling large ones to temporary files.
+    MAX_CONTENT_LENGTH bounds the memory used per request."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
+
 
 def create_app():
     app = Flask(__name__, template_folder='cvp/app/templates')
+    app.request_class = InMemoryRequest
     app.config['DEBUG'] = True
     app.config['TESTING'] = False
+    app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_SIZE
     app.secret_key = os.environ['secret_key']
     return app
 
@@ -34,12 +75,32 @@ def set_mail():
 
 
 app = create_app()
-model = OCR_Model()
+for path in (db_path, cdc_db_path):
+    get_pool(path, size=DB_POOL_SIZE, idle_timeout=DB_IDLE_TIMEOUT, cached_statements=DB_CACHED_STATEMENTS,
+             profile=DB_PROFILE)
+model = OCR_Model(cache=OCRCache(), backend=create_backend(), preprocess=True, templates=default_registry())
+ocr_jobs = JobQueue(max_workers=OCR_WORKERS, max_pending=OCR_MAX_PENDING, timeout=OCR_TIMEOUT)
+duplicate_uploads = DuplicateDetector()
+hashing = HashingService()  # PBKDF2 off the web workers, the processes start on first use
+verdicts = VerdictCache()  # tamper verdicts of get_profile
+merkle_tree = MerkleTree(merkle_path(db_path))
+history_log = HistoryLog(HISTORY_LOG_PATH)
+# Only writer of the profile chain, registrations from every web worker are appended in order
+chain_writer = ChainWriter(db_path, history_log, merkle_tree, hash_block=hashing.generate_block_hash)
 set_mail()
 mail = Mail(app)
 
 
+def startup():
+    """ Bring the side stores of the chain up to date, before serving """
+    if os.path.exists(db_path):
+        merkle_tree.sync(db_path)  # catch up with the profiles added without the tree
+    if os.path.exists(HISTORY_LOG_TSV_PATH):
+        history_log.migrate(HISTORY_LOG_TSV_PATH)  # profiles logged before the log moved to SQLite
+
+
 if __name__ == '__main__':
     from cvp.app.routes import *
+    startup()
     app.run(debug=True, port=5000, host='0.0.0.0')
 
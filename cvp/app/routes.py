@@ -1,12 +1,16 @@
 """Covid-19 Vaccine Passport Application"""
 
-from flask import render_template, request, redirect, url_for, session
+from flask import render_template, request, redirect, url_for, session, jsonify
 from werkzeug.utils import secure_filename
 from cvp.features.transform import generate_QR_code
 from cvp.app.services.email_service import *
 from cvp.app.utils import *
 from datetime import datetime
-from app import app
+import concurrent.futures
+from cvp.app.services.job_queue import QueueFull, DONE, FAILED, TIMED_OUT
+from cvp.app.services.chain_writer import DuplicateAccount
+from cvp.features.preflight import PreflightError
+from app import app, MAX_UPLOAD_SIZE, ocr_jobs
 
 
 @app.route('/', methods=['GET', 'POST'])
@@ -37,7 +41,7 @@ def register():
         (2)continue button is clicked in uploading_of_document.html
         (3)confirm button is clicked in create_account.html.
     :return: (1)uploading_of_document.html
-        (2)create_account page with user information of OCRed text if no error
+        (2)processing_document.html polling the OCR job of the uploaded card if no error
             else uploading_of_document.html with error message.
         (3)success_welcome.html if registered successfully else Error message (page).
     """
@@ -51,31 +55,32 @@ def register():
                 error_msg = 'file is not uploaded.'
 
             if not error_msg:
-                uploads_dir = 'dataset/processed/upload_vaccine_record'
-
-                # Create a new directory for the upload
-                os.makedirs(uploads_dir, exist_ok=True)
                 os.makedirs(PROFILE_IMAGE_PATH, exist_ok=True)
                 error_msg = invalid_register_input(email, password, confirm_password)
 
                 if not error_msg:  # no error in entered information
                     vaccine_rec_pic = request.files["vaccine_rec"]
-                    filename = secure_filename(vaccine_rec_pic.filename)
                     profile_pic = request.files["profile_pic"]
 
-                    # Save file(s) to local folder
+                    # OCR the uploaded card in the background, straight from memory
+                    job_id = None
                     if vaccine_rec_pic:
-                        vaccine_rec_pic.save(os.path.join(uploads_dir, filename))
-                        extracted_rec = model.predict(filename, folder_path=uploads_dir)
-
-                        # Remove File after OCR returned the prediction
-                        os.remove(os.path.join(uploads_dir, filename))
-                    else:
-                        extracted_rec = None
+                        try:
+                            job_id = submit_ocr(vaccine_rec_pic.stream.read(), email)
+                        except PreflightError as err:  # answered before any OCR
+                            session['message'] = None
+                            return render_template("uploading_of_document.html", invalid_input=str(err),
+                                                   email=email)
+                        except QueueFull:
+                            session['message'] = None
+                            error_msg = 'Too many registrations in progress. Please try again in a minute.'
+                            return render_template("uploading_of_document.html", invalid_input=error_msg,
+                                                   email=email), 503
 
                     session['email'] = email
                     session['password'] = password
-                    session['extracted_record'] = extracted_rec
+                    session['extracted_record'] = None
+                    session['ocr_job'] = job_id
 
                     # Get photo name and convert it into type .png
                     if profile_pic:
@@ -88,6 +93,8 @@ def register():
 
                     session['profile_photo'] = pic_name
 
+                    if job_id:
+                        return render_template('processing_document.html', job_id=job_id)
                     return render_template('create_account.html', info=f'Welcome', profpic='profile_pic/' + pic_name)
 
             # error found in entered information
@@ -103,7 +110,14 @@ def register():
 
             if valid_rec:  # send confirmed account information to database and record them.
                 # insert this data to db
-                new_id = generate_account(session, confirmed_data)
+                try:
+                    new_id = generate_account(session, confirmed_data)
+                except DuplicateAccount:
+                    session['message'] = 'An account with this email already exists!'
+                    return redirect(url_for('login'))
+                except concurrent.futures.TimeoutError:  # the chain writer did not take the registration in time
+                    session['message'] = 'Server is busy, please try again.'
+                    return render_template('create_account.html', profpic='profile_pic/' + session['profile_photo'])
 
                 # Upload profile photo to AWS S3 Bucket
                 profile_photo = session['profile_photo']
@@ -125,6 +139,51 @@ def register():
     return render_template("uploading_of_document.html")
 
 
+@app.route('/register/status/<job_id>')
+def register_status(job_id):
+    """
+    Invoked by processing_document.html to poll the OCR job of the uploaded card.
+    :return: json with the status of the job ('pending', 'running', 'done', 'failed' or 'timeout'), 404 if the job
+        is not the one of this session or has expired.
+    """
+    status = ocr_jobs.status(job_id) if session.get('ocr_job') == job_id else None
+    if status is None:
+        return jsonify({'status': None}), 404
+    return jsonify({'status': status['status']})
+
+
+@app.route('/register/review')
+def register_review():
+    """
+    Invoked by processing_document.html once the OCR job of the uploaded card is over.
+    :return: create_account.html with user information of OCRed text if the job is done,
+        processing_document.html if it is still running, else uploading_of_document.html with error message.
+    """
+    job_id = session.get('ocr_job')
+    status = ocr_jobs.status(job_id) if job_id else None
+    if status is not None and status['status'] == DONE:
+        session['extracted_record'] = status['result']
+        return render_template('create_account.html', info=f'Welcome',
+                               profpic='profile_pic/' + session['profile_photo'])
+    if status is not None and status['status'] not in (FAILED, TIMED_OUT):
+        return render_template('processing_document.html', job_id=job_id)
+
+    session['message'] = None
+    error_msg = 'Could not read the vaccine card. Please upload it again.'
+    return render_template("uploading_of_document.html", invalid_input=error_msg, email=session.get('email'))
+
+
+@app.errorhandler(413)
+def upload_too_large(error):
+    """
+    Invoked when a request is larger than MAX_UPLOAD_SIZE, before its body is read.
+    :return: uploading_of_document.html with error message.
+    """
+    session['message'] = None
+    error_msg = f'File is too large. Maximum upload size is {MAX_UPLOAD_SIZE // (1024 * 1024)} MB.'
+    return render_template("uploading_of_document.html", invalid_input=error_msg), 413
+
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     """
@@ -390,3 +449,20 @@ def shared_profile(token):
     # obtain user record
     user_record, is_tampered = get_profile(account_id)
     return render_template('shared_profile.html', user_record=user_record, tampered=is_tampered)
+
+
+@app.route('/info_<token>/proof', methods=['GET'])
+def shared_profile_proof(token):
+    """
+    Invoked by verifiers of a shared link.
+    :param token: encrypted url for sharing info.
+    :return: json of the profile record, its Merkle inclusion proof and the signed root of the chain.
+    """
+    account_id = decode_token(token, salt=os.environ['sharing_profile_key'], time=900)
+    if not account_id:  # link has expried
+        return jsonify({'proof': None}), 404
+
+    inclusion_proof = get_inclusion_proof(account_id)
+    if inclusion_proof is None:
+        return jsonify({'proof': None}), 404
+    return jsonify(inclusion_proof)
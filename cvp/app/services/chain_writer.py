@@ -0,0 +1,295 @@
+"""Chain Writer
+
+Chain writer service module currently contains ChainWriter class and the following exception:
+- DuplicateAccount
+
+Every new profile chains to the Block_Hash of the previous one, so the profiles must be appended one after the
+other. The writer is the only one appending to the chain: registrations are queued and a single thread takes them
+in order, assigns each its User_Account_ID and the hash of its predecessor, and commits the blocks taken together
+in one transaction (group commit). The web workers only wait for their block, they can run in any number.
+
+A batch is hashed before its transaction, after the last block read without a lock, so SQLite's write lock is only
+held to check that the last block and the emails are still the same and to insert the rows: a few indexed lookups
+and inserts per block, milliseconds for MAX_BATCH blocks, whatever hash_block costs, well under the busy_timeout of
+the profile readers (see cvp.data.rel_database.PRAGMA_PROFILES). If something else appended meanwhile, the batch is
+hashed again after the new last block, so the chain never forks. Once committed, a block is registered whatever
+happens to the history log and the Merkle tree, which are separate files: a failure there is logged and the
+tree catches up with the chain on the next batch. The connection has the write_heavy pragma profile,
+the WAL journal lets the profile readers go on during the transaction.
+
+USAGE
+-----
+
+>>> from cvp.app.services.chain_writer import ChainWriter
+>>> chain_writer = ChainWriter(db_path, history_log, merkle_tree)
+>>> account_id = chain_writer.append(email, password_hash, salt, username, profile)
+
+"""
+
+# Standard Dist
+import coloredlogs
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from base64 import b64encode
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+# Third Party Imports
+
+# Project Level Imports
+from cvp.data.rel_database import apply_profile
+from cvp.features.transform import generate_block_hash
+
+logger = logging.getLogger(__name__)
+coloredlogs.install(level=logging.DEBUG, logger=logger)
+
+MAX_BATCH = 32  # blocks committed by one transaction
+TIMEOUT = 60.0  # seconds append waits for its block
+BUSY_TIMEOUT = 30.0  # seconds a transaction waits for SQLite's write lock
+RETRIES = 3  # times a batch is hashed again when the chain changed while it was hashed
+
+
+class DuplicateAccount(ValueError):
+    """ Raised by ChainWriter.append for an email that already has an account """
+
+
+class ChainWriter(object):
+    """ Single writer appending the registrations to the profile chain, in order and in batches """
+
+    def __init__(self, db_path: str, history_log=None, merkle_tree=None, hash_block=None, max_batch: int = None,
+                 hash_0: str = None):
+        """
+        Args:
+            db_path (str): path to the cvp database
+            history_log (cvp.data.history_log.HistoryLog): log the hashes of the blocks are appended to
+            merkle_tree (cvp.data.merkle.MerkleTree): tree the blocks are appended to
+            hash_block (callable): function hashing the items of a block with a salt. Default is
+                cvp.features.transform.generate_block_hash
+            max_batch (int): blocks committed by one transaction
+            hash_0 (str): hash preceding the first profile. Default is the hash_0 environment variable
+        """
+        self.db_path = db_path
+        self.history_log = history_log
+        self.merkle_tree = merkle_tree
+        self.hash_block = hash_block or generate_block_hash
+        self.max_batch = max_batch or MAX_BATCH
+        self.hash_0 = hash_0
+
+        self.requests = queue.Queue()
+        self.lock = threading.Lock()
+        self.__thread = None
+
+        self.blocks = 0
+        self.batches = 0
+        self.max_batch_size = 0
+
+    def submit(self, email: str, password_hash: str, salt: bytes, username: str, profile: list):
+        """ Queue a registration
+        Args:
+            email (str): email of the account
+            password_hash (str): encoded password hash of the account
+            salt (bytes): salt of the account, also salting the block hash
+            username (str): name of the account
+            profile (list): profile values after User_Account_ID and before Block_Hash, in column order
+        Returns:
+            future (concurrent.futures.Future): User_Account_ID assigned to the profile, or the error
+        """
+        future = Future()
+        self.requests.put((future, (email, password_hash, salt, username, list(profile))))
+        self.__start()
+        return future
+
+    def append(self, email: str, password_hash: str, salt: bytes, username: str, profile: list,
+               timeout: float = None):
+        """ Same as submit, waiting for the block to be committed
+        Returns:
+            account_id (int): User_Account_ID assigned to the profile
+        Raises:
+            DuplicateAccount: the email already has an account
+            concurrent.futures.TimeoutError: the writer did not take the registration in time, it is not registered
+        """
+        future = self.submit(email, password_hash, salt, username, profile)
+        try:
+            return future.result(timeout=timeout or TIMEOUT)
+        except FutureTimeoutError:
+            if future.cancel():  # still queued, the writer skips it
+                raise
+            return future.result()  # taken by the writer, it may commit so wait for the outcome of its batch
+
+    @property
+    def stats(self):
+        """ blocks and batches committed, largest batch and registrations waiting """
+        with self.lock:
+            return {
+                'blocks': self.blocks,
+                'batches': self.batches,
+                'max_batch_size': self.max_batch_size,
+                'queue_depth': self.requests.qsize()
+            }
+
+    def shutdown(self, wait: bool = True):
+        """ Stop the writer after the registrations already queued """
+        with self.lock:
+            thread, self.__thread = self.__thread, None
+        if thread is not None:
+            self.requests.put(None)
+            if wait:
+                thread.join()
+
+    def __start(self):
+        """ Start the writer thread on first use, or after it crashed """
+        with self.lock:
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__run, name='chain-writer', daemon=True)
+                self.__thread.start()
+
+    def __run(self):
+        """ Take the queued registrations in batches and commit them, until shutdown """
+        conn = None
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            apply_profile(conn, 'write_heavy')
+            while True:
+                batch = [self.requests.get()]
+                # Whatever queued up while the previous batch was committed goes in this one
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(self.requests.get_nowait())
+                    except queue.Empty:
+                        break
+
+                stop = None in batch
+                # Registrations given up by append are skipped, the others cannot be cancelled from now on
+                batch = [request for request in batch
+                         if request is not None and request[0].set_running_or_notify_cancel()]
+                if batch:
+                    self.__commit(conn, batch)
+                if stop:
+                    return
+        except Exception as err:  # Ex: the database is locked while switching to WAL
+            logger.error(f'Chain writer stopped: {err}')
+            self.__fail(err)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def __fail(self, err):
+        """ Fail the queued registrations of a crashed writer, the next submit starts a new one """
+        with self.lock:
+            if self.__thread is threading.current_thread():
+                self.__thread = None
+        while True:
+            try:
+                request = self.requests.get_nowait()
+            except queue.Empty:
+                return
+            if request is not None and request[0].set_running_or_notify_cancel():
+                request[0].set_exception(err)
+
+    def __commit(self, conn, batch):
+        """ Append a batch of registrations to the chain in one transaction and resolve their futures """
+        blocks, duplicates = [], []
+        try:
+            for _ in range(RETRIES):
+                last = self.__last(conn)
+                blocks, duplicates = self.__chain(conn, batch, last)  # hashed without the write lock
+                if not blocks:
+                    break
+
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    if self.__last(conn) != last or self.__taken(conn, blocks):
+                        conn.execute('ROLLBACK')  # appended to while hashing, hash again after the new last block
+                        continue
+                    conn.executemany('INSERT INTO account VALUES (?, ?, ?, ?, ?)',
+                                     [account for _, account, _ in blocks])
+                    conn.executemany(f"INSERT INTO profile VALUES ({', '.join('?' * len(blocks[0][2]))})",
+                                     [profile for _, _, profile in blocks])
+                    conn.execute('COMMIT')
+                    break
+                except BaseException:
+                    conn.execute('ROLLBACK')
+                    raise
+            else:
+                raise RuntimeError(f'The chain changed while the batch was hashed, {RETRIES} times in a row')
+
+        except Exception as err:
+            logger.error(f'Could not append {len(batch)} registrations to the chain: {err}')
+            for future, _ in batch:
+                if not future.done():
+                    future.set_exception(err)
+            return
+
+        for future, email in duplicates:
+            future.set_exception(DuplicateAccount(f'{email} already has an account'))
+        if not blocks:
+            return
+
+        with self.lock:
+            self.blocks += len(blocks)
+            self.batches += 1
+            self.max_batch_size = max(self.max_batch_size, len(blocks))
+        self.__log([profile for _, _, profile in blocks])  # before the results, so they are found right away
+        for future, _, profile in blocks:
+            future.set_result(profile[0])
+        logger.debug(f'Appended {len(blocks)} blocks to the chain in one transaction')
+
+    def __log(self, profiles):
+        """ Append committed blocks to the history log and the Merkle tree, logging the failures """
+        if self.history_log is not None:
+            try:
+                self.history_log.extend([(profile[0], profile[-1]) for profile in profiles])
+            except ValueError:
+                # One of them is logged already, log the others one by one
+                for profile in profiles:
+                    try:
+                        self.history_log.append(profile[0], profile[-1])
+                    except ValueError as err:
+                        logger.error(f'Block {profile[0]} was committed but not logged: {err}')
+            except Exception as err:
+                logger.error(f'Blocks {[profile[0] for profile in profiles]} were committed but not logged: {err}')
+
+        if self.merkle_tree is not None:
+            try:
+                self.merkle_tree.sync(self.db_path)  # also appends the blocks a previous failure left out
+            except Exception as err:
+                logger.error(f'Could not append blocks to the Merkle tree: {err}')
+
+    def __last(self, conn):
+        """ User_Account_ID and Block_Hash of the last block, hash_0 precedes the first profile """
+        last = conn.execute('SELECT User_Account_ID, Block_Hash FROM profile '
+                            'WHERE User_Account_ID = (SELECT max(User_Account_ID) FROM profile)').fetchone()
+        return last or (0, self.hash_0 or os.environ['hash_0'])
+
+    @staticmethod
+    def __taken(conn, blocks):
+        """ Whether the email of one of the blocks got an account """
+        return any(conn.execute('SELECT 1 FROM account WHERE Email = ?', (account[0],)).fetchone()
+                   for _, account, _ in blocks)
+
+    def __chain(self, conn, batch, last):
+        """ Assign ids and previous hashes to a batch and hash its blocks, after the last block
+        Returns:
+            blocks (list): (future, account row, profile row) of the registrations to insert
+            duplicates (list): (future, email) of the registrations of an email which has an account
+        """
+        last_id, last_hash = last
+        blocks, duplicates, emails = [], [], set()
+        for future, (email, password_hash, salt, username, profile) in batch:
+            taken = conn.execute('SELECT 1 FROM account WHERE Email = ?', (email,)).fetchone()
+            if taken or email in emails:
+                duplicates.append((future, email))
+                continue
+
+            account_id = last_id + 1
+            items = [last_hash, account_id] + profile + [last_hash]
+            block_hash = self.hash_block(items, salt)
+
+            account = (email, password_hash, account_id, b64encode(salt).decode('utf-8'), username)
+            blocks.append((future, account, tuple([account_id] + profile + [block_hash])))
+            emails.add(email)
+            last_id, last_hash = account_id, block_hash
+
+        return blocks, duplicates
@@ -0,0 +1,119 @@
+"""Hashing Service
+
+Hashing service module currently contains HashingService class, which runs the PBKDF2 hashes of
+cvp.features.transform on a pool of processes sized to the cores:
+- generate_hash, generate_hash_async
+- generate_block_hash, generate_block_hash_async
+
+The pool is created on first use, so importing the app does not start processes. The processes are not forked
+from the app, which runs threads (web, OCR jobs, chain writer) that may hold the logging locks at that moment and
+leave them held forever in the child. They start from a fresh interpreter instead (forkserver, spawn where it is
+not available), which imports the main module without running its __main__ block.
+
+USAGE
+-----
+
+>>> from cvp.app.services.hashing import HashingService
+>>> hashing = HashingService()
+>>> password_hash, salt = hashing.generate_hash(password)
+>>> password_hash, salt = await hashing.generate_hash_async(password)
+>>> hashing.stats
+{'workers': 8, 'queue_depth': 0, 'max_queue_depth': 2, 'submitted': 12, 'completed': 12}
+
+"""
+
+# Standard Dist
+import asyncio
+import coloredlogs
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Third Party Imports
+
+# Project Level Imports
+from cvp.features.transform import generate_hash, generate_block_hash
+
+logger = logging.getLogger(__name__)
+coloredlogs.install(level=logging.DEBUG, logger=logger)
+
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+class HashingService(object):
+    """ Runs PBKDF2 hashes on a pool of processes, so they do not hold the web workers """
+
+    def __init__(self, max_workers: int = None):
+        """
+        Args:
+            max_workers (int): processes of the pool. Default is the number of cores
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.__executor = None
+        self.lock = threading.Lock()
+
+        self.__pending = set()  # futures of the hashes submitted and not finished yet
+        self.max_queue_depth = 0
+        self.submitted = 0
+
+    def generate_hash(self, password: str, salt: bytes = None, iterations: int = None):
+        """ Same as cvp.features.transform.generate_hash, run on the pool """
+        return self.__submit(generate_hash, password, salt, iterations).result()
+
+    async def generate_hash_async(self, password: str, salt: bytes = None, iterations: int = None):
+        """ Same as generate_hash without blocking the event loop """
+        return await asyncio.wrap_future(self.__submit(generate_hash, password, salt, iterations))
+
+    def generate_block_hash(self, items: list, salt: bytes):
+        """ Same as cvp.features.transform.generate_block_hash, run on the pool """
+        return self.__submit(generate_block_hash, items, salt).result()
+
+    async def generate_block_hash_async(self, items: list, salt: bytes):
+        """ Same as generate_block_hash without blocking the event loop """
+        return await asyncio.wrap_future(self.__submit(generate_block_hash, items, salt))
+
+    @property
+    def stats(self):
+        """ Metrics to size the pool
+        Returns:
+            stats (dict): workers, queue_depth (hashes waiting or running), max_queue_depth, submitted and
+                completed hashes
+        """
+        with self.lock:
+            queue_depth = self.__queue_depth()
+            return {
+                'workers': self.max_workers,
+                'queue_depth': queue_depth,
+                'max_queue_depth': self.max_queue_depth,
+                'submitted': self.submitted,
+                'completed': self.submitted - queue_depth
+            }
+
+    def shutdown(self, wait: bool = True):
+        """ Stop the processes of the pool, it is created again on next use """
+        with self.lock:
+            executor, self.__executor = self.__executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def __submit(self, fn, *args):
+        """ Submit a call to the pool, created on first use, and keep the metrics up to date """
+        with self.lock:
+            if self.__executor is None:
+                self.__executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                      mp_context=multiprocessing.get_context(START_METHOD))
+                logger.debug(f'Started a pool of {self.max_workers} hashing processes')
+
+            future = self.__executor.submit(fn, *args)
+            self.__pending.add(future)
+            self.submitted += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.__queue_depth())
+
+        return future
+
+    def __queue_depth(self):
+        """ Forget the finished futures and count the others, lock held """
+        self.__pending = {future for future in self.__pending if not future.done()}
+        return len(self.__pending)
@@ -0,0 +1,191 @@
+"""Job Queue
+
+Job Queue service module currently contains JobQueue class and the following exception:
+- QueueFull
+
+Jobs run in the process of the web app on a bounded pool of threads, no external broker is needed. A route submits
+a slow call (Ex: OCR of an uploaded card), answers right away with the job id, and the page polls the status of
+the job until its result is ready.
+
+USAGE
+-----
+
+>>> from cvp.app.services.job_queue import JobQueue
+>>> jobs = JobQueue(max_workers=4, max_pending=32, timeout=60)
+>>> job_id = jobs.submit(model.predict, content)
+>>> jobs.status(job_id)
+{'status': 'done', 'result': {...}, 'error': None}
+
+"""
+
+# Standard Dist
+import coloredlogs
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Third Party Imports
+
+# Project Level Imports
+
+logger = logging.getLogger(__name__)
+coloredlogs.install(level=logging.DEBUG, logger=logger)
+
+MAX_WORKERS = 4  # jobs running at once
+MAX_PENDING = 32  # jobs waiting or running, submit is refused beyond
+TIMEOUT = 60.0  # seconds a job may take from its submission
+TTL = 600.0  # seconds the status of a finished job is kept
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+TIMED_OUT = 'timeout'
+
+
+class QueueFull(Exception):
+    """ Raised by JobQueue.submit when max_pending jobs are already waiting or running """
+
+
+class Job(object):
+    """ State of a submitted job """
+
+    def __init__(self, job_id: str, timeout: float):
+        self.id = job_id
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.submitted = time.monotonic()
+        self.deadline = self.submitted + timeout
+        self.finished = None
+
+    def as_dict(self):
+        return {'status': self.status, 'result': self.result, 'error': self.error}
+
+
+class JobQueue(object):
+    """ Bounded in-process queue of jobs run by a pool of threads
+
+    Backpressure: submit raises QueueFull once max_pending jobs are waiting or running, instead of letting the
+    backlog grow without bound. Timeouts: a job not finished timeout seconds after its submission is reported as
+    timed out. A waiting job that timed out is never started. A running one cannot be interrupted, its result is
+    dropped and its worker stays counted as busy until the call returns.
+    """
+
+    def __init__(self, max_workers: int = None, max_pending: int = None, timeout: float = None, ttl: float = None):
+        """
+        Args:
+            max_workers (int): jobs running at once
+            max_pending (int): jobs waiting or running, submit is refused beyond
+            timeout (float): seconds a job may take from its submission
+            ttl (float): seconds the status of a finished job is kept
+        """
+        self.max_pending = max_pending or MAX_PENDING
+        self.timeout = timeout or TIMEOUT
+        self.ttl = ttl or TTL
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or MAX_WORKERS,
+                                           thread_name_prefix='job-queue')
+        self.jobs = dict()
+        self.in_flight = 0  # jobs submitted whose call has not returned yet
+        self.lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        """ Queue a call
+        Args:
+            fn (callable): function to call on a worker
+            *args: positional arguments of fn
+            **kwargs: keyword arguments of fn
+        Returns:
+            job_id (str): id to poll the status of the job with
+        Raises:
+            QueueFull: max_pending jobs are already waiting or running
+        """
+        with self.lock:
+            self.__prune()
+            if self.in_flight >= self.max_pending:
+                raise QueueFull(f'{self.in_flight} jobs are already waiting or running')
+
+            job = Job(uuid.uuid4().hex, self.timeout)
+            self.jobs[job.id] = job
+            self.in_flight += 1
+
+        self.executor.submit(self.__run, job, fn, args, kwargs)
+        logger.debug(f'Submitted job {job.id}')
+        return job.id
+
+    def status(self, job_id: str):
+        """ Get the status of a job
+        Args:
+            job_id (str): id returned by submit
+        Returns:
+            status (dict): status ('pending', 'running', 'done', 'failed' or 'timeout'), result of the call if
+                done and error message if failed or timed out. None if the job is unknown or expired
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+
+            self.__check_timeout(job)
+            return job.as_dict()
+
+    @property
+    def stats(self):
+        """ Number of jobs by status, and jobs waiting or running """
+        with self.lock:
+            counts = {status: 0 for status in (PENDING, RUNNING, DONE, FAILED, TIMED_OUT)}
+            for job in self.jobs.values():
+                self.__check_timeout(job)
+                counts[job.status] += 1
+            counts['in_flight'] = self.in_flight
+            return counts
+
+    def shutdown(self, wait: bool = True):
+        """ Stop the workers, after the submitted jobs if wait """
+        self.executor.shutdown(wait=wait)
+
+    def __run(self, job, fn, args, kwargs):
+        """ Call fn on a worker and record the outcome on the job """
+        try:
+            with self.lock:
+                self.__check_timeout(job)
+                if job.status == TIMED_OUT:  # waited too long, not worth starting
+                    return
+                job.status = RUNNING
+
+            try:
+                result, error = fn(*args, **kwargs), None
+            except Exception as err:
+                logger.warning(f'Job {job.id} failed: {err}')
+                result, error = None, str(err)
+
+            with self.lock:
+                self.__check_timeout(job)
+                if job.status == TIMED_OUT:
+                    return
+                job.status = DONE if error is None else FAILED
+                job.result, job.error = result, error
+                job.finished = time.monotonic()
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def __check_timeout(self, job):
+        """ Mark an unfinished job past its deadline as timed out, lock held """
+        if job.status in (PENDING, RUNNING) and time.monotonic() > job.deadline:
+            job.status = TIMED_OUT
+            job.error = f'Job did not finish within {self.timeout} seconds'
+            job.finished = time.monotonic()
+
+    def __prune(self):
+        """ Forget the jobs finished more than ttl seconds ago, lock held """
+        for job in self.jobs.values():
+            self.__check_timeout(job)
+
+        now = time.monotonic()
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.finished is not None and now - job.finished > self.ttl]
+        for job_id in expired:
+            del self.jobs[job_id]
@@ -0,0 +1,123 @@
+"""Verdict Cache
+
+Verdict cache service module currently contains VerdictCache class and the following functions:
+- fingerprint
+
+Verifying the block hash of a profile costs a PBKDF2 of 100000 iterations. The verdict is cached by
+(User_Account_ID, Block_Hash) along with a fingerprint of everything it was computed from: the profile row, the
+block hash of its predecessor, the salt of the account and the hash logged for it in the history log.
+A cached verdict is only served while the fingerprint still matches, so changing any of them invalidates it.
+
+USAGE
+-----
+
+>>> from cvp.app.services.verdict_cache import VerdictCache, fingerprint
+>>> verdicts = VerdictCache()
+>>> key = fingerprint(record, prev_hash, salt)
+>>> is_tampered = verdicts.get(account_id, block_hash, key)
+>>> verdicts.put(account_id, block_hash, key, is_tampered)
+
+"""
+
+# Standard Dist
+import coloredlogs
+import hashlib
+import logging
+import threading
+
+# Third Party Imports
+from cachetools import TTLCache
+
+# Project Level Imports
+
+logger = logging.getLogger(__name__)
+coloredlogs.install(level=logging.DEBUG, logger=logger)
+
+MAX_SIZE = 4096  # verdicts kept
+TTL = 3600  # seconds a verdict stays valid
+
+
+def fingerprint(*parts):
+    """Get a digest of the inputs of a verdict
+
+    Args:
+        *parts: values the verdict was computed from, Ex: profile row, previous block hash, salt
+
+    Returns:
+        fingerprint (str): hex SHA-256 of the parts
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(repr(part).encode())
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class VerdictCache(object):
+    """ Tamper verdicts of profiles by (User_Account_ID, Block_Hash), served while their inputs are unchanged """
+
+    def __init__(self, max_size: int = None, ttl: float = None):
+        """
+        Args:
+            max_size (int): verdicts kept, the least recently used are evicted beyond
+            ttl (float): seconds a verdict stays valid
+        """
+        self.verdicts = TTLCache(maxsize=max_size or MAX_SIZE, ttl=ttl or TTL)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, account_id, block_hash: str, key: str):
+        """ Get a verdict
+        Args:
+            account_id: User_Account_ID of the profile
+            block_hash (str): Block_Hash of the profile
+            key (str): fingerprint of the inputs of the verdict
+        Returns:
+            is_tampered (bool): None if not cached or computed from other inputs
+        """
+        with self.lock:
+            entry = self.verdicts.get((account_id, block_hash))
+            if entry is None or entry[0] != key:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return entry[1]
+
+    def put(self, account_id, block_hash: str, key: str, is_tampered: bool):
+        """ Cache a verdict
+        Args:
+            account_id: User_Account_ID of the profile
+            block_hash (str): Block_Hash of the profile
+            key (str): fingerprint of the inputs of the verdict
+            is_tampered (bool): verdict
+        """
+        with self.lock:
+            self.verdicts[(account_id, block_hash)] = (key, is_tampered)
+
+    def invalidate(self, account_id):
+        """ Drop the verdicts of a profile and of its successor, whose block hash chains to it
+        Args:
+            account_id (int): User_Account_ID of the profile that changed
+        """
+        with self.lock:
+            for cached_id, block_hash in list(self.verdicts.keys()):
+                if cached_id in (account_id, account_id + 1):
+                    self.verdicts.pop((cached_id, block_hash), None)
+
+    def clear(self):
+        with self.lock:
+            self.verdicts.clear()
+
+    @property
+    def stats(self):
+        """ hits, misses, hit_rate and number of verdicts cached """
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'size': len(self.verdicts)
+            }
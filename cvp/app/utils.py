@@ -1,11 +1,14 @@
 """Utilities for routes.py"""
 from app import *
-from cvp.data.rel_database import Database, HISTORY_LOG_PATH
-from cvp.features.transform import generate_hash
+from cvp.data.rel_database import Database
+from cvp.features.transform import generate_hash, generate_block_hash, encode_password_hash, decode_password_hash, \
+    needs_rehash
+from cvp.features.preflight import check_upload
+from cvp.app.services.job_queue import PENDING, RUNNING
+from cvp.app.services.verdict_cache import fingerprint
 import itsdangerous
 from itsdangerous import URLSafeTimedSerializer
 from base64 import b64decode, b64encode
-import pandas as pd
 import hmac
 import re
 import boto3
@@ -100,6 +103,29 @@ def get_file_ext(filename):
         return 'pdf'
 
 
+def submit_ocr(content: bytes, email: str):
+    """
+    Check an uploaded vaccine card and submit its OCR job. A near-duplicate of a card the same email uploaded
+    reuses the job of that card while it is still waiting or being read (Ex: a double submit). Once that job is
+    finished the card is read again, the user may be uploading a better photo to fix a bad read.
+    :param content: content of the uploaded file.
+    :param email: email registering, only the uploads of this email are compared.
+    :return: id of the OCR job, see JobQueue.status
+    :raises PreflightError: the file is not worth reading, its message can be shown to the user.
+    :raises QueueFull: too many cards are waiting to be read.
+    """
+    upload = check_upload(content)
+
+    job_id = duplicate_uploads.find(email, upload.dhash)
+    status = ocr_jobs.status(job_id) if job_id else None
+    if status is not None and status['status'] in (PENDING, RUNNING):
+        return job_id
+
+    job_id = ocr_jobs.submit(model.predict, content)
+    duplicate_uploads.add(email, upload.dhash, job_id)
+    return job_id
+
+
 def check_cdc(confirmed_data: dict, email: str, db_path: str = None) -> bool:
     """ Check if user's data is found in CDC Database to prevent fraud vaccine cards
 
@@ -122,7 +148,7 @@ def check_cdc(confirmed_data: dict, email: str, db_path: str = None) -> bool:
 
     db = Database(db_path)
     try:
-        acc = db.select('*', profile_table, f'Email = "{email}"')
+        acc = db.select_by('*', profile_table, {'Email': email})
         if not acc:
             return False  # Account was not found.
         acc_dict = {
@@ -168,9 +194,9 @@ def authenticate(password, email=None, account_id=None):
     db = Database(db_path)
     try:
         if email:
-            acc = db.select('*', account_table, f'Email = \"{email}\"')
+            acc = db.select_by('*', account_table, {'Email': email})
         elif account_id:
-            acc = db.select('*', account_table, f'User_Account_ID = \"{account_id}\"')
+            acc = db.select_by('*', account_table, {'User_Account_ID': account_id})
         else:
             acc = None
 
@@ -178,9 +204,15 @@ def authenticate(password, email=None, account_id=None):
             return 'Account was not found.'
         if acc:  # account with this email is in our database
             # handle incorrect input
-            db_password, db_salt = b64decode(acc[0][1]), b64decode(acc[0][3])
-            hashed_pass, _ = generate_hash(password=password, salt=db_salt)
+            iterations, db_password = decode_password_hash(acc[0][1])
+            db_salt = b64decode(acc[0][3])
+            hashed_pass, _ = hashing.generate_hash(password, db_salt, iterations)
             if hmac.compare_digest(hashed_pass, db_password):  # login
+                # rehash with the current parameters, the salt is kept since block hashes use it
+                if needs_rehash(acc[0][1], PASSWORD_ITERATIONS):
+                    hashed_pass, _ = hashing.generate_hash(password, db_salt, PASSWORD_ITERATIONS)
+                    db.update_by({'Password': encode_password_hash(hashed_pass, PASSWORD_ITERATIONS)},
+                                 account_table, {'User_Account_ID': acc[0][2]})
                 return acc[0]
             else:
                 return 'Password did not match'
@@ -197,7 +229,7 @@ def is_user(email):
     """
     db = Database(db_path)
     try:
-        acc = db.select('*', account_table, f'Email = \"{email}\"')
+        acc = db.select_by('*', account_table, {'Email': email})
         if not acc:  # account was not found with this email
             return f'Account was not found with this email.'
         else:
@@ -219,9 +251,9 @@ def update_password(new_password, email=None, acc=None):
 
     try:
         if acc:
-            salt = db.select('Salt', account_table, f'''User_Account_ID = {acc}''')
+            salt = db.select_by('Salt', account_table, {'User_Account_ID': acc})
         elif email:
-            salt = db.select('Salt', account_table, f'Email = \"{email}\"')
+            salt = db.select_by('Salt', account_table, {'Email': email})
         else:
             salt = None
 
@@ -229,12 +261,12 @@ def update_password(new_password, email=None, acc=None):
             return 'Account was not found.'
 
         salt = b64decode(salt[0][0])
-        hashed_pass, _ = generate_hash(new_password, salt)
-        hashed_pass = b64encode(hashed_pass).decode('utf-8')
+        hashed_pass, _ = hashing.generate_hash(new_password, salt, PASSWORD_ITERATIONS)
+        hashed_pass = encode_password_hash(hashed_pass, PASSWORD_ITERATIONS)
         if acc:
-            db.update((hashed_pass,), ('Password',), account_table, f'User_Account_ID = \"{acc}\"')
+            db.update_by({'Password': hashed_pass}, account_table, {'User_Account_ID': acc})
         elif email and type(is_user(email)) == tuple:
-            db.update((hashed_pass,), ('Password',), account_table, f'Email = \"{email}\"')
+            db.update_by({'Password': hashed_pass}, account_table, {'Email': email})
         else:
             return False
         return True
@@ -252,9 +284,9 @@ def update_account(account_id, uname=None, email=None):
     db = Database(db_path)
     try:
         if uname:
-            db.update((uname,), ('Username',), account_table, f'User_Account_ID = \"{account_id}\"')
+            db.update_by({'Username': uname}, account_table, {'User_Account_ID': account_id})
         if email:
-            db.update((email,), ('Email',), account_table, f'User_Account_ID = \"{account_id}\"')
+            db.update_by({'Email': email}, account_table, {'User_Account_ID': account_id})
     finally:
         db.close_connection()
 
@@ -264,42 +296,20 @@ def generate_account(session, profile_data):
     Generate account for registration.
     :param session: dict of session from flask.
     :param profile_data: dict of profile data from flask.
-    :return: True if successfully generated.
+    :return: account id of the new account.
     """
-    db = Database(db_path)
-    try:
-        # Get cur_hash from last record in database
-        last_record_hash = \
-        db.select('Block_Hash', profile_table, 'User_Account_ID = (SELECT max(User_Account_ID) FROM profile)')[0][0]
-
-        # Get largest account_id in database and increment account_id by 1
-        new_account_id = db.select(values='max(User_Account_ID)', table_name=account_table)[0][0] + 1
-
-        hashed_pass, temp_hashed_salt = generate_hash(session['password'])
-        hashed_pass = b64encode(hashed_pass).decode('utf-8')
-        hashed_salt = b64encode(temp_hashed_salt).decode('utf-8')
-        username = profile_data['first_name'] + ' ' + profile_data['last_name']
-        account_value = (session['email'], hashed_pass, new_account_id, hashed_salt, username)
-
-        items = [last_record_hash, new_account_id, profile_data['patient_num'], profile_data['last_name'],
-                 profile_data['first_name'], profile_data['mid_initial'], profile_data['dob'],
-                 profile_data['first_dose'], profile_data['date_first'], profile_data['clinic_site'],
-                 profile_data['second_dose'], profile_data['date_second'], last_record_hash]
-        new_hash = generate_block_hash(items, temp_hashed_salt)
-        with open(HISTORY_LOG_PATH, 'a') as hist_log_file:
-            hist_log_file.write(f'{new_account_id}\t{new_hash}\n')
-
-        items.pop(len(items) - 1)
-        items.pop(0)
-        items.append(new_hash)
-
-        profile_value = tuple(items)
-
-        db.insert(account_value, account_table)
-        db.insert(profile_value, profile_table)
-        return new_account_id
-    finally:
-        db.close_connection()
+    hashed_pass, temp_hashed_salt = hashing.generate_hash(session['password'], iterations=PASSWORD_ITERATIONS)
+    hashed_pass = encode_password_hash(hashed_pass, PASSWORD_ITERATIONS)
+    username = profile_data['first_name'] + ' ' + profile_data['last_name']
+
+    items = [profile_data['patient_num'], profile_data['last_name'], profile_data['first_name'],
+             profile_data['mid_initial'], profile_data['dob'], profile_data['first_dose'], profile_data['date_first'],
+             profile_data['clinic_site'], profile_data['second_dose'], profile_data['date_second']]
+
+    # The chain writer assigns the account id and the previous block hash, and logs the new block hash
+    new_account_id = chain_writer.append(session['email'], hashed_pass, temp_hashed_salt, username, items)
+    verdicts.invalidate(new_account_id)
+    return new_account_id
 
 
 def get_profile(account_id):
@@ -310,43 +320,85 @@ def get_profile(account_id):
     """
     db = Database(db_path)
     try:
-        acc = db.select('*', account_table, f'User_Account_ID = \"{account_id}\"')[0]
-        record = db.select('*', profile_table, f'User_Account_ID = \"{account_id}\"')[0]
+        acc = db.select_by('*', account_table, {'User_Account_ID': account_id})[0]
+        record = db.select_by('*', profile_table, {'User_Account_ID': account_id})[0]
 
         # Get block_hash from previous block
         if record[0] == 1:
             prev_hash = os.environ['hash_0']
         else:
-            prev_hash = db.select('Block_Hash', profile_table, f'User_Account_ID = \"{account_id - 1}\"')[0][0]
-
-        salt = b64decode(acc[3])
-        block_hash = b64decode(record[len(record) - 1])
-
-        # Deep copy record and add prev_block_hash to front and back of the list
-        items = copy.deepcopy(list(record[:-1]))
-        items.insert(0, prev_hash)
-        items.append(prev_hash)
-
-        new_block_hash = generate_block_hash(items, salt)
-        new_block_hash_decoded = b64decode(new_block_hash)
-        correct_hash = hmac.compare_digest(block_hash, new_block_hash_decoded)
-
-        # Double checking method, check if this_block_hash is stored in local history logs
-        if correct_hash:
-            hist_log_df = pd.read_csv(HISTORY_LOG_PATH, sep='\t')
-            hist_log_block_hash = hist_log_df[hist_log_df['User_Account_ID'] == account_id]['Block_Hash'].values
-            if hist_log_block_hash == new_block_hash:
-                correct_hash = True
-            else:
-                correct_hash = False
+            prev_hash = db.select_by('Block_Hash', profile_table, {'User_Account_ID': account_id - 1})[0][0]
+
+        # Reuse the verdict of the last view while the row, its predecessor, the salt and the log are the same
+        logged_hash = history_log.get(account_id)
+        verdict_key = fingerprint(record, prev_hash, acc[3], logged_hash)
+        is_tampered = verdicts.get(account_id, record[-1], verdict_key)
+        if is_tampered is None:
+            is_tampered = __is_tampered(record, prev_hash, acc[3], logged_hash)
+            verdicts.put(account_id, record[-1], verdict_key, is_tampered)
 
-        # True if correct_hash is wrong (is tampered), False otherwise (is not tampered)
-        is_tampered = not correct_hash
         return __form_dict(acc, record), is_tampered
     finally:
         db.close_connection()
 
 
+def get_inclusion_proof(account_id):
+    """
+    Get the proof that the profile of an account is in the Merkle tree of the chain.
+    :param account_id: account id.
+    :return: dictionary of the profile record, its inclusion proof and the signed root, None if not in the tree.
+    """
+    db = Database(db_path)
+    try:
+        record = db.select_by('*', profile_table, {'User_Account_ID': account_id})[0]
+    finally:
+        db.close_connection()
+
+    with merkle_tree.lock:  # no append between the proof and the root it is checked against
+        proof = merkle_tree.proof(account_id)
+        if proof is None:
+            return None
+        signed_root = merkle_tree.signed_root(MERKLE_KEY)
+
+    res = dict()
+    res['record'] = [str(value) for value in record]
+    res['proof'] = proof
+    res['signed_root'] = signed_root
+    return res
+
+
+def __is_tampered(record, prev_hash, salt, logged_hash):
+    """
+    Helper to verify the block hash of a profile in get_profile.
+    :param record: profile record.
+    :param prev_hash: block hash of the previous profile.
+    :param salt: salt of the account, base64 encoded.
+    :param logged_hash: block hash of the profile in the history logs, None if not logged.
+    :return: True if the block hash is wrong or not in the history logs (is tampered), False otherwise.
+    """
+    salt = b64decode(salt)
+    block_hash = b64decode(record[len(record) - 1])
+
+    # Deep copy record and add prev_block_hash to front and back of the list
+    items = copy.deepcopy(list(record[:-1]))
+    items.insert(0, prev_hash)
+    items.append(prev_hash)
+
+    new_block_hash = hashing.generate_block_hash(items, salt)
+    new_block_hash_decoded = b64decode(new_block_hash)
+    correct_hash = hmac.compare_digest(block_hash, new_block_hash_decoded)
+
+    # Double checking method, check if this_block_hash is stored in local history logs
+    if correct_hash:
+        if logged_hash == new_block_hash:
+            correct_hash = True
+        else:
+            correct_hash = False
+
+    # True if correct_hash is wrong (is tampered), False otherwise (is not tampered)
+    return not correct_hash
+
+
 def __form_dict(acc, record):
     """
     Helper to form dictionary to be returned in get_profile.
@@ -496,23 +548,3 @@ def clean_up_images(file_name: str, path_to_file: str):
     file_to_clean = os.path.join(path_to_file, file_name)
     if os.path.exists(file_to_clean):
         os.remove(file_to_clean)
-
-
-def generate_block_hash(items: list, salt):
-    """ Generate hash for each block in the database
-
-    Args:
-        items (list): list of items that need to be converted to hash
-        salt (bytes): unique salt to generate hash
-
-    Returns:
-        cur_hash (str): hash that converted to string to stored into database and written to file
-    """
-    string = ""
-    for element in items:
-        string += str(element)
-
-    cur_hash, _ = generate_hash(string, salt)
-    cur_hash = b64encode(cur_hash).decode("utf-8")
-
-    return cur_hash
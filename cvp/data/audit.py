@@ -0,0 +1,241 @@
+"""Chain Audit
+
+Chain audit module verifies the whole hash chain of the `profile` table and currently contains the following
+functions:
+- iter_chunks
+- verify_chunk
+- audit_chain
+
+The Block_Hash of a profile is the hash of the row surrounded by the Block_Hash of the previous profile (hash_0 for
+the first one), so each block is verified from its own row and the stored hash of its predecessor only. The table
+is streamed in chunks of rows which are verified in parallel on a pool of processes, then every block hash is
+cross-checked against the history log, the same way get_profile does for a single profile. Given the Merkle tree of
+the chain, every row is also checked against its leaf.
+
+USAGE
+-----
+
+$ python cvp/data/audit.py --db dataset/external/cvp.db --report dataset/processed/audit_report.json
+
+"""
+
+# Standard Dist
+import argparse
+import coloredlogs
+import hmac
+import json
+import logging
+import os
+import sqlite3
+import time
+from base64 import b64decode
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# Third Party Imports
+from dotenv import load_dotenv
+
+# Project Level Imports
+from cvp.data.history_log import HistoryLog
+from cvp.data.merkle import MerkleTree, leaf_hash, merkle_path
+from cvp.data.rel_database import HISTORY_LOG_PATH
+from cvp.features.transform import generate_block_hash
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+coloredlogs.install(level=logging.DEBUG, logger=logger)
+
+DB_PATH = 'dataset/external/cvp.db'
+REPORT_PATH = 'dataset/processed/audit_report.json'
+CHUNK_SIZE = 64  # blocks verified by one task of the pool
+
+# Reasons a link of the chain is reported broken
+HASH_MISMATCH = 'hash_mismatch'  # Block_Hash is not the hash of the row and its predecessor
+MISSING_PREDECESSOR = 'missing_predecessor'  # no profile with the previous User_Account_ID
+MISSING_SALT = 'missing_salt'  # no account holds the salt of the profile
+MISSING_FROM_HISTORY_LOG = 'missing_from_history_log'
+HISTORY_LOG_MISMATCH = 'history_log_mismatch'  # history log holds another Block_Hash for the profile
+MERKLE_MISMATCH = 'merkle_mismatch'  # the row is not the leaf of the profile in the Merkle tree
+MALFORMED = 'malformed'  # Block_Hash or salt is not base64
+
+SQL_CHAIN = '''SELECT profile.*,
+    (SELECT Salt FROM account WHERE account.User_Account_ID = profile.User_Account_ID LIMIT 1)
+    FROM profile ORDER BY User_Account_ID'''
+
+
+def iter_chunks(conn, hash_0: str, chunk_size: int = None):
+    """Stream the blocks of the chain with the stored hash of their predecessor
+
+    Args:
+        conn (sqlite3.Connection): connection to the cvp database
+        hash_0 (str): hash preceding the first profile
+        chunk_size (int): blocks by chunk. Default is CHUNK_SIZE
+
+    Yields:
+        chunk (list): blocks (record, salt, prev_hash), record being the profile row. prev_hash is None if the
+            previous profile does not exist
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    cursor = conn.execute(SQL_CHAIN)
+    prev_id, prev_hash = 0, hash_0
+
+    while rows := cursor.fetchmany(chunk_size):
+        chunk = []
+        for row in rows:
+            record, salt = row[:-1], row[-1]
+            account_id = record[0]
+            chunk.append((record, salt, prev_hash if prev_id == account_id - 1 else None))
+            prev_id, prev_hash = account_id, record[-1]
+        yield chunk
+
+
+def verify_chunk(chunk: list):
+    """Verify the block hashes of a chunk, run on the pool
+
+    Args:
+        chunk (list): blocks (record, salt, prev_hash) yielded by iter_chunks
+
+    Returns:
+        results (list): (User_Account_ID, reason) of the broken blocks, reason None for the others
+    """
+    results = []
+    for record, salt, prev_hash in chunk:
+        account_id = record[0]
+        if prev_hash is None:
+            results.append((account_id, MISSING_PREDECESSOR))
+            continue
+        if salt is None:
+            results.append((account_id, MISSING_SALT))
+            continue
+
+        try:
+            block_hash, salt = b64decode(record[-1], validate=True), b64decode(salt, validate=True)
+        except (ValueError, TypeError):  # binascii.Error is a ValueError
+            results.append((account_id, MALFORMED))
+            continue
+
+        items = [prev_hash] + list(record[:-1]) + [prev_hash]
+        new_block_hash = generate_block_hash(items, salt)
+        correct_hash = hmac.compare_digest(block_hash, b64decode(new_block_hash))
+        results.append((account_id, None if correct_hash else HASH_MISMATCH))
+
+    return results
+
+
+def audit_chain(db_path: str = None, hist_log_path: str = None, hash_0: str = None, max_workers: int = None,
+                chunk_size: int = None, tree_path: str = None):
+    """Verify every block of the profile chain
+
+    Usage:
+
+    >>> from cvp.data.audit import audit_chain
+    >>> report = audit_chain('dataset/external/cvp.db')
+
+    Args:
+        db_path (str): path to the cvp database. Default is DB_PATH
+        hist_log_path (str): path to the history log. Default is HISTORY_LOG_PATH
+        hash_0 (str): hash preceding the first profile. Default is the hash_0 environment variable
+        max_workers (int): processes verifying the chunks. Default is the number of cores
+        chunk_size (int): blocks by chunk. Default is CHUNK_SIZE
+        tree_path (str): path to the Merkle tree of the chain to check the rows against, not checked if None
+
+    Returns:
+        report (dict): blocks verified, broken links [{'User_Account_ID', 'reason'}] in chain order, seconds,
+            blocks_per_second, workers, chunk_size and merkle_root (hex, None if the tree is not checked)
+    """
+    db_path = db_path or DB_PATH
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"File {db_path} was not found. Current dir: {os.getcwd()}")
+
+    hash_0 = hash_0 or os.environ['hash_0']
+    max_workers = max_workers or os.cpu_count() or 1
+    chunk_size = chunk_size or CHUNK_SIZE
+    hist_log_path = hist_log_path or HISTORY_LOG_PATH
+    if not os.path.exists(hist_log_path):
+        raise FileNotFoundError(f"File {hist_log_path} was not found. Current dir: {os.getcwd()}")
+    history_log = HistoryLog(hist_log_path)
+    tree = MerkleTree(tree_path) if tree_path else None
+
+    start = time.perf_counter()
+    blocks, broken = 0, []
+
+    def collect(futures):
+        nonlocal blocks
+        for future in futures:
+            for account_id, reason in future.result():
+                blocks += 1
+                if reason is None:
+                    continue
+                broken.append({'User_Account_ID': account_id, 'reason': reason})
+
+    conn = sqlite3.connect(db_path)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+            for chunk in iter_chunks(conn, hash_0, chunk_size):
+                # Bound the chunks in flight so the table is never held in memory at once
+                if len(pending) >= 2 * max_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+
+                # Cross-check the stored hashes here, the history log stays in this process
+                for record, _, _ in chunk:
+                    logged_hash = history_log.get(record[0])
+                    if logged_hash is None:
+                        broken.append({'User_Account_ID': record[0], 'reason': MISSING_FROM_HISTORY_LOG})
+                    elif logged_hash != record[-1]:
+                        broken.append({'User_Account_ID': record[0], 'reason': HISTORY_LOG_MISMATCH})
+                    if tree is not None and tree.leaf(record[0]) != leaf_hash(record):
+                        broken.append({'User_Account_ID': record[0], 'reason': MERKLE_MISMATCH})
+
+                pending.add(executor.submit(verify_chunk, chunk))
+            collect(wait(pending).done)
+        merkle_root = tree.root.hex() if tree is not None and tree.size else None
+    finally:
+        conn.close()
+        history_log.close()
+        if tree is not None:
+            tree.close()
+
+    seconds = time.perf_counter() - start
+    broken.sort(key=lambda link: (link['User_Account_ID'], link['reason']))
+    report = {
+        'blocks': blocks,
+        'broken': broken,
+        'seconds': seconds,
+        'blocks_per_second': blocks / seconds if seconds else 0.0,
+        'workers': max_workers,
+        'chunk_size': chunk_size,
+        'merkle_root': merkle_root
+    }
+    logger.info(f"Verified {blocks} blocks in {seconds:.2f} s ({report['blocks_per_second']:.1f} blocks/s), "
+                f"{len(broken)} broken links")
+    return report
+
+
+def main(db_path: str = None, hist_log_path: str = None, report_path: str = None, max_workers: int = None,
+         chunk_size: int = None, hash_0: str = None, tree_path: str = None):
+    db_path = db_path or DB_PATH
+    if tree_path is None and os.path.exists(merkle_path(db_path)):
+        tree_path = merkle_path(db_path)
+    report = audit_chain(db_path, hist_log_path, hash_0, max_workers, chunk_size, tree_path)
+
+    report_path = report_path or REPORT_PATH
+    with open(report_path, 'w') as report_file:
+        json.dump(report, report_file, indent=4)
+    logger.info(f'Report written to {report_path}')
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Verify the hash chain of the profiles')
+    parser.add_argument('--db', default=DB_PATH, help='path to the cvp database')
+    parser.add_argument('--hist-log', default=HISTORY_LOG_PATH, help='path to the history log')
+    parser.add_argument('--report', default=REPORT_PATH, help='path to write the JSON report to')
+    parser.add_argument('--workers', type=int, default=None, help='processes verifying the blocks')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='blocks verified by one task')
+    parser.add_argument('--merkle', default=None, help='path to the Merkle tree, Default is merkle.db next to --db')
+    args = parser.parse_args()
+
+    report = main(args.db, args.hist_log, args.report, args.workers, args.chunk_size, tree_path=args.merkle)
+    raise SystemExit(1 if report['broken'] else 0)
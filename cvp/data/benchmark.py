@@ -0,0 +1,179 @@
+"""Database Benchmark
+
+Database benchmark module measures the reader and writer throughput of SQLite under each pragma profile of
+cvp.data.rel_database.PRAGMA_PROFILES with the following functions:
+- benchmark_profile
+- benchmark_profiles
+
+Readers look profiles up by User_Account_ID and writers append profiles one committed transaction at a time, the
+way get_profile and the registrations do, all at once for a number of seconds. Every profile runs on a new database
+of its own since the journal mode is kept by the database file. 'sqlite_default' runs without any pragma, with the
+rollback journal, for comparison.
+
+USAGE
+-----
+
+$ python -m cvp.data.benchmark --readers 4 --writers 1 --seconds 2
+
+"""
+
+# Standard Dist
+import argparse
+import coloredlogs
+import json
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Third Party Imports
+
+# Project Level Imports
+from cvp.data.rel_database import PRAGMA_PROFILES, apply_profile
+
+logger = logging.getLogger(__name__)
+coloredlogs.install(level=logging.DEBUG, logger=logger)
+
+BASELINE = 'sqlite_default'  # no pragma, rollback journal
+ROWS = 1000  # profiles in the database before the run
+
+SQL_CREATE = ('CREATE TABLE profile (User_Account_ID INTEGER NOT NULL PRIMARY KEY, Last_Name VARCHAR NOT NULL, '
+              'First_Name VARCHAR NOT NULL, Dob VARCHAR NOT NULL, Block_Hash VARCHAR NOT NULL)')
+SQL_READ = 'SELECT * FROM profile WHERE User_Account_ID = ?'
+SQL_WRITE = 'INSERT INTO profile VALUES (NULL, ?, ?, ?, ?)'
+
+
+def benchmark_profile(profile: str, readers: int = 4, writers: int = 1, seconds: float = 2.0, rows: int = None,
+                      folder_path: str = None):
+    """ Run readers and writers on a new database with the pragmas of a profile
+
+    Usage
+    -----
+    >>> from cvp.data.benchmark import benchmark_profile
+    >>> report = benchmark_profile('read_heavy')
+
+    Args:
+        profile (str): key of PRAGMA_PROFILES, or BASELINE for no pragma
+        readers (int): threads looking profiles up
+        writers (int): threads appending profiles
+        seconds (float): duration of the run
+        rows (int): profiles in the database before the run. Default is ROWS
+        folder_path (str): folder of the database, removed after the run. Default is a temporary folder
+
+    Returns:
+        report (dict): reads and writes done, their rate per second, and busy errors (lock not acquired in time)
+    """
+    if profile != BASELINE and profile not in PRAGMA_PROFILES:
+        raise ValueError(f'Unknown pragma profile {profile}, expected {BASELINE} or one of {list(PRAGMA_PROFILES)}')
+    rows = rows or ROWS
+
+    with tempfile.TemporaryDirectory(dir=folder_path) as folder:
+        db_path = os.path.join(folder, f'{profile}.db')
+
+        def connect():
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            return apply_profile(conn, profile) if profile != BASELINE else conn
+
+        conn = connect()
+        with conn:
+            conn.execute(SQL_CREATE)
+            conn.executemany(SQL_WRITE, (('Last', 'First', '01/01/2000', f'{n:064x}') for n in range(rows)))
+
+        counts = {'reads': 0, 'writes': 0, 'busy': 0}
+        lock = threading.Lock()
+        start = threading.Barrier(readers + writers + 1)
+        stop = threading.Event()
+
+        def run(operation):
+            thread_conn = connect()
+            done, busy = 0, 0
+            start.wait()
+            try:
+                while not stop.is_set():
+                    try:
+                        operation(thread_conn)
+                        done += 1
+                    except sqlite3.OperationalError:  # database is locked
+                        busy += 1
+            finally:
+                thread_conn.close()
+                with lock:
+                    counts['reads' if operation is read else 'writes'] += done
+                    counts['busy'] += busy
+
+        def read(thread_conn):
+            thread_conn.execute(SQL_READ, (random.randint(1, rows),)).fetchone()
+
+        def write(thread_conn):
+            with thread_conn:
+                thread_conn.execute(SQL_WRITE, ('Last', 'First', '01/01/2000', '0' * 64))
+
+        threads = [threading.Thread(target=run, args=(read,)) for _ in range(readers)]
+        threads += [threading.Thread(target=run, args=(write,)) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+
+        start.wait()
+        began = time.perf_counter()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+        conn.close()
+
+    report = {
+        'readers': readers,
+        'writers': writers,
+        'seconds': elapsed,
+        'reads': counts['reads'],
+        'writes': counts['writes'],
+        'reads_per_second': counts['reads'] / elapsed,
+        'writes_per_second': counts['writes'] / elapsed,
+        'busy_errors': counts['busy']
+    }
+    logger.info(f'{profile}: {report}')
+    return report
+
+
+def benchmark_profiles(profiles: list = None, readers: int = 4, writers: int = 1, seconds: float = 2.0,
+                       rows: int = None, folder_path: str = None):
+    """ Compare the throughput of profiles, see benchmark_profile
+
+    Usage
+    -----
+    >>> from cvp.data.benchmark import benchmark_profiles
+    >>> report = benchmark_profiles(readers=8, writers=2)
+
+    Args:
+        profiles (list): profiles to run. Default is BASELINE and every profile of PRAGMA_PROFILES
+
+    Returns:
+        report (dict): report of benchmark_profile by profile
+    """
+    profiles = profiles or [BASELINE] + list(PRAGMA_PROFILES)
+    return {profile: benchmark_profile(profile, readers, writers, seconds, rows, folder_path) for profile in profiles}
+
+
+def main(readers: int = 4, writers: int = 1, seconds: float = 2.0, rows: int = None, report_path: str = None):
+    report = benchmark_profiles(readers=readers, writers=writers, seconds=seconds, rows=rows)
+    if report_path:
+        with open(report_path, 'w') as report_file:
+            json.dump(report, report_file, indent=4)
+        logger.info(f'Report written to {report_path}')
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark SQLite reader and writer throughput by pragma profile')
+    parser.add_argument('--readers', type=int, default=4, help='threads looking profiles up')
+    parser.add_argument('--writers', type=int, default=1, help='threads appending profiles')
+    parser.add_argument('--seconds', type=float, default=2.0, help='duration of the run of each profile')
+    parser.add_argument('--rows', type=int, default=ROWS, help='profiles in the database before the run')
+    parser.add_argument('--report', default=None, help='path to write the JSON report to')
+    args = parser.parse_args()
+
+    main(args.readers, args.writers, args.seconds, args.rows, args.report)
@@ -7,8 +7,7 @@ import os
 from base64 import b64encode
 
 # import generate_hash under feature
-from cvp.features.transform import generate_hash
-from cvp.app.utils import generate_block_hash
+from cvp.features.transform import generate_hash, generate_block_hash, encode_password_hash, DEFAULT_ITERATIONS
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -81,7 +80,7 @@ def __account(first, last, middle_i, hospital, acc_id):
     email = first.lower() + '.' + last.lower() + domain
     password = first.lower() + last.lower()
     hashed_pass, temp_salt = generate_hash(password)  # get hashed_pass and salt for this password
-    hashed_pass = b64encode(hashed_pass).decode('utf-8')
+    hashed_pass = encode_password_hash(hashed_pass, DEFAULT_ITERATIONS)
     salt = b64encode(temp_salt).decode('utf-8')
     patient_num = str(random.randint(1000, 9999))  # randomly chosen patient id
 
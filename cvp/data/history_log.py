@@ -0,0 +1,156 @@
+"""History Log
+
+History log module currently contains HistoryLog class, the local record of every Block_Hash written to the chain
+which get_profile and the audit double check the profiles against.
+
+The log is an append-only SQLite table keyed by User_Account_ID, so looking up the hash of a profile is an index
+lookup whatever the number of accounts, instead of a read of the whole file. Rows cannot be updated, deleted or
+replaced, the triggers of the table abort such statements (INSERT OR REPLACE deletes the old row without firing
+the delete trigger, so inserts are checked too). Appends are transactions, safe from several threads and processes.
+The log used to be a TSV file, migrate imports it.
+
+USAGE
+-----
+
+>>> from cvp.data.history_log import HistoryLog
+>>> history_log = HistoryLog('dataset/processed/hist_log.db')
+>>> history_log.append(account_id, block_hash)
+>>> history_log.get(account_id)
+
+$ python cvp/data/history_log.py --migrate dataset/processed/hist_log.csv --db dataset/processed/hist_log.db
+
+"""
+
+# Standard Dist
+import argparse
+import coloredlogs
+import csv
+import logging
+import os
+import sqlite3
+import threading
+
+# Third Party Imports
+
+# Project Level Imports
+
+logger = logging.getLogger(__name__)
+coloredlogs.install(level=logging.DEBUG, logger=logger)
+
+BUSY_TIMEOUT = 30.0  # seconds an append waits for the appends of other processes
+
+SQL_CREATE = [
+    'CREATE TABLE IF NOT EXISTS history_log (User_Account_ID INTEGER NOT NULL PRIMARY KEY, '
+    'Block_Hash VARCHAR NOT NULL)',
+    "CREATE TRIGGER IF NOT EXISTS history_log_no_update BEFORE UPDATE ON history_log "
+    "BEGIN SELECT RAISE(ABORT, 'history_log is append-only'); END",
+    "CREATE TRIGGER IF NOT EXISTS history_log_no_delete BEFORE DELETE ON history_log "
+    "BEGIN SELECT RAISE(ABORT, 'history_log is append-only'); END",
+    "CREATE TRIGGER IF NOT EXISTS history_log_no_replace BEFORE INSERT ON history_log "
+    "WHEN EXISTS (SELECT 1 FROM history_log WHERE User_Account_ID = NEW.User_Account_ID) "
+    "BEGIN SELECT RAISE(ABORT, 'history_log is append-only'); END"
+]
+
+
+class HistoryLog(object):
+    """ Append-only log of the Block_Hash of every profile, by User_Account_ID """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): path to the database of the log, created on first use if missing
+        """
+        self.path = path
+        self.lock = threading.RLock()
+        self.__conn = None
+
+    @property
+    def conn(self):
+        """ Connection to the database of the log, opened and created on first use """
+        with self.lock:
+            if self.__conn is None:
+                self.__conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+                with self.__conn:
+                    for statement in SQL_CREATE:
+                        self.__conn.execute(statement)
+            return self.__conn
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute('SELECT count(*) FROM history_log').fetchone()[0]
+
+    def get(self, account_id: int):
+        """ Get the Block_Hash logged for a profile
+        Args:
+            account_id (int): User_Account_ID of the profile
+        Returns:
+            block_hash (str): None if the profile was never logged
+        """
+        with self.lock:
+            row = self.conn.execute('SELECT Block_Hash FROM history_log WHERE User_Account_ID = ?',
+                                    (account_id,)).fetchone()
+        return row[0] if row else None
+
+    def append(self, account_id: int, block_hash: str):
+        """ Log the Block_Hash of a new profile
+        Args:
+            account_id (int): User_Account_ID of the profile
+            block_hash (str): Block_Hash of the profile
+        Raises:
+            ValueError: the profile is already logged, its hash cannot be replaced
+        """
+        self.extend([(account_id, block_hash)])
+
+    def extend(self, rows):
+        """ Log the Block_Hash of new profiles in one transaction
+        Args:
+            rows (iterable): (User_Account_ID, Block_Hash) of the profiles
+        Raises:
+            ValueError: a profile is already logged, none of the rows are logged then
+        """
+        try:
+            with self.lock, self.conn:
+                self.conn.executemany('INSERT INTO history_log VALUES (?, ?)',
+                                      ((int(account_id), block_hash) for account_id, block_hash in rows))
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f'A profile is already in the history log: {e}')
+
+    def migrate(self, tsv_path: str):
+        """ Import the history log of a TSV file (User_Account_ID, Block_Hash), the profiles already logged are kept
+        Args:
+            tsv_path (str): path to the TSV file
+        Returns:
+            imported (int): number of profiles imported
+        """
+        if not os.path.exists(tsv_path):
+            raise FileNotFoundError(f"File {tsv_path} was not found. Current dir: {os.getcwd()}")
+
+        with open(tsv_path, newline='') as tsv_file:
+            rows = [(int(row['User_Account_ID']), row['Block_Hash'])
+                    for row in csv.DictReader(tsv_file, delimiter='\t')]
+
+        with self.lock, self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany('INSERT INTO history_log SELECT ?1, ?2 WHERE NOT EXISTS '
+                                  '(SELECT 1 FROM history_log WHERE User_Account_ID = ?1)', rows)
+            imported = self.conn.total_changes - before
+
+        logger.info(f'Imported {imported} of {len(rows)} profiles from {tsv_path}')
+        return imported
+
+    def close(self):
+        with self.lock:
+            if self.__conn is not None:
+                self.__conn.close()
+                self.__conn = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Import a TSV history log into the history log database')
+    parser.add_argument('--migrate', required=True, help='path to the TSV history log')
+    parser.add_argument('--db', required=True, help='path to the history log database')
+    args = parser.parse_args()
+
+    history_log = HistoryLog(args.db)
+    history_log.migrate(args.migrate)
+    history_log.close()
@@ -0,0 +1,273 @@
+"""Merkle Tree
+
+Merkle tree module currently contains MerkleTree class and the following functions:
+- leaf_hash
+- node_hash
+- verify_proof
+- sign_root
+- verify_root
+- merkle_path
+
+The tree has one leaf per profile, in chain order. A leaf is the SHA-256 of the whole profile row, Block_Hash
+included, and a node the SHA-256 of its two children. The prefixes 0x00 and 0x01 keep a leaf from passing for a
+node. A node without a right sibling is promoted to the next level as is. Appending a profile updates the log(n)
+nodes on the rightmost path only. An inclusion proof lists the siblings on the path of a leaf, so a record is
+checked against the root with log(n) SHA-256 instead of a PBKDF2 and a read of the history log. The root is signed
+with an HMAC, so verifiers holding the key can trust a root they are handed.
+
+The nodes are persisted in their own SQLite database next to cvp.db, opened on first use.
+
+USAGE
+-----
+
+>>> from cvp.data.merkle import MerkleTree, merkle_path, verify_proof
+>>> tree = MerkleTree(merkle_path('dataset/external/cvp.db'))
+>>> tree.sync('dataset/external/cvp.db')
+>>> proof = tree.proof(account_id)
+>>> verify_proof(record, proof, bytes.fromhex(proof['root']))
+True
+
+"""
+
+# Standard Dist
+import coloredlogs
+import hashlib
+import hmac
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+# Third Party Imports
+
+# Project Level Imports
+
+logger = logging.getLogger(__name__)
+coloredlogs.install(level=logging.DEBUG, logger=logger)
+
+MERKLE_DB_NAME = 'merkle.db'
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+SQL_CREATE = [
+    'CREATE TABLE IF NOT EXISTS merkle_node (Level INTEGER NOT NULL, Position INTEGER NOT NULL, '
+    'Hash BLOB NOT NULL, PRIMARY KEY (Level, Position))',
+    'CREATE TABLE IF NOT EXISTS merkle_leaf (User_Account_ID INTEGER NOT NULL PRIMARY KEY, '
+    'Position INTEGER NOT NULL UNIQUE)'
+]
+
+
+def leaf_hash(record):
+    """Hash a profile row into a leaf
+
+    Args:
+        record (iterable): profile row, Block_Hash included. Values are compared as strings, so the row read back
+            from the database and the one inserted hash the same
+
+    Returns:
+        hash (bytes): SHA-256 of the row
+    """
+    data = json.dumps([str(value) for value in record], separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(LEAF_PREFIX + data).digest()
+
+
+def node_hash(left: bytes, right: bytes):
+    """Hash two children into their parent"""
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def verify_proof(record, proof: dict, root: bytes):
+    """Check that a profile row is a leaf of the tree of a root
+
+    Args:
+        record (iterable): profile row, Block_Hash included
+        proof (dict): inclusion proof returned by MerkleTree.proof
+        root (bytes): root to check against, Ex: the root of a signed root checked with verify_root
+
+    Returns:
+        is_included (bool): True if the row is the leaf of the proof in the tree of root
+    """
+    current = leaf_hash(record)
+    for step in proof['path']:
+        sibling = bytes.fromhex(step['hash'])
+        current = node_hash(sibling, current) if step['side'] == 'left' else node_hash(current, sibling)
+    return hmac.compare_digest(current, root)
+
+
+def sign_root(root: bytes, size: int, key: bytes):
+    """Sign a root along with the number of leaves it covers
+
+    Returns:
+        signed_root (dict): size, root (hex) and signature (hex HMAC-SHA256)
+    """
+    signature = hmac.new(key, f'{size}:{root.hex()}'.encode('utf-8'), hashlib.sha256).hexdigest()
+    return {'size': size, 'root': root.hex(), 'signature': signature}
+
+
+def verify_root(signed_root: dict, key: bytes):
+    """Check the signature of a root returned by sign_root"""
+    expected = sign_root(bytes.fromhex(signed_root['root']), signed_root['size'], key)['signature']
+    return hmac.compare_digest(expected, signed_root['signature'])
+
+
+def merkle_path(db_path: str):
+    """Get the path of the Merkle tree of a cvp database, in the same folder"""
+    return os.path.join(os.path.dirname(db_path), MERKLE_DB_NAME)
+
+
+class MerkleTree(object):
+    """ Merkle tree of the profile chain, persisted in SQLite and appended to incrementally """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): path to the database of the tree, created if missing
+        """
+        self.path = path
+        self.lock = threading.RLock()
+        self.__conn = None
+        self.__size = 0
+
+    @property
+    def conn(self):
+        """ Connection to the database of the tree, opened and created on first use """
+        with self.lock:
+            if self.__conn is None:
+                self.__conn = sqlite3.connect(self.path, check_same_thread=False)
+                for statement in SQL_CREATE:
+                    self.__conn.execute(statement)
+                self.__conn.commit()
+                self.__size = self.__conn.execute('SELECT count(*) FROM merkle_leaf').fetchone()[0]
+            return self.__conn
+
+    @property
+    def size(self):
+        """ Number of leaves """
+        with self.lock:
+            self.conn
+            return self.__size
+
+    @property
+    def root(self):
+        """ Root of the tree, None if empty """
+        with self.lock:
+            return self.__root()
+
+    def append(self, account_id: int, record):
+        """ Add the leaf of a profile, after the last one
+        Args:
+            account_id (int): User_Account_ID of the profile
+            record (iterable): profile row, Block_Hash included
+        Returns:
+            position (int): position of the leaf
+        """
+        with self.lock:
+            with self.conn:  # one transaction, rolled back if anything fails
+                position = self.__append(account_id, record)
+            self.__size += 1
+        return position
+
+    def sync(self, db_path: str):
+        """ Append the profiles of a cvp database not in the tree yet, Ex: to build the tree of an existing chain
+        Args:
+            db_path (str): path to the cvp database
+        Returns:
+            appended (int): number of leaves appended, 0 if the database has no profile table yet
+        """
+        with self.lock:
+            last_id = self.conn.execute('SELECT max(User_Account_ID) FROM merkle_leaf').fetchone()[0] or 0
+            profile_conn = sqlite3.connect(db_path)
+            try:
+                if profile_conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'profile'"
+                                        ).fetchone() is None:
+                    return 0
+                rows = profile_conn.execute('SELECT * FROM profile WHERE User_Account_ID > ? '
+                                            'ORDER BY User_Account_ID', (last_id,)).fetchall()
+            finally:
+                profile_conn.close()
+
+            with self.conn:
+                for offset, row in enumerate(rows):
+                    self.__append(row[0], row, self.size + offset)
+            self.__size += len(rows)
+
+        if rows:
+            logger.info(f'Appended {len(rows)} profiles to the Merkle tree, {self.size} leaves')
+        return len(rows)
+
+    def leaf(self, account_id: int):
+        """ Get the leaf of a profile, None if it is not in the tree """
+        with self.lock:
+            row = self.conn.execute('SELECT Hash FROM merkle_node JOIN merkle_leaf USING (Position) '
+                                    'WHERE Level = 0 AND User_Account_ID = ?', (account_id,)).fetchone()
+        return row[0] if row else None
+
+    def proof(self, account_id: int):
+        """ Get the inclusion proof of a profile
+        Args:
+            account_id (int): User_Account_ID of the profile
+        Returns:
+            proof (dict): account_id, position of the leaf, size and root (hex) of the tree, and path, the
+                siblings [{'hash', 'side'}] from the leaf up. None if the profile is not in the tree
+        """
+        with self.lock:
+            row = self.conn.execute('SELECT Position FROM merkle_leaf WHERE User_Account_ID = ?',
+                                    (account_id,)).fetchone()
+            if row is None:
+                return None
+
+            position = index = row[0]
+            path, level, count = [], 0, self.size
+            while count > 1:
+                sibling = index ^ 1
+                if sibling < count:  # otherwise the node is promoted, nothing to hash with
+                    path.append({'hash': self.__node(level, sibling).hex(),
+                                 'side': 'left' if sibling < index else 'right'})
+                index, level, count = index // 2, level + 1, (count + 1) // 2
+
+            return {'account_id': account_id, 'position': position, 'size': self.size,
+                    'root': self.__root().hex(), 'path': path}
+
+    def signed_root(self, key: bytes):
+        """ Get the root signed with key, see sign_root. None if the tree is empty """
+        with self.lock:
+            root, size = self.__root(), self.size
+        return sign_root(root, size, key) if root is not None else None
+
+    def close(self):
+        with self.lock:
+            if self.__conn is not None:
+                self.__conn.close()
+                self.__conn = None
+
+    def __append(self, account_id, record, position=None):
+        """ Insert a leaf and update the rightmost path up to the root, lock held and within a transaction """
+        position = self.size if position is None else position
+        current = leaf_hash(record)
+        self.conn.execute('INSERT INTO merkle_leaf VALUES (?, ?)', (account_id, position))
+        self.conn.execute('INSERT OR REPLACE INTO merkle_node VALUES (0, ?, ?)', (position, current))
+
+        # The new leaf is the last node of every level, it only has a left sibling
+        index, level, count = position, 0, position + 1
+        while count > 1:
+            if index % 2 == 1:
+                current = node_hash(self.__node(level, index - 1), current)
+            index, level, count = index // 2, level + 1, (count + 1) // 2
+            self.conn.execute('INSERT OR REPLACE INTO merkle_node VALUES (?, ?, ?)', (level, index, current))
+
+        return position
+
+    def __node(self, level, position):
+        return self.conn.execute('SELECT Hash FROM merkle_node WHERE Level = ? AND Position = ?',
+                                 (level, position)).fetchone()[0]
+
+    def __root(self):
+        """ Root of the tree, lock held """
+        if not self.size:
+            return None
+
+        level, count = 0, self.size
+        while count > 1:
+            level, count = level + 1, (count + 1) // 2
+        return self.__node(level, 0)
@@ -3,10 +3,23 @@ Description: CRUD functions to interact with a database, offer the following met
 - create_connection
 - close_connection
 - create_table
+- create_index
 - insert
 - select
 - update
 - delete
+- select_by, update_by, delete_by: same with bound parameters instead of a condition string
+- explain, full_scans: query plans, to check the lookups search an index
+- check_lookups: function logging the lookups of a database which would scan a whole table
+- apply_profile, remove_database: functions setting the pragmas of a connection and deleting a database
+Connections are taken from a ConnectionPool by database path (get_pool), so a Database is cheap to create: the
+thread reuses its connection or an idle one, and the SQLAlchemy engine is only created for pandas bulk loads.
+The *_by methods generate the same SQL text for the same columns whatever the values, so sqlite3 reuses the
+statement it prepared instead of parsing a new one, and values are never injected in the SQL.
+The tables made by main declare an index for every column the app utilities look rows up by (LOOKUPS), so each
+lookup is a B-tree search, O(log n), instead of a scan of the table. main checks it with EXPLAIN QUERY PLAN.
+Each pool opens its connections with a pragma profile of PRAGMA_PROFILES. All of them use the WAL journal, so the
+profile readers keep reading while a registration is written instead of waiting for its lock.
 USAGE
 -----
 $ python cvp/data/rel_database.py
@@ -15,28 +28,351 @@ $ python cvp/data/rel_database.py
 # Standard Dist
 import logging
 import os
+import re
 import sqlite3
+import threading
+import time
 import coloredlogs
+from collections import OrderedDict
+from contextlib import contextmanager
 
 # Third party imports
 from sqlite3 import Error
 from pathlib import Path
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from base64 import b64decode
 import pandas as pd
 from dotenv import load_dotenv
 
 load_dotenv()
 # Project Level Imports
+from cvp.data.history_log import HistoryLog
+from cvp.data.merkle import MerkleTree, merkle_path
 
 ACCOUNT_PATH = 'dataset/processed/accounts.txt'
-HISTORY_LOG_PATH = 'dataset/processed/hist_log.csv'
+POOL_SIZE = 8  # idle connections kept by database
+IDLE_TIMEOUT = 300.0  # seconds an idle connection is kept
+STATEMENT_CACHE_SIZE = 128  # prepared statements cached by connection, sqlite3's default
+IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')  # table and column names, which cannot be bound
+HISTORY_LOG_PATH = 'dataset/processed/hist_log.db'
+HISTORY_LOG_TSV_PATH = 'dataset/processed/hist_log.csv'  # history log before it moved to HISTORY_LOG_PATH
+
+# Pragmas applied to every connection of a pool, by profile. busy_timeout goes first so switching the journal
+# waits for the other connections. WAL lets readers run alongside one writer, and with it synchronous NORMAL only
+# syncs at checkpoints, a commit cannot corrupt the database but the last ones may be lost on power failure.
+# The chain writer syncs every commit (FULL): the history log and the Merkle tree are other files, a block they
+# kept but cvp.db lost would have its id given again to the next registration
+PRAGMA_PROFILES = {
+    'read_heavy': {  # the app: many profile lookups, a few registrations
+        'busy_timeout': 5000,  # ms
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,  # KiB when negative, 64 MiB
+        'mmap_size': 268435456  # bytes read through the memory map instead of read() calls, 256 MiB
+    },
+    'write_heavy': {  # the chain writer: long waits for the write lock rather than failed registrations
+        'busy_timeout': 30000,
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -16384,
+        'mmap_size': 67108864
+    },
+    'bulk_load': {  # main: the database is rebuilt from scratch if the load fails, so no sync at all
+        'busy_timeout': 30000,
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -262144,
+        'mmap_size': 0
+    }
+}
+DEFAULT_PROFILE = 'read_heavy'
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')  # query plan step reading a whole table
+
+# Columns the app utilities look rows up by, (table, columns) by database, each needing an index. main checks them
+# when it makes the tables; tests/app/test_utils.py checks the statements the utilities actually issue
+LOOKUPS = {
+    'cvp': [
+        ('account', ('Email',)),
+        ('account', ('User_Account_ID',)),
+        ('profile', ('User_Account_ID',))
+    ],
+    'cdc': [
+        ('profile', ('Email',))
+    ]
+}
 
 
 logger = logging.getLogger(__name__)
 coloredlogs.install(level=logging.DEBUG, logger=logger)
 
 
+class StatementCache:
+    """ SQL texts of the parameterized queries by shape, least recently used evicted beyond size
+
+    Mirrors the statement cache of the sqlite3 connections: a hit is a SQL text already issued, which sqlite3
+    finds prepared instead of parsing it again.
+    """
+
+    def __init__(self, size: int = None):
+        """
+        Args:
+            size (int): SQL texts kept, the cached_statements of the connections
+        """
+        self.size = size or STATEMENT_CACHE_SIZE
+        self.statements = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def sql(self):
+        """ SQL texts cached, least recently used first """
+        with self.lock:
+            return list(self.statements.values())
+
+    def get(self, key: tuple, build):
+        """ Get the SQL text of a query shape
+        Args:
+            key (tuple): shape of the query, Ex: ('select', values, table_name, where columns)
+            build (callable): returns the SQL text of the shape, called on a miss
+        Returns:
+            sql (str): SQL text with ? placeholders
+        """
+        with self.lock:
+            sql = self.statements.get(key)
+            if sql is not None:
+                self.statements.move_to_end(key)
+                self.hits += 1
+                return sql
+
+            self.misses += 1
+            sql = self.statements[key] = build()
+            if len(self.statements) > self.size:
+                self.statements.popitem(last=False)
+            return sql
+
+    @property
+    def stats(self):
+        """ hits, misses, hit_rate and number of SQL texts cached """
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'size': len(self.statements)
+            }
+
+
+class ConnectionPool:
+    """ Connections to one database, reused by thread
+
+    A thread holding a connection of the pool gets the same one again, so nested Database instances share it.
+    Released connections are kept idle for the next thread, up to size of them and for idle_timeout seconds.
+    A connection is released by the thread holding it, or by any thread once that one has ended.
+    """
+
+    def __init__(self, db_path: str, size: int = None, idle_timeout: float = None, cached_statements: int = None,
+                 profile: str = None):
+        """
+        Args:
+            db_path (str): path to the database
+            size (int): idle connections kept, the others are closed on release
+            idle_timeout (float): seconds an idle connection is kept
+            cached_statements (int): prepared statements cached by connection
+            profile (str): pragma profile of the connections, a key of PRAGMA_PROFILES. Default is DEFAULT_PROFILE
+        """
+        self.profile = profile or DEFAULT_PROFILE
+        if self.profile not in PRAGMA_PROFILES:
+            raise ValueError(f'Unknown pragma profile {self.profile}, expected one of {list(PRAGMA_PROFILES)}')
+
+        self.db_path = db_path
+        self.size = POOL_SIZE if size is None else size
+        self.idle_timeout = IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        self.statements = StatementCache(cached_statements)
+        self.lock = threading.Lock()
+        self.idle = []  # (connection, file id, release time), most recently released last
+        self.local = threading.local()  # connection held by the thread and how many times
+        self.owners = dict()  # thread holding each connection handed out, by id of the connection
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self):
+        """ Get a connection for the current thread, release it when done
+        Returns:
+            conn (sqlite3.Connection): connection to the database
+        """
+        held = getattr(self.local, 'held', None)
+        if held is not None:
+            held[1] += 1
+            return held[0]
+
+        conn, file_id = self.__pop_idle()
+        if conn is None:
+            Path(self.db_path).touch()
+            conn = sqlite3.connect(self.db_path, check_same_thread=False,  # used by one thread at a time
+                                   cached_statements=self.statements.size)
+            apply_profile(conn, self.profile)
+            file_id = self.__file_id()
+            with self.lock:
+                self.created += 1
+                # forget the connections of the threads which ended without releasing them
+                self.owners = {key: owner for key, owner in self.owners.items() if owner.is_alive()}
+            logger.info('SUCCESS: Connected to Database')
+
+        with self.lock:
+            self.owners[id(conn)] = threading.current_thread()
+        self.local.held = [conn, 1, file_id]
+        return conn
+
+    def release(self, conn):
+        """ Give back a connection got from acquire, by the same thread
+        Raises:
+            ValueError: the connection is held by another thread, still running
+        """
+        held = getattr(self.local, 'held', None)
+        if held is None or held[0] is not conn:
+            with self.lock:
+                owner = self.owners.get(id(conn))
+                if owner is not None and owner.is_alive():  # closing it would break the thread using it
+                    raise ValueError(f'Connection held by thread {owner.name}, release it from that thread')
+                self.owners.pop(id(conn), None)
+            conn.close()  # its thread ended, or not a connection of the pool
+            return
+
+        held[1] -= 1
+        if held[1] > 0:  # still used by an enclosing Database of the thread
+            return
+        self.local.held = None
+
+        if conn.in_transaction:
+            conn.rollback()
+        with self.lock:
+            self.owners.pop(id(conn), None)
+            self.__evict()
+            if len(self.idle) < self.size:
+                self.idle.append((conn, held[2], time.monotonic()))
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        """ Connection for the current thread within a with block
+        Usage:
+        >>> with get_pool(db_path).connection() as conn:
+        ...     conn.execute(sql)
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    @property
+    def stats(self):
+        """ connections created, acquisitions served by an idle connection and idle connections """
+        with self.lock:
+            return {'created': self.created, 'reused': self.reused, 'idle': len(self.idle)}
+
+    def close(self):
+        """ Close the idle connections """
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn, _, _ in idle:
+            conn.close()
+
+    def __pop_idle(self):
+        """ Take the most recently released connection still valid, (None, None) if there is none """
+        file_id = self.__file_id()
+        with self.lock:
+            self.__evict()
+            while self.idle:
+                conn, conn_file_id, _ = self.idle.pop()
+                if conn_file_id == file_id:
+                    self.reused += 1
+                    return conn, conn_file_id
+                conn.close()  # the database file was deleted or replaced since
+        return None, None
+
+    def __evict(self):
+        """ Close the connections idle for longer than idle_timeout, lock held """
+        deadline = time.monotonic() - self.idle_timeout
+        while self.idle and self.idle[0][2] < deadline:
+            self.idle.pop(0)[0].close()
+
+    def __file_id(self):
+        try:
+            stat = os.stat(self.db_path)
+            return stat.st_dev, stat.st_ino
+        except OSError:
+            return None
+
+
+__pools = dict()
+__pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str, size: int = None, idle_timeout: float = None, cached_statements: int = None,
+             profile: str = None):
+    """ Get the connection pool of a database, created on first use
+    Usage:
+    >>> from cvp.data.rel_database import get_pool
+    >>> with get_pool(db_path).connection() as conn:
+    ...     conn.execute(sql)
+    Args:
+        db_path (str): path to the database
+        size (int): idle connections kept, applied when the pool is created
+        idle_timeout (float): seconds an idle connection is kept, applied when the pool is created
+        cached_statements (int): prepared statements cached by connection, applied when the pool is created
+        profile (str): pragma profile of the connections, applied when the pool is created
+    Returns:
+        pool (ConnectionPool): pool of the database
+    """
+    key = os.path.abspath(db_path)
+    with __pools_lock:
+        if key not in __pools:
+            __pools[key] = ConnectionPool(db_path, size, idle_timeout, cached_statements, profile)
+        return __pools[key]
+
+
+def close_pool(db_path: str):
+    """ Close the idle connections of the pool of a database and forget it, the next get_pool creates another """
+    with __pools_lock:
+        pool = __pools.pop(os.path.abspath(db_path), None)
+    if pool is not None:
+        pool.close()
+
+
+def apply_profile(conn, profile: str):
+    """ Set the pragmas of a profile on a connection
+    Usage:
+    >>> from cvp.data.rel_database import apply_profile
+    >>> conn = apply_profile(sqlite3.connect(db_path), 'write_heavy')
+    Args:
+        conn (sqlite3.Connection): connection, outside of a transaction
+        profile (str): key of PRAGMA_PROFILES
+    Returns:
+        conn (sqlite3.Connection): same connection
+    """
+    if profile not in PRAGMA_PROFILES:
+        raise ValueError(f'Unknown pragma profile {profile}, expected one of {list(PRAGMA_PROFILES)}')
+
+    for name, value in PRAGMA_PROFILES[profile].items():
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+
+def remove_database(db_path: str):
+    """ Delete a database along with its WAL files, after closing the idle connections of its pool
+
+    A WAL file left behind would be replayed into the next database created at the same path.
+    """
+    close_pool(db_path)
+    for path in (db_path, db_path + '-wal', db_path + '-shm'):
+        if os.path.exists(path):
+            os.remove(path)
+
+
 class Database:
     """ Database instance for CRUD interaction """
 
@@ -48,30 +384,37 @@ class Database:
         Args:
              db_path (str): path to the database
         """
-        Path(db_path).touch()
-
+        self.db_path = db_path
+        self.pool = get_pool(db_path)
         self.conn = self.create_connection(db_path)
-        self.engine = create_engine('sqlite:///' + db_path, echo=False)
         self.cursor = self.conn.cursor()
+        self.__engine = None
+
+    @property
+    def engine(self):
+        """ SQLAlchemy engine of the database for pandas, created on first use """
+        if self.__engine is None:
+            self.__engine = create_engine('sqlite:///' + self.db_path, echo=False)
+            profile = self.pool.profile
+            event.listen(self.__engine, 'connect', lambda conn, _: apply_profile(conn, profile))
+        return self.__engine
 
     def create_connection(self, db_path):
-        """ Create a connection to database
+        """ Get a connection to database from its pool
         Args:
             db_path (str): path to database
         Returns:
              conn: Connection object or None
         """
         try:
-            conn = sqlite3.connect(db_path)
-            logger.info('SUCCESS: Connected to Database')
-            return conn
+            return get_pool(db_path).acquire()
         except Error as e:
             logger.debug(e)
 
         return None
 
     def close_connection(self):
-        """ Close the connection to database
+        """ Give the connection back to its pool
         Usage:
         >>> from cvp.data.rel_database import Database
         >>> db = Database(db_path)
@@ -80,14 +423,17 @@ class Database:
         Returns:
         """
         if self.conn != None:
-            self.conn.close()
+            self.cursor.close()
+            self.pool.release(self.conn)
+            self.conn, self.cursor = None, None
 
-        if self.engine != None:
-            self.engine.dispose()
+        if self.__engine != None:
+            self.__engine.dispose()
+            self.__engine = None
 
         logger.info('SUCCESS: Connection Closed')
 
-    def create_table(self, attr: dict, table_name: str, foreign_key: dict = None):
+    def create_table(self, attr: dict, table_name: str, foreign_key: dict = None, indexes: list = None):
         """ Create new table
         Usage:
         >>> from cvp.data.rel_database import Database
@@ -101,6 +447,8 @@ class Database:
                 key = column_name, value = table_name (table_name_col)
                 Ex: foreign_key = {'user_account_id': 'profile (user_id)'}
             table_name (str): name of table
+            indexes (list): columns of the secondary indexes of the table, see create_index
+                Ex: indexes = [('user_account_id',), ('last_name', 'first_name')]
         Returns:
         """
         SQL_CreateTable = f'''CREATE TABLE IF NOT EXISTS {table_name} ('''
@@ -120,6 +468,39 @@ class Database:
             logger.error(e)
             raise Exception(e)
 
+        for columns in indexes or []:
+            self.create_index(table_name, columns)
+
+    def create_index(self, table_name: str, columns: tuple, unique: bool = False, index_name: str = None):
+        """ Create an index on columns of an existed table, if it does not exist
+        Usage:
+        >>> from cvp.data.rel_database import Database
+        >>> db = Database(db_path)
+        >>> db.create_index('account', ('User_Account_ID',))
+        Args:
+            table_name (str): name of table
+            columns (tuple): indexed columns, in order. The index serves lookups by its leading columns
+                Ex: columns = ('last_name', 'first_name')
+            unique (bool): reject two rows with the same values
+            index_name (str): name of index. Default is idx_<table_name>_<columns>
+        Returns:
+            index_name (str): name of index
+        """
+        columns = (columns,) if isinstance(columns, str) else tuple(columns)
+        index_name = index_name or '_'.join(('idx', table_name) + columns)
+        SQL_CreateIndex = (f'''CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {_identifier(index_name)} '''
+                           f'''ON {_identifier(table_name)} ({', '.join(_identifier(col) for col in columns)})''')
+
+        try:
+            self.cursor.execute(SQL_CreateIndex)
+            self.conn.commit()
+            logger.info(f'SUCCESS: Index `{index_name}` Created')
+        except sqlite3.Error as e:
+            logger.error(e)
+            raise Exception(e)
+
+        return index_name
+
     def insert(self, values: tuple, table_name: str):
         """ Insert new values into existed table
         Usage:
@@ -226,6 +607,161 @@ class Database:
             logger.error(e)
             raise Exception(e)
 
+    def select_by(self, values: str, table_name: str, where: dict = None):
+        """ Select values from existed table, the rows matching columns
+        Usage:
+        >>> from cvp.data.rel_database import Database
+        >>> db = Database(db_path)
+        >>> db.select_by('*', 'account', {'Email': email})
+        Args:
+            values (str): columns to select from database
+                Ex: values = 'userID, last_name, dob'
+            table_name (str): name of table
+            where (dict): value of the rows by column, all rows if None
+                Ex: where = {'userID': 1, 'last_name': 'last'}
+        Returns:
+            result (list<tuple>): list of tuples with values
+        """
+        where = where or dict()
+        SQL_Select = self.pool.statements.get(
+            ('select', values, table_name, tuple(where)),
+            lambda: _select(values, table_name, where))
+        return self.__execute(SQL_Select, tuple(where.values()), fetch=True)
+
+    def update_by(self, values: dict, table_name: str, where: dict):
+        """ Update values from existed table, the rows matching columns
+        Usage:
+        >>> from cvp.data.rel_database import Database
+        >>> db = Database(db_path)
+        >>> db.update_by({'Password': password}, 'account', {'User_Account_ID': 1})
+        Args:
+            values (dict): new value by column
+                Ex: values = {'last_name': 'last', 'dob': '12/31/2021'}
+            table_name (str): name of table
+            where (dict): value of the rows to update by column
+                Ex: where = {'userID': 1}
+        Returns:
+        """
+        SQL_Update = self.pool.statements.get(
+            ('update', tuple(values), table_name, tuple(where)),
+            lambda: f'''UPDATE {_identifier(table_name)} SET ''' +
+                    ', '.join(f'{_identifier(col)} = ?' for col in values) + _where(where))
+        self.__execute(SQL_Update, tuple(values.values()) + tuple(where.values()))
+
+    def delete_by(self, table_name: str, where: dict):
+        """ Delete values from existed table, the rows matching columns
+        Usage:
+        >>> from cvp.data.rel_database import Database
+        >>> db = Database(db_path)
+        >>> db.delete_by('account', {'User_Account_ID': 1})
+        Args:
+            table_name (str): name of table
+            where (dict): value of the rows to delete by column
+                Ex: where = {'userID': 1234}
+        Returns:
+        """
+        SQL_Delete = self.pool.statements.get(
+            ('delete', table_name, tuple(where)),
+            lambda: f'''DELETE FROM {_identifier(table_name)}''' + _where(where))
+        self.__execute(SQL_Delete, tuple(where.values()))
+
+    def explain(self, sql: str):
+        """ Get the query plan of a statement
+        Usage:
+        >>> from cvp.data.rel_database import Database
+        >>> db = Database(db_path)
+        >>> db.explain('SELECT * FROM account WHERE User_Account_ID = ?')
+        ['SEARCH account USING INDEX idx_account_User_Account_ID (User_Account_ID=?)']
+        Args:
+            sql (str): statement, its ? placeholders are left unbound
+        Returns:
+            plan (list<str>): steps of the plan, Ex: 'SCAN account' for a read of the whole table
+        """
+        try:
+            self.cursor.execute(f'EXPLAIN QUERY PLAN {sql}', (None,) * sql.count('?'))
+            return [row[-1] for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(e)
+            raise Exception(e)
+
+    def full_scans(self, statements: list = None):
+        """ Find the statements reading a whole table instead of searching an index
+        Usage:
+        >>> from cvp.data.rel_database import Database
+        >>> db = Database(db_path)
+        >>> db.full_scans()
+        Args:
+            statements (list<str>): statements to check. Default is those issued by the *_by methods, cached
+                by the pool
+        Returns:
+            scans (list<dict>): {'sql', 'table', 'detail'} of each table scan, empty if every lookup is indexed.
+                Statements which cannot be planned any more are skipped
+        """
+        statements = self.pool.statements.sql if statements is None else statements
+        scans = []
+        for sql in statements:
+            try:
+                plan = self.explain(sql)
+            except Exception:  # Ex: a statement cached before its table was dropped
+                logger.warning(f'Could not plan, skipped: {sql}')
+                continue
+
+            for detail in plan:
+                match = FULL_SCAN.match(detail)
+                if match and match.group(1) != 'CONSTANT':
+                    scans.append({'sql': sql, 'table': match.group(1), 'detail': detail})
+        return scans
+
+    def __execute(self, sql: str, parameters: tuple, fetch: bool = False):
+        """ Execute a statement with bound parameters, commit it unless fetching rows """
+        try:
+            self.cursor.execute(sql, parameters)
+            if fetch:
+                return self.cursor.fetchall()
+            self.conn.commit()
+            logger.info('SUCCESS: Statement executed successfully!')
+        except sqlite3.Error as e:
+            logger.error(e)
+            raise Exception(e)
+
+
+def _identifier(name: str):
+    """ Check a table or column name before it goes in SQL text, since it cannot be bound """
+    if not IDENTIFIER.match(name):
+        raise ValueError(f'Invalid table or column name: {name!r}')
+    return name
+
+
+def _where(where: dict):
+    """ WHERE clause matching each column of where with a placeholder, empty if no column """
+    if not where:
+        return ''
+    return ' WHERE ' + ' AND '.join(f'{_identifier(col)} = ?' for col in where)
+
+
+def _select(values: str, table_name: str, where):
+    """ SQL text of select_by """
+    return f'''SELECT {values} FROM {_identifier(table_name)}''' + _where(where)
+
+
+def check_lookups(db_path: str, lookups: list):
+    """ Log the lookups of a database which would scan a whole table
+    Args:
+        db_path (str): path to the database
+        lookups (list): (table_name, columns) of the lookups, Ex: LOOKUPS['cvp']
+    Returns:
+        scans (list<dict>): see Database.full_scans
+    """
+    db = Database(db_path)
+    try:
+        scans = db.full_scans([_select('*', table_name, columns) for table_name, columns in lookups])
+    finally:
+        db.close_connection()
+
+    for scan in scans:
+        logger.warning(f"Full scan of `{scan['table']}`, declare an index for: {scan['sql']}")
+    return scans
+
 
 def main(db_path: dict, account_path: str = None, hist_log_path: str = None):
     account_path = account_path or ACCOUNT_PATH
@@ -236,11 +772,9 @@ def main(db_path: dict, account_path: str = None, hist_log_path: str = None):
 
     # Make cvp.db
     logger.info('Preparing to make cvp database...')
-    if os.path.exists(db_path.get('cvp')):
-        os.remove(db_path.get('cvp'))
-
-    if os.path.exists(db_path.get('cdc')):
-        os.remove(db_path.get('cdc'))
+    for path in (db_path.get('cvp'), db_path.get('cdc')):
+        remove_database(path)
+        get_pool(path, profile='bulk_load')
 
     df = pd.read_csv(account_path, sep='\t')
     # df.drop_duplicates(subset=['Email'], inplace=True)
@@ -287,7 +821,10 @@ def main(db_path: dict, account_path: str = None, hist_log_path: str = None):
     foreign_key = {
         'User_Account_ID': 'profile (User_Account_ID)'
     }
-    db.create_table(attr, table_name, foreign_key)
+    indexes = [
+        ('User_Account_ID',)  # authenticate, update_account and get_profile find the account of a profile
+    ]
+    db.create_table(attr, table_name, foreign_key, indexes)
     account_df.to_sql(table_name, con=db.engine, if_exists='append', index=False)
     logger.info(f'SUCCESS: Insert values to `{table_name}` successfully!')
 
@@ -295,6 +832,15 @@ def main(db_path: dict, account_path: str = None, hist_log_path: str = None):
 
     db.close_connection()
 
+    # Make the Merkle tree of the profile chain, next to cvp.db
+    tree_path = merkle_path(db_path.get('cvp'))
+    if os.path.exists(tree_path):
+        os.remove(tree_path)
+
+    tree = MerkleTree(tree_path)
+    tree.sync(db_path.get('cvp'))
+    tree.close()
+
     # Make cdc.db
     logger.info('Preparing to make cdc database...')
     table_name = 'profile'
@@ -332,8 +878,18 @@ def main(db_path: dict, account_path: str = None, hist_log_path: str = None):
 
     # Make history logs to store all block_hash
     hist_log_path = hist_log_path or HISTORY_LOG_PATH
+    if os.path.exists(hist_log_path):
+        os.remove(hist_log_path)
+
     log_cols = ['User_Account_ID', 'Block_Hash']
-    df[log_cols].to_csv(hist_log_path, index=False, sep='\t')
+    history_log = HistoryLog(hist_log_path)
+    history_log.extend(df[log_cols].itertuples(index=False))
+    history_log.close()
+
+    # Every lookup of the app utilities should search an index
+    for name, lookups in LOOKUPS.items():
+        check_lookups(db_path.get(name), lookups)
+        close_pool(db_path.get(name))  # done loading, the next connections get the default profile
 
 
     logger.info('Finished operation')
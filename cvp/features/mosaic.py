@@ -0,0 +1,153 @@
+"""Mosaic Operation
+
+Mosaic operations module currently contains functions for the following:
+- merge_regions
+- pack_tiles
+- build_mosaic
+
+A mosaic is a compact image made of the parts of a card that the template reads. Overlapping regions are cropped
+once as their union, the crops are packed on shelves separated by white gaps, and every region is mapped to its
+position in the mosaic so the text found there can be read back by field name.
+
+USAGE
+-----
+
+>>> from cvp.features.mosaic import build_mosaic
+>>> mosaic = build_mosaic(content, COORDINATE)
+>>> info = extract_regions(document_of_mosaic, mosaic.regions)
+
+"""
+# Standard Dist
+import coloredlogs
+import io
+import logging
+import math
+from collections import namedtuple
+
+# Third Party Imports
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Project Level Imports
+
+logger = logging.getLogger(__name__)
+coloredlogs.install(level='DEBUG', logger=logger)
+
+MOSAIC_GAP = 32  # white pixels around tiles, so the OCR does not join text of neighbouring tiles
+JPEG_QUALITY = 85
+
+Mosaic = namedtuple('Mosaic', ['content', 'regions', 'size'])
+
+
+def merge_regions(regions: dict):
+    """Merge overlapping regions into their union
+
+    Usage:
+
+    >>> from cvp.features.mosaic import merge_regions
+    >>> tiles = merge_regions(COORDINATE)
+
+    Args:
+        regions (dict): boundaries [x1, y1, x2, y2] by field name
+
+    Returns:
+        tiles (list<tuple>): (boundary, names) of each union, boundary is [x1, y1, x2, y2] and names the fields
+            within it
+    """
+    tiles = [(list(boundary), [key]) for key, boundary in regions.items()]
+
+    merged = True
+    while merged:  # merging two tiles may make the union overlap another tile
+        merged = False
+        for i in range(len(tiles)):
+            for j in range(i + 1, len(tiles)):
+                a, b = tiles[i][0], tiles[j][0]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    union = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    tiles[i] = (union, tiles[i][1] + tiles[j][1])
+                    del tiles[j]
+                    merged = True
+                    break
+            if merged:
+                break
+
+    return tiles
+
+
+def pack_tiles(sizes: list, gap: int = None):
+    """Pack tiles on shelves, tallest first, each shelf as wide as the widest tile
+
+    Args:
+        sizes (list<tuple>): (width, height) of each tile
+        gap (int): white pixels around tiles
+
+    Returns:
+        offsets (list<tuple>): (x, y) of the top left corner of each tile
+        size (tuple): (width, height) of the mosaic
+    """
+    gap = MOSAIC_GAP if gap is None else gap
+    if not sizes:
+        return [], (0, 0)
+
+    area = sum(width * height for width, height in sizes)
+    shelf_width = max(max(width for width, _ in sizes), int(math.sqrt(area)))
+
+    offsets = [None] * len(sizes)
+    x, y, shelf_height, mosaic_width = gap, gap, 0, 0
+    for i in sorted(range(len(sizes)), key=lambda i: -sizes[i][1]):
+        width, height = sizes[i]
+        if x > gap and x + width > shelf_width + gap:  # start a new shelf
+            x, y, shelf_height = gap, y + shelf_height + gap, 0
+
+        offsets[i] = (x, y)
+        x += width + gap
+        shelf_height = max(shelf_height, height)
+        mosaic_width = max(mosaic_width, x)
+
+    return offsets, (mosaic_width, y + shelf_height + gap)
+
+
+def build_mosaic(content: bytes, regions: dict, gap: int = None, quality: int = None):
+    """Crop the regions of an image and pack them into one compact mosaic
+
+    Args:
+        content (bytes): content of the image
+        regions (dict): boundaries [x1, y1, x2, y2] by field name, in pixels of the image
+        gap (int): white pixels around tiles
+        quality (int): JPEG quality of the mosaic
+
+    Returns:
+        mosaic (Mosaic): content of the mosaic (bytes), boundaries of the regions in the mosaic by field name
+            and (width, height) of the mosaic. None if the content is not an image Pillow can decode
+    """
+    quality = quality or JPEG_QUALITY
+    try:
+        image = Image.open(io.BytesIO(content))
+        image = ImageOps.exif_transpose(image).convert('L')
+    except (UnidentifiedImageError, OSError) as err:
+        logger.debug(f'Mosaic was not built: {err}')
+        return None
+
+    tiles = []
+    for boundary, names in merge_regions(regions):
+        # Clip to the image, a region may run past the edge of a smaller photo
+        x1, y1 = max(boundary[0], 0), max(boundary[1], 0)
+        x2, y2 = min(boundary[2], image.width), min(boundary[3], image.height)
+        if x2 > x1 and y2 > y1:
+            tiles.append(([x1, y1, x2, y2], names))
+
+    offsets, size = pack_tiles([(x2 - x1, y2 - y1) for (x1, y1, x2, y2), _ in tiles], gap)
+    mosaic = Image.new('L', (max(size[0], 1), max(size[1], 1)), color=255)
+
+    mosaic_regions = {key: [0, 0, 0, 0] for key in regions}  # regions outside the image stay empty
+    for ((x1, y1, x2, y2), names), (x, y) in zip(tiles, offsets):
+        mosaic.paste(image.crop((x1, y1, x2, y2)), (x, y))
+        for key in names:
+            # Clip to the tile so the region does not reach into its neighbours
+            boundary = regions[key]
+            mosaic_regions[key] = [max(boundary[0], x1) - x1 + x, max(boundary[1], y1) - y1 + y,
+                                   min(boundary[2], x2) - x1 + x, min(boundary[3], y2) - y1 + y]
+
+    output = io.BytesIO()
+    mosaic.save(output, format='JPEG', quality=quality, optimize=True)
+    logger.debug(f'Mosaic of {len(tiles)} tiles: {image.size} -> {mosaic.size}')
+    return Mosaic(output.getvalue(), mosaic_regions, mosaic.size)
@@ -5,6 +5,10 @@ OCR_Helper operations module currently contains functions for the following:
 - find_word_location
 - text_within
 
+and the following classes:
+- SymbolIndex, a flattened and grid indexed view of the symbols of a document
+- WordIndex, a lookup table of every occurrence of each word of a document
+
 USAGE
 -----
 
@@ -17,12 +21,290 @@ import logging
 import os
 
 # Third Party Imports
+import numpy as np
 
 # Project Level Imports
 
 logger = logging.getLogger(__name__)
 coloredlogs.install(level='DEBUG', logger=logger)
 
+GRID_CELL_SIZE = 64  # side (in pixels) of a cell of the symbol grid
+
+
+class SymbolIndex(object):
+    """Flattened view of every symbol of a document, indexed by a uniform grid
+
+    The document is traversed once. Each symbol is stored as a row of `boxes` (min_x, min_y, max_x, max_y),
+    with its text, the word it belongs to and its page. Symbols are bucketed in a grid by the cell of their
+    top-left corner, so a containment query only checks the rows of the cells covered by the boundary.
+
+    Usage:
+
+    >>> from cvp.features.ocr_helper import SymbolIndex
+    >>> index = SymbolIndex(document)
+    >>> text = text_within(index, x1, y1, x2, y2)
+    """
+
+    def __init__(self, document, cell_size: int = None):
+        """Flatten the document into NumPy arrays and build the grid
+
+        Args:
+            document (google.cloud.vision_v1.types.text_annotation.TextAnnotation): json file of the image
+            cell_size (int): side (in pixels) of a grid cell
+        """
+        self.cell_size = cell_size or GRID_CELL_SIZE
+
+        boxes, texts, word_ids, page_ids = [], [], [], []
+        word_id = 0
+        for page_id, page in enumerate(_raw(document).pages):
+            for block in page.blocks:
+                for paragraph in block.paragraphs:
+                    for word in paragraph.words:
+                        for symbol in word.symbols:
+                            boxes.append(_box(symbol.bounding_box, page.width, page.height))
+                            texts.append(symbol.text)
+                            word_ids.append(word_id)
+                            page_ids.append(page_id)
+                        word_id += 1
+
+        self.num_pages = len(_raw(document).pages)
+        self.boxes = np.array(boxes, dtype=np.int64).reshape(-1, 4)
+        self.texts = texts
+        self.word_ids = np.array(word_ids, dtype=np.int64)
+        self.page_ids = np.array(page_ids, dtype=np.int64)
+
+        # Sort symbols by the grid cell of their top-left corner, cells numbered row by row
+        cells_x = np.maximum(self.boxes[:, 0], 0) // self.cell_size
+        cells_y = np.maximum(self.boxes[:, 1], 0) // self.cell_size
+        self.num_cols = int(cells_x.max()) + 1 if len(texts) else 1
+        self.num_rows = int(cells_y.max()) + 1 if len(texts) else 1
+        cell_keys = cells_y * self.num_cols + cells_x
+        self._order = np.argsort(cell_keys, kind='stable')
+        self._sorted_keys = cell_keys[self._order]
+
+    def __len__(self):
+        return len(self.texts)
+
+    def query(self, x1, y1, x2, y2, page: int = None):
+        """Find the symbols entirely within the given boundary
+
+        Args:
+            x1 (int): lowest x position of the boundary
+            y1 (int): lowest y position of the boundary
+            x2 (int): highest x position of the boundary
+            y2 (int): highest y position of the boundary
+            page (int): only search this page (0-based). Search all pages if None
+
+        Returns:
+            indices (numpy.ndarray): indices of the matching symbols, in reading order
+        """
+        if not len(self) or x2 < x1 or y2 < y1:
+            return np.empty(0, dtype=np.int64)
+
+        candidates = self._candidates(x1, y1, x2, y2)
+        boxes = self.boxes[candidates]
+        inside = (boxes[:, 0] >= x1) & (boxes[:, 2] <= x2) & (boxes[:, 1] >= y1) & (boxes[:, 3] <= y2)
+        if page is not None:
+            inside &= self.page_ids[candidates] == page
+
+        return np.sort(candidates[inside])
+
+    def query_regions(self, regions, page: int = None):
+        """Find the symbols entirely within each of several boundaries with a single containment test
+
+        The candidates of each boundary are looked up in the grid cells it covers, then all (symbol, boundary)
+        pairs are tested at once, so the work grows with the symbols near the boundaries instead of with the
+        symbols of the document times the boundaries. A symbol lying in overlapping boundaries is assigned to
+        each of them.
+
+        Args:
+            regions (list): boundaries [x1, y1, x2, y2]
+            page (int): only search this page (0-based). Search all pages if None
+
+        Returns:
+            indices (list<numpy.ndarray>): indices of the matching symbols of each boundary, in reading order
+        """
+        regions = np.array(regions, dtype=np.int64).reshape(-1, 4)
+        if not len(self) or not len(regions):
+            return [np.empty(0, dtype=np.int64) for _ in regions]
+
+        candidates = [self._candidates(*region) if region[2] >= region[0] and region[3] >= region[1]
+                      else np.empty(0, dtype=np.int64) for region in regions]
+        symbols = np.concatenate(candidates)
+        owners = np.repeat(np.arange(len(regions)), [len(candidate) for candidate in candidates])
+
+        boxes, bounds = self.boxes[symbols], regions[owners]
+        inside = (boxes[:, 0] >= bounds[:, 0]) & (boxes[:, 2] <= bounds[:, 2]) & \
+                 (boxes[:, 1] >= bounds[:, 1]) & (boxes[:, 3] <= bounds[:, 3])
+        if page is not None:
+            inside &= self.page_ids[symbols] == page
+
+        # Group the matches by boundary, each group in reading order
+        symbols, owners = symbols[inside], owners[inside]
+        order = np.lexsort((symbols, owners))
+        symbols, owners = symbols[order], owners[order]
+        return np.split(symbols, np.searchsorted(owners, np.arange(1, len(regions))))
+
+    def _candidates(self, x1, y1, x2, y2):
+        """Indices of the symbols whose top-left corner is in a grid cell covered by the boundary"""
+        # A contained symbol has its top-left corner in one of the cells covered by the boundary
+        col_1 = max(int(x1) // self.cell_size, 0)
+        col_2 = min(int(x2) // self.cell_size, self.num_cols - 1)
+        row_1 = max(int(y1) // self.cell_size, 0)
+        row_2 = min(int(y2) // self.cell_size, self.num_rows - 1)
+        if col_2 < col_1 or row_2 < row_1:
+            return np.empty(0, dtype=np.int64)
+
+        rows = np.arange(row_1, row_2 + 1) * self.num_cols
+        starts = np.searchsorted(self._sorted_keys, rows + col_1, side='left')
+        ends = np.searchsorted(self._sorted_keys, rows + col_2, side='right')
+        return np.concatenate([self._order[start:end] for start, end in zip(starts, ends)])
+
+    def join_text(self, indices):
+        """Join symbols into text, with a space for every word boundary crossed between them
+
+        Args:
+            indices (numpy.ndarray): indices of symbols, in reading order
+
+        Returns:
+            text (str): text of the symbols
+        """
+        text = ""
+        prev_word = None
+        for index in indices:
+            word = self.word_ids[index]
+            if prev_word is not None and word != prev_word:
+                text += ' ' * int(word - prev_word)
+            text += self.texts[index]
+            prev_word = word
+        return text.strip()
+
+
+class WordIndex(object):
+    """Lookup table from word text to the bounding boxes of all its occurrences in a document
+
+    The document is traversed once, then finding a word costs a dictionary lookup, and finding a phrase costs a
+    lookup plus a check of the words following each occurrence of its first word.
+
+    Usage:
+
+    >>> from cvp.features.ocr_helper import WordIndex
+    >>> index = WordIndex(document)
+    >>> locations = index.find('Vaccine', ignore_case=True)
+    """
+
+    def __init__(self, document):
+        """Assemble every word of the document and index it by its exact and its case-folded text
+
+        Args:
+            document (google.cloud.vision_v1.types.text_annotation.TextAnnotation): json file of the image
+        """
+        self.words = []  # assembled words, in reading order
+        self.bounding_boxes = []  # google.cloud.vision_v1.types.geometry.BoundingPoly of each word
+        self.page_ids = []
+        boxes = []
+        for page_id, page in enumerate(document.pages):
+            for block in page.blocks:
+                for paragraph in block.paragraphs:
+                    for word in paragraph.words:
+                        self.words.append(''.join([symbol.text for symbol in word.symbols]))
+                        self.bounding_boxes.append(word.bounding_box)
+                        self.page_ids.append(page_id)
+                        boxes.append(_box(word.bounding_box, page.width, page.height))
+
+        self.boxes = np.array(boxes, dtype=np.int64).reshape(-1, 4)
+
+        self._exact = dict()
+        self._folded = dict()
+        for position, word in enumerate(self.words):
+            self._exact.setdefault(word, []).append(position)
+            self._folded.setdefault(word.casefold(), []).append(position)
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self._exact
+
+    def positions(self, word: str, ignore_case: bool = False):
+        """Find the positions (in reading order) of every occurrence of a word
+
+        Args:
+            word (str): target word
+            ignore_case (bool): match regardless of case
+
+        Returns:
+            positions (list<int>): positions of the word, empty if not found
+        """
+        if ignore_case:
+            return self._folded.get(word.casefold(), [])
+        return self._exact.get(word, [])
+
+    def find(self, word: str, ignore_case: bool = False):
+        """Find every occurrence of a word
+
+        Args:
+            word (str): target word
+            ignore_case (bool): match regardless of case
+
+        Returns:
+            bounding_boxes (list<google.cloud.vision_v1.types.geometry.BoundingPoly>): Position (x,y) of each
+                occurrence of the word, empty if not found
+        """
+        return [self.bounding_boxes[position] for position in self.positions(word, ignore_case)]
+
+    def find_phrase(self, phrase: str, ignore_case: bool = False):
+        """Find every occurrence of consecutive words on the same page
+
+        Args:
+            phrase (str): target words separated by spaces
+            ignore_case (bool): match regardless of case
+
+        Returns:
+            boundaries (list<tuple>): boundary (x1, y1, x2, y2) enclosing each occurrence of the phrase
+        """
+        tokens = phrase.split()
+        if not tokens:
+            return []
+        if ignore_case:
+            tokens = [token.casefold() for token in tokens]
+
+        boundaries = []
+        for start in self.positions(tokens[0], ignore_case):
+            end = start + len(tokens)
+            if end > len(self.words) or self.page_ids[end - 1] != self.page_ids[start]:
+                continue
+
+            words = self.words[start:end]
+            if ignore_case:
+                words = [word.casefold() for word in words]
+
+            if words == tokens:
+                boxes = self.boxes[start:end]
+                boundaries.append((int(boxes[:, 0].min()), int(boxes[:, 1].min()),
+                                   int(boxes[:, 2].max()), int(boxes[:, 3].max())))
+
+        return boundaries
+
+
+def _raw(document):
+    """Get the raw protobuf message behind a proto-plus message, which is much faster to traverse"""
+    return getattr(document, '_pb', document)
+
+
+def _box(bounding_box, width, height):
+    """Get (min_x, min_y, max_x, max_y) of a BoundingPoly in pixels of its page
+
+    Responses of the file annotation API (PDF) only give normalized vertices, they are scaled by the page size.
+    """
+    if bounding_box.vertices or not bounding_box.normalized_vertices:
+        xs = [vertex.x for vertex in bounding_box.vertices] or [0]
+        ys = [vertex.y for vertex in bounding_box.vertices] or [0]
+    else:
+        xs = [round(vertex.x * width) for vertex in bounding_box.normalized_vertices]
+        ys = [round(vertex.y * height) for vertex in bounding_box.normalized_vertices]
+    return min(xs), min(ys), max(xs), max(ys)
+
 
 def assemble_word(word):
     """Join characters into a complete word
@@ -38,10 +320,7 @@ def assemble_word(word):
     Returns:
         assembled_word (str): a complete word
     """
-    assembled_word = ""
-    for symbol in word.symbols:
-        assembled_word += symbol.text
-    return assembled_word
+    return ''.join([symbol.text for symbol in word.symbols])
 
 
 def find_word_location(document, word_to_find):
@@ -53,19 +332,18 @@ def find_word_location(document, word_to_find):
     >>> location = find_word_location(document, word_to_find)
 
     Args:
-        document (google.cloud.vision_v1.types.text_annotation.TextAnnotation): json file of the image
+        document (google.cloud.vision_v1.types.text_annotation.TextAnnotation or WordIndex): json file of the
+            image, or a WordIndex built from it to locate several words on the same document
         word_to_find (str): target word
 
     Return:
-        word.bouding_box (google.cloud.vision_v1.types.geometry.BoundingPoly): Position (x,y) of the word in the image
+        word.bouding_box (google.cloud.vision_v1.types.geometry.BoundingPoly): Position (x,y) of the first
+            occurrence of the word in the image, None if not found
     """
-    for page in document.pages:
-        for block in page.blocks:
-            for paragraph in block.paragraphs:
-                for word in paragraph.words:
-                    assembled_word = assemble_word(word)
-                    if assembled_word == word_to_find:
-                        return word.bounding_box
+    index = document if isinstance(document, WordIndex) else WordIndex(document)
+    locations = index.find(word_to_find)
+    if locations:
+        return locations[0]
 
 
 def text_within(document, x1, y1, x2, y2):
@@ -78,33 +356,19 @@ def text_within(document, x1, y1, x2, y2):
 
     Args:
 
-        document (google.cloud.vision_v1.types.text_annotation.TextAnnotation): json file of the image
+        document (google.cloud.vision_v1.types.text_annotation.TextAnnotation or SymbolIndex): json file of the
+            image, or a SymbolIndex built from it to answer several queries on the same document
         x1 (int): lowest x position of the boundary
         y1 (int): lowest y position of the boundary
         x2 (int): highest x position of the boundary
         y2 (int): highest y position of the boundary
 
     Returns:
-        text (str): the word within the boundary, None if boundary is empty
+        text (str): the words within the boundary on every page, in reading order. None if the document has no
+            pages
     """
-    text = ""
-    for page in document.pages:
-        for block in page.blocks:
-            for paragraph in block.paragraphs:
-                for word in paragraph.words:
-                    for symbol in word.symbols:
-                        min_x = min(symbol.bounding_box.vertices[0].x, symbol.bounding_box.vertices[1].x,
-                                    symbol.bounding_box.vertices[2].x, symbol.bounding_box.vertices[3].x)
-                        max_x = max(symbol.bounding_box.vertices[0].x, symbol.bounding_box.vertices[1].x,
-                                    symbol.bounding_box.vertices[2].x, symbol.bounding_box.vertices[3].x)
-                        min_y = min(symbol.bounding_box.vertices[0].y, symbol.bounding_box.vertices[1].y,
-                                    symbol.bounding_box.vertices[2].y, symbol.bounding_box.vertices[3].y)
-                        max_y = max(symbol.bounding_box.vertices[0].y, symbol.bounding_box.vertices[1].y,
-                                    symbol.bounding_box.vertices[2].y, symbol.bounding_box.vertices[3].y)
-
-                        if min_x >= x1 and max_x <= x2 and min_y >= y1 and max_y <= y2:
-                            text += symbol.text
-
-                    text += ' '
-
-        return text.strip()
\ No newline at end of file
+    index = document if isinstance(document, SymbolIndex) else SymbolIndex(document)
+    if not index.num_pages:
+        return None
+
+    return index.join_text(index.query(x1, y1, x2, y2))
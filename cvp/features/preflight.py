@@ -0,0 +1,214 @@
+"""Preflight Operation
+
+Preflight operations module currently contains DuplicateDetector class and the following functions:
+- sniff_format
+- dhash
+- hamming_distance
+- check_upload
+
+Checks an upload before it is sent to OCR, so files that cannot be read and repeated submissions are answered
+without a Vision round trip. The format is sniffed from the header of the file rather than its extension, the
+size is read from the header without decoding the image, and the perceptual hash (dHash) of the image is compared
+to the ones submitted before.
+
+USAGE
+-----
+
+>>> from cvp.features.preflight import check_upload, DuplicateDetector
+>>> duplicates = DuplicateDetector()
+>>> upload = check_upload(content)
+>>> previous = duplicates.find(email, upload.dhash)
+
+"""
+# Standard Dist
+import coloredlogs
+import io
+import logging
+import threading
+from collections import namedtuple
+
+# Third Party Imports
+from cachetools import TTLCache
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Project Level Imports
+from cvp.model.ocr_model import is_pdf
+
+logger = logging.getLogger(__name__)
+coloredlogs.install(level='DEBUG', logger=logger)
+
+# Leading bytes of each format the Vision API reads
+SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'BM', 'bmp'),
+    (b'II*\x00', 'tiff'),
+    (b'MM\x00*', 'tiff')
+]
+MIN_SIZE = (600, 453)  # half of the reference scan of the card templates, text is unreadable below
+HASH_SIZE = 8  # dHash of HASH_SIZE x HASH_SIZE bits
+MAX_DISTANCE = 6  # bits two dHashes may differ by and still be near-duplicates
+MAX_SCOPES = 4096  # scopes (Ex: emails) remembered by DuplicateDetector
+MAX_PER_SCOPE = 16  # submissions remembered by scope
+TTL = 24 * 3600  # seconds a submission is remembered
+EXIF_ORIENTATION = 0x0112
+ROTATED_ORIENTATIONS = (5, 6, 7, 8)  # orientations turning the image by a quarter
+
+Upload = namedtuple('Upload', ['format', 'size', 'dhash'])
+
+
+class PreflightError(ValueError):
+    """ Raised by check_upload for a file that should not be sent to OCR, the message can be shown to the user """
+
+
+def sniff_format(content: bytes):
+    """Get the real format of a file from its header
+
+    Args:
+        content (bytes): content of the file
+
+    Returns:
+        format (str): 'png', 'jpeg', 'gif', 'bmp', 'tiff', 'webp' or 'pdf', None if not one of them
+    """
+    for signature, file_format in SIGNATURES:
+        if content.startswith(signature):
+            return file_format
+    if content[:4] == b'RIFF' and content[8:12] == b'WEBP':
+        return 'webp'
+    if is_pdf(content):
+        return 'pdf'
+    return None
+
+
+def dhash(image, hash_size: int = None):
+    """Compute the difference hash of an image, which barely changes when the image is resized or recompressed
+
+    Args:
+        image (PIL.Image.Image): image to hash
+        hash_size (int): side of the hash, the hash has hash_size * hash_size bits
+
+    Returns:
+        hash (int): one bit per pair of horizontally adjacent pixels of the shrunk image, set if the left one is
+            brighter
+    """
+    hash_size = hash_size or HASH_SIZE
+    pixels = image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS).tobytes()
+
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def hamming_distance(hash_1: int, hash_2: int):
+    """Count the bits two hashes differ by"""
+    return bin(hash_1 ^ hash_2).count('1')
+
+
+def check_upload(content: bytes, min_size: tuple = None):
+    """Check that an upload is worth sending to OCR
+
+    Usage:
+
+    >>> from cvp.features.preflight import check_upload
+    >>> upload = check_upload(content)
+
+    Args:
+        content (bytes): content of the uploaded file
+        min_size (tuple): smallest (width, height) of an image. Default is MIN_SIZE
+
+    Returns:
+        upload (Upload): format, (width, height) and dHash of the image. size and dhash are None for a PDF
+
+    Raises:
+        PreflightError: the file is empty, not a supported format, corrupt or too small
+    """
+    min_size = min_size or MIN_SIZE
+    if not content:
+        raise PreflightError('The uploaded file is empty.')
+
+    file_format = sniff_format(content)
+    if file_format is None:
+        raise PreflightError('The uploaded file is not an image or a PDF.')
+    if file_format == 'pdf':
+        return Upload(file_format, None, None)
+
+    try:
+        image = Image.open(io.BytesIO(content))  # reads the header only
+        size = image.size
+        if image.getexif().get(EXIF_ORIENTATION, 1) in ROTATED_ORIENTATIONS:
+            size = size[::-1]
+        if size[0] < min_size[0] or size[1] < min_size[1]:
+            raise PreflightError(f'The image is too small to be read ({size[0]}x{size[1]}), it should be at '
+                                 f'least {min_size[0]}x{min_size[1]}.')
+
+        image.draft('L', (min_size[0] // 4, min_size[1] // 4))  # JPEG only: decode at a fraction of the size
+        return Upload(file_format, size, dhash(ImageOps.exif_transpose(image)))
+    except Image.DecompressionBombError as err:  # a few MB of file decoding into GB of pixels
+        logger.debug(f'Upload is a decompression bomb: {err}')
+        raise PreflightError('The uploaded image is too large to be read.')
+    except (UnidentifiedImageError, OSError, SyntaxError) as err:
+        logger.debug(f'Upload could not be decoded: {err}')
+        raise PreflightError('The uploaded image is corrupt.')
+
+
+class DuplicateDetector(object):
+    """ Remembers the dHash of the recent submissions of each scope to find near-duplicates
+
+    Submissions are only compared within a scope (Ex: the email registering), so a submission never resolves to
+    another user's one.
+    """
+
+    def __init__(self, max_distance: int = None, max_scopes: int = None, ttl: float = None):
+        """
+        Args:
+            max_distance (int): bits two dHashes may differ by and still be near-duplicates
+            max_scopes (int): scopes remembered, the least recently used are forgotten beyond
+            ttl (float): seconds a scope is remembered after its last submission
+        """
+        self.max_distance = MAX_DISTANCE if max_distance is None else max_distance
+        self.submissions = TTLCache(maxsize=max_scopes or MAX_SCOPES, ttl=ttl or TTL)
+        self.lock = threading.Lock()
+
+    def find(self, scope: str, image_hash: int):
+        """ Find the closest near-duplicate of an image among the submissions of a scope
+        Args:
+            scope (str): scope of the submission
+            image_hash (int): dHash of the image
+        Returns:
+            value: value added with the closest near-duplicate, None if there is none
+        """
+        if image_hash is None:
+            return None
+
+        with self.lock:
+            submissions = list(self.submissions.get(scope, ()))
+
+        best, best_distance = None, self.max_distance + 1
+        for other_hash, value in submissions:
+            distance = hamming_distance(image_hash, other_hash)
+            if distance < best_distance:
+                best, best_distance = value, distance
+
+        if best is not None:
+            logger.debug(f'Near-duplicate submission, {best_distance} bits apart')
+        return best
+
+    def add(self, scope: str, image_hash: int, value):
+        """ Remember a submission
+        Args:
+            scope (str): scope of the submission
+            image_hash (int): dHash of the image
+            value: returned by find for the near-duplicates of the image, Ex: id of its OCR job
+        """
+        if image_hash is None:
+            return
+
+        with self.lock:
+            submissions = self.submissions.get(scope, [])
+            self.submissions[scope] = (submissions + [(image_hash, value)])[-MAX_PER_SCOPE:]
@@ -2,19 +2,31 @@
 
 Transform operations module currently contains functions for the following:
 - generate hash for password
+- encode_password_hash
+- decode_password_hash
+- needs_rehash
+- calibrate_iterations
+- generate_block_hash
 - generate_QR_code
 
+Password hashes are stored as records carrying their parameters, `pbkdf2_sha256$<iterations>$<base64 hash>`, so
+the cost can be raised without invalidating the accounts hashed before. Records without parameters are the legacy
+base64 hashes of DEFAULT_ITERATIONS iterations.
+
 USAGE
 -----
 
-$ python cvp/features/transform.py
+$ python cvp/features/transform.py --target 0.25
 
 """
 # Standard Dist
+import argparse
 import coloredlogs
 import logging
 import os
 import hashlib
+import time
+from base64 import b64decode, b64encode
 
 # Third Party Imports
 import pyqrcode
@@ -27,9 +39,13 @@ logger = logging.getLogger(__name__)
 coloredlogs.install(level='DEBUG', logger=logger)
 
 QR_CODE_FOLDER = 'dataset/processed/QR_Code'
+HASH_ALGORITHM = 'pbkdf2_sha256'
+DEFAULT_ITERATIONS = 100000  # iterations of the legacy password hashes and of every block hash
+TARGET_SECONDS = 0.25  # time calibrate_iterations aims one password hash to take
+CALIBRATION_ITERATIONS = 20000  # iterations timed by calibrate_iterations
 
 
-def generate_hash(password: str, salt: bytes=None):
+def generate_hash(password: str, salt: bytes=None, iterations: int = None):
     """Generate hash and salt for password
 
     Usage
@@ -39,6 +55,7 @@ def generate_hash(password: str, salt: bytes=None):
     >>> hash_ salt = generate_hash(password)
 
     :param password: User's password
+    :param iterations: PBKDF2 iterations, Default is DEFAULT_ITERATIONS
     :return: hash and salt associate with that user's password
     """
     logger.info("Preparing to hash")
@@ -49,7 +66,7 @@ def generate_hash(password: str, salt: bytes=None):
     logger.debug(f"Salt: {salt}")
 
     logger.info("Hashing password ...")
-    password_hash = hashlib.pbkdf2_hmac("sha256", password, salt, 100000)
+    password_hash = hashlib.pbkdf2_hmac("sha256", password, salt, iterations or DEFAULT_ITERATIONS)
     logger.debug(f"Hash: {password_hash}")
 
     logger.info("Finished hashing password!")
@@ -57,6 +74,89 @@ def generate_hash(password: str, salt: bytes=None):
     return password_hash, salt
 
 
+def encode_password_hash(password_hash: bytes, iterations: int):
+    """Build the record of a password hash stored in the database
+
+    :param password_hash: hash from generate_hash
+    :param iterations: iterations it was generated with
+    :return: record `pbkdf2_sha256$<iterations>$<base64 hash>`
+    """
+    return f"{HASH_ALGORITHM}${iterations}${b64encode(password_hash).decode('utf-8')}"
+
+
+def decode_password_hash(record: str):
+    """Read the parameters and the hash of a password hash record
+
+    :param record: record from encode_password_hash, or a legacy base64 hash
+    :return: iterations and hash. iterations is DEFAULT_ITERATIONS for a legacy hash
+    """
+    if '$' not in record:
+        return DEFAULT_ITERATIONS, b64decode(record)
+
+    algorithm, iterations, password_hash = record.split('$')
+    if algorithm != HASH_ALGORITHM:
+        raise ValueError(f"Unknown password hash algorithm `{algorithm}`")
+    return int(iterations), b64decode(password_hash)
+
+
+def needs_rehash(record: str, iterations: int):
+    """Check if a password hash record was generated with other parameters than the current ones
+
+    :param record: record from encode_password_hash, or a legacy base64 hash
+    :param iterations: current iterations
+    :return: True if the record is legacy or has other iterations
+    """
+    return '$' not in record or decode_password_hash(record)[0] != iterations
+
+
+def calibrate_iterations(target_seconds: float = None, minimum: int = None):
+    """Find the iterations one password hash takes target_seconds with on this host
+
+    Usage
+    -----
+    >>> from cvp.features.transform import calibrate_iterations
+    >>> iterations = calibrate_iterations(0.25)
+
+    :param target_seconds: time one hash should take, Default is TARGET_SECONDS
+    :param minimum: fewest iterations returned, Default is DEFAULT_ITERATIONS
+    :return: iterations, rounded down to a multiple of 10000
+    """
+    target_seconds = target_seconds or TARGET_SECONDS
+    minimum = minimum or DEFAULT_ITERATIONS
+
+    salt = os.urandom(16)
+    timings = []
+    for _ in range(3):  # best of 3, the others were slowed down by something else
+        start = time.perf_counter()
+        hashlib.pbkdf2_hmac("sha256", b'calibration', salt, CALIBRATION_ITERATIONS)
+        timings.append(time.perf_counter() - start)
+
+    iterations_per_second = CALIBRATION_ITERATIONS / min(timings)
+    iterations = max(int(iterations_per_second * target_seconds) // 10000 * 10000, minimum)
+    logger.info(f"{iterations} iterations take about {iterations / iterations_per_second * 1000:.0f} ms")
+    return iterations
+
+
+def generate_block_hash(items: list, salt):
+    """ Generate hash for each block in the database
+
+    Args:
+        items (list): list of items that need to be converted to hash
+        salt (bytes): unique salt to generate hash
+
+    Returns:
+        cur_hash (str): hash that converted to string to stored into database and written to file
+    """
+    string = ""
+    for element in items:
+        string += str(element)
+
+    cur_hash, _ = generate_hash(string, salt)
+    cur_hash = b64encode(cur_hash).decode("utf-8")
+
+    return cur_hash
+
+
 def generate_QR_code(link: str, user_account_id: str, save=False, save_folder: str = None):
     """ Generate QR code with a given profile link
 
@@ -87,4 +187,12 @@ def generate_QR_code(link: str, user_account_id: str, save=False, save_folder: s
         qr_code.png(save_file, scale=8)
         logger.info('SUCCESS: QR_Code saved!')
 
-    logger.info('Finished operation')
\ No newline at end of file
+    logger.info('Finished operation')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Calibrate the iterations of the password hashes on this host')
+    parser.add_argument('--target', type=float, default=TARGET_SECONDS, help='seconds one password hash takes')
+    args = parser.parse_args()
+
+    print(calibrate_iterations(args.target))
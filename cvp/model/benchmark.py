@@ -0,0 +1,176 @@
+"""OCR Benchmark
+
+OCR Benchmark module measures the OCR pipeline on a folder of photos with the following functions:
+- benchmark_preprocess
+- benchmark_mosaic
+
+The backend is the one selected by the environment (see cvp.model.ocr_backend.create_backend), the OCR cache is
+disabled so every prediction goes through the backend.
+
+USAGE
+-----
+
+$ python -m cvp.model.benchmark --folder dataset/raw/vaccine_record_photos --repeat 3
+$ python -m cvp.model.benchmark --mosaic
+
+"""
+
+# Standard Dist
+import argparse
+import coloredlogs
+import logging
+import os
+import statistics
+import time
+
+# Third Party Imports
+
+# Project Level Imports
+from cvp.features.ocr_helper import SymbolIndex
+from cvp.model.ocr_backend import OCRBackend, create_backend
+from cvp.model.ocr_model import OCR_Model, FOLDER_PATH
+
+logger = logging.getLogger(__name__)
+coloredlogs.install(level=logging.DEBUG, logger=logger)
+
+
+class CountingBackend(OCRBackend):
+    """ Proxy of another backend counting the requests, the bytes sent and the symbols parsed
+
+    The documents received are only kept during the calls, their symbols are counted when symbols is read, so
+    the latency measured around the calls is the one of the backend and of the pipeline alone.
+    """
+
+    def __init__(self, backend: OCRBackend):
+        self.backend = backend
+        self.requests = 0
+        self.bytes_sent = 0
+        self.documents = []  # received since symbols was last read
+        self.__symbols = 0
+
+    def annotate(self, contents: list):
+        self.requests += 1
+        self.bytes_sent += sum(len(content) for content in contents)
+        responses = self.backend.annotate(contents)
+        self.documents.extend(response.full_text_annotation for response in responses)
+        return responses
+
+    @property
+    def symbols(self):
+        """ symbols of every document received """
+        documents, self.documents = self.documents, []
+        self.__symbols += sum(len(SymbolIndex(document)) for document in documents)
+        return self.__symbols
+
+
+def benchmark_preprocess(photos: list, folder_path: str = None, backend: OCRBackend = None, repeat: int = 1):
+    """ Compare bytes sent and end-to-end latency of predict with and without preprocess_image
+
+    Usage
+    -----
+    >>> from cvp.model.benchmark import benchmark_preprocess
+    >>> report = benchmark_preprocess(photos, folder_path)
+
+    Args:
+        photos (list<str>): names of data points
+        folder_path (str): Path to folder contains data points
+        backend (OCRBackend): backend to measure. Default is the one selected by the environment
+        repeat (int): predictions per photo and mode
+
+    Returns:
+        report (dict): bytes_sent, symbols_parsed and latency stats (seconds) of each mode ('raw',
+            'preprocessed'), bytes_saved and mean_latency_saved
+    """
+    modes = {'raw': dict(), 'preprocessed': dict(preprocess=True)}
+    report = _benchmark_modes(photos, folder_path, backend, repeat, modes)
+
+    report['bytes_saved'] = report['raw']['bytes_sent'] - report['preprocessed']['bytes_sent']
+    report['mean_latency_saved'] = report['raw']['mean_latency'] - report['preprocessed']['mean_latency']
+    logger.info(f"Saved {report['bytes_saved']} bytes and {report['mean_latency_saved'] * 1000:.1f} ms per "
+                f"prediction on average over {len(photos)} photos")
+    return report
+
+
+def benchmark_mosaic(photos: list, folder_path: str = None, backend: OCRBackend = None, repeat: int = 1):
+    """ Compare bytes sent and symbols parsed of predict with and without the field-region mosaic
+
+    Both modes preprocess the photos, so the difference is the one of the mosaic alone.
+
+    Usage
+    -----
+    >>> from cvp.model.benchmark import benchmark_mosaic
+    >>> report = benchmark_mosaic(photos, folder_path)
+
+    Args:
+        photos (list<str>): names of data points
+        folder_path (str): Path to folder contains data points
+        backend (OCRBackend): backend to measure. Default is the one selected by the environment
+        repeat (int): predictions per photo and mode
+
+    Returns:
+        report (dict): bytes_sent, symbols_parsed and latency stats (seconds) of each mode ('preprocessed',
+            'mosaic'), bytes_saved and symbols_saved
+    """
+    modes = {'preprocessed': dict(preprocess=True), 'mosaic': dict(preprocess=True, mosaic=True)}
+    report = _benchmark_modes(photos, folder_path, backend, repeat, modes)
+
+    report['bytes_saved'] = report['preprocessed']['bytes_sent'] - report['mosaic']['bytes_sent']
+    report['symbols_saved'] = report['preprocessed']['symbols_parsed'] - report['mosaic']['symbols_parsed']
+    logger.info(f"Saved {report['bytes_saved']} bytes and {report['symbols_saved']} symbols over "
+                f"{len(photos)} photos")
+    return report
+
+
+def _benchmark_modes(photos, folder_path, backend, repeat, modes):
+    """ Run predict on every photo with each OCR_Model configuration of modes (dict of keyword arguments) """
+    folder_path = folder_path or FOLDER_PATH
+    backend = backend or create_backend()
+
+    contents = []
+    for photo in photos:
+        with open(os.path.join(folder_path, photo), 'rb') as image_file:
+            contents.append(image_file.read())
+
+    report = dict()
+    for mode, options in modes.items():
+        counter = CountingBackend(backend)
+        model = OCR_Model(backend=counter, **options)
+
+        latencies = []
+        for _ in range(repeat):
+            for content in contents:
+                start = time.perf_counter()
+                model.predict(content)
+                latencies.append(time.perf_counter() - start)
+
+        report[mode] = {
+            'bytes_sent': counter.bytes_sent // repeat,
+            'symbols_parsed': counter.symbols // repeat,
+            'mean_latency': statistics.mean(latencies),
+            'median_latency': statistics.median(latencies),
+            'max_latency': max(latencies)
+        }
+        logger.info(f'{mode}: {report[mode]}')
+
+    return report
+
+
+def main(folder_path: str = None, repeat: int = 1, mosaic: bool = False):
+    folder_path = folder_path or FOLDER_PATH
+    if not os.path.exists(folder_path):
+        raise FileNotFoundError(f"Folder {folder_path} was not found. Current dir: {os.getcwd()}")
+
+    photos = sorted(os.listdir(folder_path))
+    if mosaic:
+        return benchmark_mosaic(photos, folder_path, repeat=repeat)
+    return benchmark_preprocess(photos, folder_path, repeat=repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the OCR pipeline')
+    parser.add_argument('--folder', default=FOLDER_PATH, help='folder of the photos')
+    parser.add_argument('--repeat', type=int, default=1, help='predictions per photo and mode')
+    parser.add_argument('--mosaic', action='store_true', help='compare the field-region mosaic to preprocessing')
+    args = parser.parse_args()
+
+    main(args.folder, args.repeat, args.mosaic)
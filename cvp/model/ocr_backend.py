@@ -0,0 +1,288 @@
+"""OCR Backend
+
+OCR Backend operations module currently contains the OCRBackend interface, its implementations and the following
+functions:
+- create_backend
+- iter_pages
+
+Backends:
+- GoogleVisionBackend: Google Vision API
+- RecordingBackend: proxy of another backend saving its responses to disk, keyed by image hash
+- ReplayBackend: serves saved responses back with synthetic latency, no network and no credentials needed
+
+USAGE
+-----
+
+>>> from cvp.model.ocr_backend import RecordingBackend, ReplayBackend, GoogleVisionBackend
+>>> from cvp.model.ocr_model import OCR_Model
+>>> model = OCR_Model(backend=RecordingBackend(GoogleVisionBackend(), 'dataset/processed/ocr_recordings'))
+>>> model = OCR_Model(backend=ReplayBackend('dataset/processed/ocr_recordings', latency=0.8))
+>>> for response in iter_pages(GoogleVisionBackend(), pdf_content):
+...     document = response.full_text_annotation
+
+"""
+
+# Standard Dist
+import asyncio
+import coloredlogs
+import logging
+import os
+import time
+
+# Third Party Imports
+from google.cloud import vision
+
+# Project Level Imports
+from cvp.model.ocr_cache import image_key
+
+logger = logging.getLogger(__name__)
+coloredlogs.install(level=logging.DEBUG, logger=logger)
+
+GOOGLE_CREDENTIALS_KEY = r'Google_Vision_OCR_Credentials.json'
+RECORD_DIR = 'dataset/processed/ocr_recordings'
+RECORD_FILE_EXT = '.pb'
+PDF_PAGES_PER_REQUEST = 5  # pages per file annotation request, the Vision API accepts at most 5
+PDF_MIME_TYPE = 'application/pdf'
+
+
+class OCRBackend(object):
+    """ Interface of the services running document text detection on images """
+
+    def annotate(self, contents: list):
+        """ Run document text detection on images
+        Args:
+            contents (list<bytes>): content of each image
+        Returns:
+            responses (list<vision.AnnotateImageResponse>): response of each image, in order
+        """
+        raise NotImplementedError
+
+    async def annotate_async(self, contents: list):
+        """ Same as annotate without blocking the event loop """
+        return await asyncio.to_thread(self.annotate, contents)
+
+    def annotate_file(self, content: bytes, pages: list = None):
+        """ Run document text detection on pages of a PDF
+        Args:
+            content (bytes): content of the PDF
+            pages (list<int>): numbers of the pages (1-based), at most PDF_PAGES_PER_REQUEST. The first
+                PDF_PAGES_PER_REQUEST pages if None, or all of them for a shorter PDF
+        Returns:
+            response (vision.AnnotateFileResponse): response of each page and total_pages of the PDF
+        """
+        raise NotImplementedError
+
+
+class GoogleVisionBackend(OCRBackend):
+    """ Google Vision API """
+
+    def __init__(self, credential_key: str = None, client=None, async_client=None):
+        """ Connect to Google Vision
+        Args:
+            credential_key (str): path to the Google credentials key
+            client: client with the interface of vision.ImageAnnotatorClient. The credentials key is not needed if
+                given
+            async_client: client with the interface of vision.ImageAnnotatorAsyncClient, used on every event loop.
+                If None, one is created on first use on each event loop, since its channel is bound to the loop
+        """
+        self.async_client = async_client
+        self.__loop_client = None
+        self.__client_loop = None
+        if client is not None:
+            self.client = client
+            return
+
+        credential_key = credential_key or GOOGLE_CREDENTIALS_KEY
+        if not os.path.exists(credential_key):
+            logger.warning(f"File {credential_key} was not found. Current dir: {os.getcwd()}")
+            raise FileNotFoundError("Could not initialize OCR_Model because Google Credentials Key not found.")
+
+        os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = credential_key
+        self.client = vision.ImageAnnotatorClient()
+
+    def annotate(self, contents: list):
+        return self.client.batch_annotate_images(requests=_batch_requests(contents)).responses
+
+    async def annotate_async(self, contents: list):
+        client = self.async_client or self.__get_async_client()
+        result = await client.batch_annotate_images(requests=_batch_requests(contents))
+        return result.responses
+
+    def annotate_file(self, content: bytes, pages: list = None):
+        return self.client.batch_annotate_files(requests=[_file_request(content, pages)]).responses[0]
+
+    def __get_async_client(self):
+        """ Get the async client of the running event loop, its grpc.aio channel only works on that loop """
+        loop = asyncio.get_running_loop()
+        if self.__client_loop is not loop:
+            self.__loop_client = vision.ImageAnnotatorAsyncClient()
+            self.__client_loop = loop
+        return self.__loop_client
+
+
+class RecordingBackend(OCRBackend):
+    """ Proxy of another backend saving every response to disk, keyed by image hash """
+
+    def __init__(self, backend: OCRBackend, record_dir: str = None):
+        """
+        Args:
+            backend (OCRBackend): backend to record
+            record_dir (str): folder of the recordings
+        """
+        self.backend = backend
+        self.record_dir = record_dir or RECORD_DIR
+        os.makedirs(self.record_dir, exist_ok=True)
+
+    def annotate(self, contents: list):
+        responses = self.backend.annotate(contents)
+        self.__save(contents, responses)
+        return responses
+
+    async def annotate_async(self, contents: list):
+        responses = await self.backend.annotate_async(contents)
+        self.__save(contents, responses)
+        return responses
+
+    def annotate_file(self, content: bytes, pages: list = None):
+        response = self.backend.annotate_file(content, pages)
+        path = _record_path(self.record_dir, content, pages or [])
+        with open(path, 'wb') as record_file:
+            record_file.write(vision.AnnotateFileResponse.serialize(response))
+        logger.debug(f'Recorded {path}')
+        return response
+
+    def __save(self, contents, responses):
+        for content, response in zip(contents, responses):
+            path = _record_path(self.record_dir, content)
+            with open(path, 'wb') as record_file:
+                record_file.write(vision.AnnotateImageResponse.serialize(response))
+            logger.debug(f'Recorded {path}')
+
+
+class ReplayBackend(OCRBackend):
+    """ Serves the responses saved by a RecordingBackend, each request taking a synthetic latency """
+
+    def __init__(self, record_dir: str = None, latency: float = 0.0):
+        """
+        Args:
+            record_dir (str): folder of the recordings
+            latency (float): seconds each request takes
+        """
+        self.record_dir = record_dir or RECORD_DIR
+        self.latency = latency
+        if not os.path.exists(self.record_dir):
+            raise FileNotFoundError(f"Folder {self.record_dir} was not found. Current dir: {os.getcwd()}")
+
+    def annotate(self, contents: list):
+        if self.latency:
+            time.sleep(self.latency)
+        return [self.__load(content) for content in contents]
+
+    async def annotate_async(self, contents: list):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self.__load(content) for content in contents]
+
+    def annotate_file(self, content: bytes, pages: list = None):
+        if self.latency:
+            time.sleep(self.latency)
+
+        path = _record_path(self.record_dir, content, pages or [])
+        if not os.path.exists(path):
+            return vision.AnnotateFileResponse(error={'message': f'No recording for file {image_key(content)} '
+                                                                f'pages {pages}'})
+
+        with open(path, 'rb') as record_file:
+            return vision.AnnotateFileResponse.deserialize(record_file.read())
+
+    def __load(self, content):
+        """ Load the recorded response of an image, or a response with an error if it was never recorded """
+        path = _record_path(self.record_dir, content)
+        if not os.path.exists(path):
+            return vision.AnnotateImageResponse(error={'message': f'No recording for image {image_key(content)}'})
+
+        with open(path, 'rb') as record_file:
+            return vision.AnnotateImageResponse.deserialize(record_file.read())
+
+
+def create_backend(credential_key: str = None):
+    """ Create the backend selected by the environment
+
+    Environment variables:
+        OCR_BACKEND: 'google' (default), 'record' or 'replay'
+        OCR_RECORD_DIR: folder of the recordings, Default is RECORD_DIR
+        OCR_REPLAY_LATENCY: seconds each replayed request takes, Default is 0
+
+    Args:
+        credential_key (str): path to the Google credentials key, not needed for 'replay'
+    Returns:
+        backend (OCRBackend)
+    """
+    kind = os.environ.get('OCR_BACKEND', 'google')
+    record_dir = os.environ.get('OCR_RECORD_DIR', RECORD_DIR)
+
+    if kind == 'google':
+        return GoogleVisionBackend(credential_key)
+    if kind == 'record':
+        return RecordingBackend(GoogleVisionBackend(credential_key), record_dir)
+    if kind == 'replay':
+        return ReplayBackend(record_dir, latency=float(os.environ.get('OCR_REPLAY_LATENCY', 0)))
+
+    raise ValueError(f"Unknown OCR_BACKEND `{kind}`, expected 'google', 'record' or 'replay'")
+
+
+def iter_pages(backend: OCRBackend, content: bytes):
+    """ Stream the responses of the pages of a PDF, PDF_PAGES_PER_REQUEST pages per file annotation request
+
+    The next request is only sent once the responses of the previous one are consumed, so a consumer that stops
+    early does not have the rest of the PDF transcribed.
+
+    Usage
+    -----
+    >>> from cvp.model.ocr_backend import iter_pages
+    >>> for response in iter_pages(backend, content):
+    ...     document = response.full_text_annotation
+
+    Args:
+        backend (OCRBackend): backend running the text detection
+        content (bytes): content of the PDF
+    Yields:
+        response (vision.AnnotateImageResponse): response of each page, in order. A failed request yields one
+            response with its error and ends the stream
+    """
+    pages = None  # the first PDF_PAGES_PER_REQUEST pages, whatever the length of the PDF
+    while True:
+        result = backend.annotate_file(content, pages)
+        if result.error.message:
+            yield vision.AnnotateImageResponse(error=result.error)
+            return
+
+        logger.debug(f'Received {len(result.responses)} pages of {result.total_pages}')
+        yield from result.responses
+
+        first = (pages[-1] if pages else len(result.responses)) + 1
+        if not result.responses or first > result.total_pages:
+            return
+        pages = list(range(first, min(first + PDF_PAGES_PER_REQUEST, result.total_pages + 1)))
+
+
+def _batch_requests(contents: list):
+    """ Build the document text detection requests of a batch-annotate request """
+    feature = vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
+    return [vision.AnnotateImageRequest(image=vision.Image(content=content), features=[feature])
+            for content in contents]
+
+
+def _file_request(content: bytes, pages: list = None):
+    """ Build the document text detection request of a file annotation request """
+    feature = vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
+    return vision.AnnotateFileRequest(input_config=vision.InputConfig(content=content, mime_type=PDF_MIME_TYPE),
+                                      features=[feature], pages=pages or [])
+
+
+def _record_path(record_dir, content, pages=None):
+    """ Path of the recording of an image, or of pages of a PDF if pages is given ([] for the first pages) """
+    key = image_key(content)
+    if pages is not None:
+        key += '_pdf' + ''.join(f'_{page}' for page in pages)
+    return os.path.join(record_dir, key + RECORD_FILE_EXT)
@@ -0,0 +1,198 @@
+"""OCR Cache
+
+OCR Cache operations module currently contains OCRCache class and the following functions:
+- image_key
+
+USAGE
+-----
+
+>>> from cvp.model.ocr_cache import OCRCache
+>>> from cvp.model.ocr_model import OCR_Model
+>>> model = OCR_Model(cache=OCRCache(cache_dir='dataset/processed/ocr_cache'))
+
+"""
+
+# Standard Dist
+import coloredlogs
+import logging
+import hashlib
+import os
+import struct
+import threading
+import time
+
+# Third Party Imports
+from cachetools import TTLCache
+from google.cloud import vision
+
+# Project Level Imports
+
+logger = logging.getLogger(__name__)
+coloredlogs.install(level=logging.DEBUG, logger=logger)
+
+MAX_SIZE = 256  # documents kept in memory
+TTL = 3600  # seconds a document stays valid
+DISK_MAX_SIZE = 4096  # documents kept on disk
+DISK_FILE_EXT = '.pb'
+DISK_HEADER = struct.Struct('<4sd')  # magic and write time of a cached file, before the serialized document
+DISK_MAGIC = b'OCR1'
+
+
+def image_key(content: bytes):
+    """Get the cache key of an image
+
+    Args:
+        content (bytes): content of the image
+
+    Returns:
+        key (str): hex SHA-256 of the content
+    """
+    return hashlib.sha256(content).hexdigest()
+
+
+class OCRCache(object):
+    """ Content-addressed cache of the full_text_annotation of images
+
+    Documents are kept in an in-memory LRU tier and, if cache_dir is given, in an on-disk tier that stores them
+    serialized, one file per image. Both tiers evict the least recently used documents beyond their size and
+    the documents written more than ttl ago. The write time is kept with the document, in the header of a
+    cached file, since the modification time of the file marks its last use for the LRU order.
+    """
+
+    def __init__(self, max_size: int = None, ttl: float = None, cache_dir: str = None, disk_max_size: int = None):
+        """ construct the cache
+        Usage
+        >>> from cvp.model.ocr_cache import OCRCache
+        >>> cache = OCRCache(max_size=128, ttl=600)
+        Args:
+            max_size (int): number of documents kept in memory
+            ttl (float): seconds a document stays valid
+            cache_dir (str): folder of the on-disk tier. No on-disk tier if None
+            disk_max_size (int): number of documents kept on disk
+        """
+        self.ttl = ttl or TTL
+        self.cache_dir = cache_dir
+        self.disk_max_size = disk_max_size or DISK_MAX_SIZE
+        self.memory = TTLCache(maxsize=max_size or MAX_SIZE, ttl=self.ttl)
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, key: str):
+        """ Get the document of an image
+        Args:
+            key (str): key of the image, see image_key
+        Returns:
+            document (google.cloud.vision_v1.types.text_annotation.TextAnnotation): None if not cached
+        """
+        with self.lock:
+            written, document = self.memory.get(key, (None, None))
+            if document is not None and not self.__expired(written):
+                self.hits += 1
+                self.memory_hits += 1
+                return document
+            self.memory.pop(key, None)
+
+        written, document = self.__read(key)
+
+        with self.lock:
+            if document is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.disk_hits += 1
+                self.memory[key] = (written, document)  # still expires ttl after it was written
+
+        return document
+
+    def put(self, key: str, document):
+        """ Cache the document of an image
+        Args:
+            key (str): key of the image, see image_key
+            document (google.cloud.vision_v1.types.text_annotation.TextAnnotation): document of the image
+        """
+        written = time.time()
+        with self.lock:
+            self.memory[key] = (written, document)
+
+        if self.cache_dir:
+            self.__write(key, document, written)
+
+    def clear(self):
+        """ Remove every document from both tiers """
+        with self.lock:
+            self.memory.clear()
+
+        if self.cache_dir:
+            for file_name in os.listdir(self.cache_dir):
+                if file_name.endswith(DISK_FILE_EXT):
+                    os.remove(os.path.join(self.cache_dir, file_name))
+
+    @property
+    def stats(self):
+        """ Counters to size the cache
+        Returns:
+            stats (dict): hits, memory_hits, disk_hits, misses, hit_rate and number of documents in memory
+        """
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'size': len(self.memory)
+            }
+
+    def __path(self, key):
+        return os.path.join(self.cache_dir, key + DISK_FILE_EXT)
+
+    def __expired(self, written):
+        return time.time() - written > self.ttl
+
+    def __read(self, key):
+        """ Read a document and its write time from the on-disk tier, (None, None) if missing or expired """
+        if not self.cache_dir:
+            return None, None
+
+        path = self.__path(key)
+        try:
+            with open(path, 'rb') as cache_file:
+                header = cache_file.read(DISK_HEADER.size)
+                magic, written = DISK_HEADER.unpack(header) if len(header) == DISK_HEADER.size else (None, None)
+                if magic != DISK_MAGIC or self.__expired(written):  # expired, or written without a write time
+                    cache_file.close()
+                    os.remove(path)
+                    return None, None
+                document = vision.TextAnnotation.deserialize(cache_file.read())
+            os.utime(path)  # mark as recently used, the write time is unchanged
+            return written, document
+        except OSError:
+            return None, None
+
+    def __write(self, key, document, written):
+        """ Write a document to the on-disk tier and evict the least recently used ones beyond disk_max_size """
+        path = self.__path(key)
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as cache_file:
+            cache_file.write(DISK_HEADER.pack(DISK_MAGIC, written))
+            cache_file.write(vision.TextAnnotation.serialize(document))
+        os.replace(temp_path, path)
+
+        files = [os.path.join(self.cache_dir, file_name) for file_name in os.listdir(self.cache_dir)
+                 if file_name.endswith(DISK_FILE_EXT)]
+        if len(files) > self.disk_max_size:
+            files.sort(key=os.path.getmtime)
+            for old_path in files[:len(files) - self.disk_max_size]:
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+            logger.debug(f'Evicted {len(files) - self.disk_max_size} documents from {self.cache_dir}')
@@ -2,6 +2,13 @@
 
 OCR Model operations module currently contains OCR class and the following functions:
 - predict
+- predict_batch
+- predict_async
+- predict_pdf
+- is_pdf
+- extract_regions
+- preprocess_image
+- scale_regions
 
 USAGE
 -----
@@ -11,50 +18,221 @@ $ python cvp/model/ocr_model.py
 """
 
 # Standard Dist
+import asyncio
 import coloredlogs
 import logging
 import os
 import io
+import math
 import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 # Third Party Imports
-from google.cloud import vision
+from PIL import Image, ImageOps, UnidentifiedImageError
 
 # Project Level Imports
-from cvp.features.ocr_helper import text_within
-
-COORDINATE = {
-    "last": [33, 212, 450, 308],
-    'first': [451, 212, 1000, 316],
-    'mi': [1001, 212, 1200, 316],
-    'dob': [33, 304, 560, 402],
-    'ssn': [562, 303, 1180, 402],
-    'product_1': [185, 500, 612, 610],
-    'date_1': [550, 470, 805, 590],
-    'site_1': [790, 510, 1200, 645],
-    'product_2': [185, 600, 612, 700],
-    'date_2': [550, 600, 805, 680],
-    'site_2': [790, 600, 1200, 800]
-}
+from cvp.features.mosaic import build_mosaic
+from cvp.features.ocr_helper import SymbolIndex
+from cvp.model.ocr_backend import GoogleVisionBackend, GOOGLE_CREDENTIALS_KEY, iter_pages
+from cvp.model.ocr_cache import image_key
+from cvp.model.templates import CDC_FIELDS, default_registry
+
+COORDINATE = CDC_FIELDS  # regions of the CDC card, see cvp.model.templates for the other layouts
 
 logger = logging.getLogger(__name__)
 coloredlogs.install(level=logging.DEBUG, logger=logger)
 
-GOOGLE_CREDENTIALS_KEY = r'Google_Vision_OCR_Credentials.json'
 FOLDER_PATH = 'dataset/raw/vaccine_record_photos'
+DATE_FIELDS = ('date_1', 'date_2')
+BATCH_SIZE = 16  # images per batch-annotate request, the Vision API accepts at most 16
+MAX_WORKERS = 4  # batch-annotate requests in flight
+MAX_IN_FLIGHT = 32  # requests in flight from predict_async
+# Longest side (in pixels) kept by preprocess_image, a little over the extent of the COORDINATE template (1200)
+MAX_IMAGE_SIDE = 1280
+JPEG_QUALITY = 85
+PDF_MAGIC = b'%PDF-'
+PDF_HEADER_SIZE = 1024  # readers accept the PDF header anywhere in the first 1024 bytes
+
+OCRResult = namedtuple('OCRResult', ['photo', 'info', 'error'])
+DEFAULT_TEMPLATES = default_registry()  # layouts of the pages of PDFs when the model has no registry
+
+
+class PreprocessedImage(namedtuple('PreprocessedImage', ['content', 'scale', 'original_size'])):
+    """Image ready to be sent: content (bytes), scale applied to the original (float) and original size in bytes"""
+
+    @property
+    def bytes_saved(self):
+        return self.original_size - len(self.content)
+
+
+def extract_regions(document, regions: dict = None):
+    """Read the text of every region of the card from the document in one pass
+
+    Usage
+
+    >>> from cvp.model.ocr_model import extract_regions
+    >>> info = extract_regions(response.full_text_annotation)
+
+    Args:
+        document (google.cloud.vision_v1.types.text_annotation.TextAnnotation or SymbolIndex): json file of the image
+        regions (dict): boundaries [x1, y1, x2, y2] by field name. Default is COORDINATE
+    Returns:
+        info (dict): text of every field, in the order of regions. Dates are formatted as mm/dd/yy
+    """
+    regions = regions or COORDINATE
+    index = document if isinstance(document, SymbolIndex) else SymbolIndex(document)
+
+    info = dict()
+    for key, indices in zip(regions, index.query_regions(list(regions.values()), page=0)):
+        info[key] = index.join_text(indices)
+        if key in DATE_FIELDS:
+            info[key] = format_date(info[key])
+
+        logger.debug(f"{key}: {info[key]}")
+
+    return info
+
+
+def is_pdf(content: bytes):
+    """Check if the content of a data point is a PDF, by its header rather than its file name
+
+    Args:
+        content (bytes): content of the data point
+    Returns:
+        bool: True if the content is a PDF
+    """
+    return PDF_MAGIC in content[:PDF_HEADER_SIZE]
+
+
+def format_date(text: str):
+    """Normalize a date read from the card
+
+    Args:
+        text (str): date as read, Ex: '01 / 01 , 21'
+    Returns:
+        date (str): date with backslash (/) separation, Ex: '01/01/21'
+    """
+    # Remove comma (,), back slash (/), and space
+    temp = text.replace(',', '').replace('/', '').replace(' ', '')
+
+    # Split string every 2th characters and join then with backslash (/) separation
+    # Ex: '123456' -> '12/34/56'
+    return "/".join(re.findall('..', temp))
+
+
+def _image_size(content: bytes):
+    """(width, height) of an image once turned upright, None if Pillow cannot decode it"""
+    try:
+        image = Image.open(io.BytesIO(content))
+        width, height = image.size
+        if image.getexif().get(0x0112) in (5, 6, 7, 8):  # EXIF orientation of a quarter turn
+            width, height = height, width
+        return width, height
+    except (UnidentifiedImageError, OSError):
+        return None
+
+
+def preprocess_image(content: bytes, max_side: int = None, quality: int = None):
+    """Shrink an image before sending it to OCR
+
+    The image is decoded, turned upright and grayscale, downscaled so its longest side is at most max_side and
+    re-encoded as JPEG. The original is kept if it is not an image Pillow can decode, or if it is already smaller.
+
+    Usage
+
+    >>> from cvp.model.ocr_model import preprocess_image, scale_regions
+    >>> image = preprocess_image(content)
+    >>> info = extract_regions(document, scale_regions(COORDINATE, image.scale))
+
+    Args:
+        content (bytes): content of the image
+        max_side (int): longest side (in pixels) kept. Default is MAX_IMAGE_SIDE
+        quality (int): JPEG quality. Default is JPEG_QUALITY
+    Returns:
+        image (PreprocessedImage): content to send, scale applied to the image and size of the original
+    """
+    max_side = max_side or MAX_IMAGE_SIDE
+    quality = quality or JPEG_QUALITY
+
+    try:
+        image = Image.open(io.BytesIO(content))
+        image = ImageOps.exif_transpose(image).convert('L')
+    except (UnidentifiedImageError, OSError) as err:
+        logger.debug(f'Image was not preprocessed: {err}')
+        return PreprocessedImage(content, 1.0, len(content))
+
+    scale = min(1.0, max_side / max(image.size))
+    if scale < 1.0:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.LANCZOS)
+
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=quality, optimize=True)
+    processed = output.getvalue()
+
+    if scale == 1.0 and len(processed) >= len(content):
+        return PreprocessedImage(content, 1.0, len(content))
+
+    logger.debug(f'Preprocessed image: {len(content)} -> {len(processed)} bytes, scale {scale:.3f}')
+    return PreprocessedImage(processed, scale, len(content))
+
+
+def scale_regions(regions: dict, scale: float):
+    """Scale the boundaries of the regions to an image resized by scale
+
+    Args:
+        regions (dict): boundaries [x1, y1, x2, y2] by field name
+        scale (float): scale applied to the image
+    Returns:
+        regions (dict): scaled boundaries by field name
+    """
+    if scale == 1.0:
+        return regions
+
+    # Round outwards so the symbols on the edges stay within the boundaries
+    return {key: [math.floor(value[0] * scale), math.floor(value[1] * scale), math.ceil(value[2] * scale),
+                  math.ceil(value[3] * scale)] for key, value in regions.items()}
 
 
 class OCR_Model(object):
-    def __init__(self, credential_key: str = None):
-        credential_key = credential_key or GOOGLE_CREDENTIALS_KEY
-        if not os.path.exists(credential_key):
-            logger.warning(f"File {credential_key} was not found. Current dir: {os.getcwd()}")
-            raise FileNotFoundError("Could not initialize OCR_Model because Google Credentials Key not found.")
+    def __init__(self, credential_key: str = None, cache=None, client=None, async_client=None,
+                 max_in_flight: int = None, backend=None, preprocess: bool = False, mosaic: bool = False,
+                 templates=None):
+        """Connect to the OCR backend
+
+        Args:
+            credential_key (str): path to the Google credentials key
+            cache (cvp.model.ocr_cache.OCRCache): cache of documents by image content. No caching if None
+            client: client with the interface of vision.ImageAnnotatorClient, Ex: a local fake for testing.
+                The credentials key is not needed if given
+            async_client: client with the interface of vision.ImageAnnotatorAsyncClient used by predict_async.
+                Created on first use if None
+            max_in_flight (int): requests in flight from predict_async
+            backend (cvp.model.ocr_backend.OCRBackend): service running the text detection. Google Vision with
+                the given credentials key and clients if None
+            preprocess (bool): shrink images with preprocess_image before sending them
+            mosaic (bool): only send the regions of COORDINATE, packed into a mosaic by
+                cvp.features.mosaic.build_mosaic
+            templates (cvp.model.templates.TemplateRegistry): card layouts, the regions read are the ones of the
+                layout each document is classified as. COORDINATE if None. With mosaic, only the default layout
+                is read since the mosaic is cut before the layout is known
+        """
+        self.cache = cache
+        self.preprocess = preprocess
+        self.mosaic = mosaic
+        self.templates = templates
+        self.max_in_flight = max_in_flight or MAX_IN_FLIGHT
+        self.__semaphore = None
+        self.__semaphore_loop = None
+        self.backend = backend or GoogleVisionBackend(credential_key, client=client, async_client=async_client)
 
-        os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = credential_key
-        self.client = vision.ImageAnnotatorClient()
+    @property
+    def client(self):
+        """vision.ImageAnnotatorClient of the Google Vision backend, None for other backends"""
+        return getattr(self.backend, 'client', None)
 
-    def predict(self, photo: str, folder_path: str = None, flag=True):
+    def predict(self, photo, folder_path: str = None, flag=True):
         """Get the model prediction on the data point
 
         Usage
@@ -62,48 +240,287 @@ class OCR_Model(object):
         >>> from cvp.model.ocr_model import OCR_Model
         >>> model = OCR_Model()
         >>> model.predict(photo)
+        >>> model.predict(request.files['vaccine_rec'].stream)
 
         Args:
-            photo_path (str): name of data point
-            folder_path (str): Path to folder contains data point
+            photo (str, bytes or file-like object): name of data point, or its content, or a binary stream of it
+            folder_path (str): Path to folder contains data point, when photo is a name
             flag (bool): Don't change this value. This is used for unit testing to check if it raises error
         Returns:
             info (dict): user's information; order of dict - last, first, mi, dob, ssn, 1st product, 1st date, 1st site,
                 2nd product, 2nd date, 2nd site
         """
+        content = self.__read(photo, folder_path)
+        if is_pdf(content):
+            return self.predict_pdf(content, flag=flag)
+
         logger.info("Preparing ...")
-        folder_path = folder_path or FOLDER_PATH
-        relative_path = os.path.join(folder_path, photo)
-        if not os.path.exists(relative_path):
-            raise FileNotFoundError(f"File {relative_path} was not found. Current dir: {os.getcwd()}")
+        content, regions = self.__prepare(content)
 
-        with io.open(relative_path, 'rb') as image_file:
-            content = image_file.read()
+        key = image_key(content)
+        document = self.cache.get(key) if self.cache is not None else None
+        if document is None:
+            logger.info('Loading image into OCR Model ...')
+            response = self.backend.annotate([content])[0]
 
-        image = vision.Image(content=content)
+            if response.error.message or not flag:
+                raise _response_error(response)
 
-        logger.info('Loading image into OCR Model ...')
-        response = self.client.document_text_detection(image=image)
+            document = response.full_text_annotation
+            if self.cache is not None:
+                self.cache.put(key, document)
+        else:
+            logger.info('Loaded document from OCR cache')
 
-        if response.error.message or not flag:
-            raise Exception(f'{response.error.message}\nFor more info on error messages, check: '
-                            f'https://cloud.google.com/apis/design/errors')
+        logger.info('Finding keywords ...')
+        info = self.__extract(document, regions)
 
-        document = response.full_text_annotation
+        logger.info('Finished!')
+        return info
+
+    def predict_batch(self, photos: list, folder_path: str = None, batch_size: int = None, max_workers: int = None):
+        """Get the model prediction on many data points with Vision batch-annotate requests
+
+        Cached photos are answered without a request. The other photos are grouped into batches of batch_size,
+        and up to max_workers batches are sent concurrently. A PDF is read with predict_pdf, as one more request
+        of the max_workers in flight. A photo that fails does not fail the others.
+
+        Usage
+
+        >>> from cvp.model.ocr_model import OCR_Model
+        >>> model = OCR_Model()
+        >>> results = model.predict_batch(photos)
+
+        Args:
+            photos (list): names of data points, or their contents, or binary streams of them
+            folder_path (str): Path to folder contains data points
+            batch_size (int): images per request, at most BATCH_SIZE
+            max_workers (int): requests in flight
+        Returns:
+            results (list<OCRResult>): (photo, info, error) of each photo, in order. info is the same dict as
+                predict returns and error is None if succeeded, else info is None and error is the exception
+        """
+        batch_size = min(batch_size or BATCH_SIZE, BATCH_SIZE)
+        max_workers = max_workers or MAX_WORKERS
+
+        results = [None] * len(photos)
+        pending = []  # (position, key, content, regions) of photos to send
+        pdfs = []  # (position, content) of the PDFs
+        for position, photo in enumerate(photos):
+            try:
+                content = self.__read(photo, folder_path)
+                if is_pdf(content):
+                    pdfs.append((position, content))
+                    continue
+                content, regions = self.__prepare(content)
+            except Exception as err:
+                results[position] = OCRResult(photo, None, err)
+                continue
+
+            key = image_key(content)
+            document = self.cache.get(key) if self.cache is not None else None
+            if document is None:
+                pending.append((position, key, content, regions))
+            else:
+                results[position] = self.__result(photo, document, regions)
+
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        logger.info(f'Sending {len(pending)} of {len(photos)} images in {len(batches)} batches and '
+                    f'{len(pdfs)} PDFs ...')
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self.backend.annotate, [content for _, _, content, _ in batch])
+                       for batch in batches]
+            pdf_futures = [(position, executor.submit(self.predict_pdf, content)) for position, content in pdfs]
+            for batch, future in zip(batches, futures):
+                try:
+                    responses = future.result()
+                except Exception as err:  # the whole request failed
+                    logger.warning(f'Batch of {len(batch)} images failed: {err}')
+                    for position, _, _, _ in batch:
+                        results[position] = OCRResult(photos[position], None, err)
+                    continue
+
+                for (position, key, _, regions), response in zip(batch, responses):
+                    if response.error.message:
+                        results[position] = OCRResult(photos[position], None, _response_error(response))
+                        continue
+
+                    if self.cache is not None:
+                        self.cache.put(key, response.full_text_annotation)
+                    results[position] = self.__result(photos[position], response.full_text_annotation, regions)
+
+            for position, future in pdf_futures:
+                try:
+                    results[position] = OCRResult(photos[position], future.result(), None)
+                except Exception as err:
+                    results[position] = OCRResult(photos[position], None, err)
+
+        logger.info('Finished!')
+        return results
+
+    async def predict_async(self, photo, folder_path: str = None, flag=True):
+        """Get the model prediction on the data point without blocking the event loop
+
+        Same as predict, with the call made through the async path of the backend. At most max_in_flight calls are
+        in flight at once, the others wait for their turn. A PDF takes one of them while it is read, its pages are
+        requested one request at a time.
+
+        Usage
+
+        >>> from cvp.model.ocr_model import OCR_Model
+        >>> model = OCR_Model()
+        >>> info = await model.predict_async(photo)
+
+        Args:
+            photo (str, bytes or file-like object): same as predict
+            folder_path (str): Path to folder contains data point
+            flag (bool): Don't change this value. This is used for unit testing to check if it raises error
+        Returns:
+            info (dict): same as predict
+        """
+        content = await asyncio.to_thread(self.__read, photo, folder_path)
+        if is_pdf(content):
+            async with self.__get_semaphore():
+                return await asyncio.to_thread(self.predict_pdf, content, flag=flag)
+
+        content, regions = await asyncio.to_thread(self.__prepare, content)
+
+        key = image_key(content)
+        document = self.cache.get(key) if self.cache is not None else None
+        if document is None:
+            async with self.__get_semaphore():
+                logger.info('Loading image into OCR Model ...')
+                response = (await self.backend.annotate_async([content]))[0]
+
+            if response.error.message or not flag:
+                raise _response_error(response)
+
+            document = response.full_text_annotation
+            if self.cache is not None:
+                self.cache.put(key, document)
+
+        return self.__extract(document, regions)
+
+    def predict_pdf(self, photo, folder_path: str = None, flag=True):
+        """Get the model prediction on a PDF, reading its pages until every field is filled
+
+        Pages are sent PDF_PAGES_PER_REQUEST at a time through the file annotation API and read as they arrive.
+        The fields of each page are located with its template, and the first non-empty text of a field is kept.
+        Once all fields are filled, the remaining pages are neither sent nor read. PDFs are not cached.
+
+        Usage
+
+        >>> from cvp.model.ocr_model import OCR_Model
+        >>> model = OCR_Model()
+        >>> info = model.predict_pdf('Vaccine.pdf')
+
+        Args:
+            photo (str, bytes or file-like object): name of data point, or its content, or a binary stream of it
+            folder_path (str): Path to folder contains data point, when photo is a name
+            flag (bool): Don't change this value. This is used for unit testing to check if it raises error
+        Returns:
+            info (dict): same as predict, fields never found are empty
+        """
+        content = self.__read(photo, folder_path)
+        templates = self.templates or DEFAULT_TEMPLATES
 
-        logger.info('Finding keywords ...')
         info = dict()
-        for key, value in COORDINATE.items():
-            info[key] = text_within(document, value[0], value[1], value[2], value[3])
-            if key == 'date_1' or key == 'date_2':
-                # Remove comma (,), back slash (/), and space
-                temp = info[key].replace(',', '').replace('/', '').replace(' ', '')
+        for number, response in enumerate(iter_pages(self.backend, content), 1):
+            if response.error.message or not flag:
+                raise _response_error(response)
 
-                # Split string every 2th characters and join then with backslash (/) separation
-                # Ex: '123456' -> '12/34/56'
-                info[key] = "/".join(re.findall('..', temp))
+            document = response.full_text_annotation
+            for key, text in extract_regions(document, templates.regions(document)).items():
+                if not info.get(key):
+                    info[key] = text
 
-            logger.debug(f"{key}: {info[key]}")
+            if info and all(info.values()):
+                logger.info(f'Every field was filled by page {number}')
+                break
 
         logger.info('Finished!')
         return info
+
+    def __get_semaphore(self):
+        """Get the semaphore bounding the requests in flight on the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self.__semaphore_loop is not loop:
+            self.__semaphore = asyncio.Semaphore(self.max_in_flight)
+            self.__semaphore_loop = loop
+        return self.__semaphore
+
+    def __prepare(self, content: bytes):
+        """Preprocess the content of a data point and pack it into a mosaic, if enabled
+        Args:
+            content (bytes): content of the image
+        Returns:
+            content (bytes): content to send
+            regions (dict): COORDINATE mapped to the content to send, None if picked from the template of the
+                document
+        """
+        if self.mosaic and self.templates is not None:
+            # measured on the reference scan of the template, scaled to the image like TemplateRegistry.regions
+            template = self.templates[self.templates.default]
+            regions = template.regions(*(_image_size(content) or template.size))
+        else:
+            regions = COORDINATE
+
+        if self.preprocess:
+            image = preprocess_image(content)
+            content, scale = image.content, image.scale
+        else:
+            scale = 1.0
+
+        if not self.mosaic:
+            # the regions of a template are picked from the document, see __extract
+            regions = None if self.templates is not None else scale_regions(COORDINATE, scale)
+            return content, regions
+
+        regions = scale_regions(regions, scale)
+        mosaic = build_mosaic(content, regions)
+        if mosaic is not None:
+            content, regions = mosaic.content, mosaic.regions
+
+        return content, regions
+
+    def __extract(self, document, regions):
+        """Extract the fields of a document from the given regions, or the ones of its template if None"""
+        if regions is None and self.templates is not None:
+            regions = self.templates.regions(document)
+        return extract_regions(document, regions)
+
+    def __result(self, photo, document, regions=None):
+        """Extract the fields of a document into an OCRResult"""
+        try:
+            return OCRResult(photo, self.__extract(document, regions), None)
+        except Exception as err:
+            return OCRResult(photo, None, err)
+
+    @staticmethod
+    def __read(photo, folder_path: str = None):
+        """Read the content of a data point
+        Args:
+            photo (str, bytes or file-like object): name of data point, or its content, or a binary stream of it
+            folder_path (str): Path to folder contains data point, when photo is a name
+        Returns:
+            content (bytes): content of the image
+        """
+        if isinstance(photo, (bytes, bytearray, memoryview)):
+            return bytes(photo)
+        if hasattr(photo, 'read'):
+            return photo.read()
+
+        folder_path = folder_path or FOLDER_PATH
+        relative_path = os.path.join(folder_path, photo)
+        if not os.path.exists(relative_path):
+            raise FileNotFoundError(f"File {relative_path} was not found. Current dir: {os.getcwd()}")
+
+        with io.open(relative_path, 'rb') as image_file:
+            return image_file.read()
+
+
+def _response_error(response):
+    """Build the exception raised for a failed Vision response"""
+    return Exception(f'{response.error.message}\nFor more info on error messages, check: '
+                     f'https://cloud.google.com/apis/design/errors')
@@ -0,0 +1,191 @@
+"""Card Templates
+
+Card Templates module currently contains CardTemplate and TemplateRegistry classes and the following functions:
+- default_registry
+
+A template declares the anchor words printed on a card layout and the regions of its fields, in pixels of a
+reference scan of the card. The registry indexes templates by anchor word, so classifying a document costs one
+lookup per distinct word of the document however many templates are registered.
+
+USAGE
+-----
+
+>>> from cvp.model.templates import CardTemplate, default_registry
+>>> registry = default_registry()
+>>> registry.register(CardTemplate('state', anchors=('immunization', 'department'), fields={...}))
+>>> template = registry.classify(document)
+>>> regions = registry.regions(document)
+
+"""
+
+# Standard Dist
+import coloredlogs
+import logging
+import math
+from collections import Counter
+
+# Third Party Imports
+
+# Project Level Imports
+from cvp.features.ocr_helper import WordIndex
+
+logger = logging.getLogger(__name__)
+coloredlogs.install(level=logging.DEBUG, logger=logger)
+
+REFERENCE_SIZE = (1201, 907)  # (width, height) of the reference scans the regions are measured on
+MIN_SCORE = 0.5  # fraction of its anchor words a document must contain to match a template
+
+CDC_FIELDS = {
+    "last": [33, 212, 450, 308],
+    'first': [451, 212, 1000, 316],
+    'mi': [1001, 212, 1200, 316],
+    'dob': [33, 304, 560, 402],
+    'ssn': [562, 303, 1180, 402],
+    'product_1': [185, 500, 612, 610],
+    'date_1': [550, 470, 805, 590],
+    'site_1': [790, 510, 1200, 645],
+    'product_2': [185, 600, 612, 700],
+    'date_2': [550, 600, 805, 680],
+    'site_2': [790, 600, 1200, 800]
+}
+CDC_ANCHORS = ('vaccination', 'record', 'card', 'patient', 'vaccine', 'manufacturer', 'healthcare', 'clinic', 'dose')
+
+
+class CardTemplate(object):
+    """ Layout of a card: its anchor words and the regions of its fields """
+
+    def __init__(self, name: str, anchors, fields: dict, size: tuple = None):
+        """
+        Args:
+            name (str): unique name of the layout
+            anchors (iterable<str>): words printed on every card of the layout, case is ignored
+            fields (dict): boundaries [x1, y1, x2, y2] by field name, in pixels of the reference scan
+            size (tuple): (width, height) of the reference scan. Default is REFERENCE_SIZE
+        """
+        self.name = name
+        self.anchors = tuple(dict.fromkeys(anchor.casefold() for anchor in anchors))
+        self.fields = fields
+        self.size = size or REFERENCE_SIZE
+
+        if not self.anchors:
+            raise ValueError(f'Template {name} has no anchor words')
+
+    def regions(self, width: int = None, height: int = None):
+        """ Get the regions of the fields on a page
+        Args:
+            width (int): width of the page. Regions are not scaled if width or height is missing
+            height (int): height of the page
+        Returns:
+            regions (dict): boundaries [x1, y1, x2, y2] by field name, in pixels of the page
+        """
+        if not width or not height or (width, height) == self.size:
+            return self.fields
+
+        # rounded outward like scale_regions so that a scaled region never loses the edge of a field
+        scale_x, scale_y = width / self.size[0], height / self.size[1]
+        return {key: [math.floor(x1 * scale_x), math.floor(y1 * scale_y),
+                      math.ceil(x2 * scale_x), math.ceil(y2 * scale_y)]
+                for key, (x1, y1, x2, y2) in self.fields.items()}
+
+    def __repr__(self):
+        return f'CardTemplate({self.name!r})'
+
+
+class TemplateRegistry(object):
+    """ Card templates indexed by anchor word """
+
+    def __init__(self, templates: list = None, default: str = None, min_score: float = None):
+        """
+        Args:
+            templates (list<CardTemplate>): templates to register
+            default (str): name of the template used when none matches. Default is the first registered
+            min_score (float): fraction of its anchor words a document must contain to match a template
+        """
+        self.templates = dict()
+        self.default = default
+        self.min_score = MIN_SCORE if min_score is None else min_score
+        self.__anchor_index = dict()  # anchor word -> names of the templates declaring it
+
+        for template in templates or []:
+            self.register(template)
+
+    def __len__(self):
+        return len(self.templates)
+
+    def __getitem__(self, name: str):
+        return self.templates[name]
+
+    def register(self, template: CardTemplate):
+        """ Add a template to the registry
+        Args:
+            template (CardTemplate): template with a name not registered yet
+        """
+        if template.name in self.templates:
+            raise ValueError(f'Template {template.name} is already registered')
+
+        self.templates[template.name] = template
+        for anchor in template.anchors:
+            self.__anchor_index.setdefault(anchor, []).append(template.name)
+        if self.default is None:
+            self.default = template.name
+
+    def scores(self, document):
+        """ Score the templates sharing anchor words with a document
+        Args:
+            document (google.cloud.vision_v1.types.text_annotation.TextAnnotation or WordIndex): json file of the
+                image
+        Returns:
+            scores (dict): fraction of its anchor words found in the document by template name, only templates
+                with at least one anchor word found
+        """
+        index = document if isinstance(document, WordIndex) else WordIndex(document)
+
+        votes = Counter()
+        for word in set(word.casefold() for word in index.words):
+            votes.update(self.__anchor_index.get(word, ()))
+
+        return {name: count / len(self.templates[name].anchors) for name, count in votes.items()}
+
+    def classify(self, document):
+        """ Pick the template of a document
+        Args:
+            document (google.cloud.vision_v1.types.text_annotation.TextAnnotation or WordIndex): json file of the
+                image
+        Returns:
+            template (CardTemplate): template with the highest score, None if no score reaches min_score
+        """
+        scores = self.scores(document)
+        if not scores:
+            return None
+
+        name = max(scores, key=lambda name: (scores[name], len(self.templates[name].anchors)))
+        if scores[name] < self.min_score:
+            return None
+
+        logger.debug(f'Classified as {name} (score {scores[name]:.2f})')
+        return self.templates[name]
+
+    def regions(self, document):
+        """ Get the regions of the fields of a document, scaled to its first page
+        Args:
+            document (google.cloud.vision_v1.types.text_annotation.TextAnnotation): json file of the image
+        Returns:
+            regions (dict): boundaries [x1, y1, x2, y2] by field name of the template of the document, or of the
+                default template if none matches
+        """
+        template = self.classify(document)
+        if template is None:
+            logger.debug(f'No template matched, using {self.default}')
+            template = self.templates[self.default]
+
+        if not document.pages:
+            return template.regions()
+        return template.regions(document.pages[0].width, document.pages[0].height)
+
+
+CDC_TEMPLATE = CardTemplate('cdc', CDC_ANCHORS, CDC_FIELDS)
+
+
+def default_registry():
+    """ Create a registry of the known card layouts, CDC card first """
+    return TemplateRegistry([CDC_TEMPLATE])
@@ -0,0 +1,183 @@
+import concurrent.futures
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# Standard Dist
+import pytest
+
+# Project Level Imports
+from cvp.app.services.chain_writer import *
+from cvp.data.history_log import HistoryLog
+from cvp.data.merkle import MerkleTree
+
+TEST_DB_PATH = 'tests/app/test_chain_writer.db'
+TEST_HIST_LOG_PATH = 'tests/app/test_chain_writer_hist_log.db'
+TEST_TREE_PATH = 'tests/app/test_chain_writer_merkle.db'
+HASH_0 = 'hash_0'
+
+
+def fast_block_hash(items, salt):
+    """ Stands in for the PBKDF2 block hash, slow enough for registrations to queue up meanwhile """
+    time.sleep(0.002)
+    return hashlib.sha256(salt + ''.join(str(item) for item in items).encode()).hexdigest()
+
+
+class TestChainWriter:
+
+    @pytest.fixture
+    def db(self):
+        for path in (TEST_DB_PATH, TEST_HIST_LOG_PATH, TEST_TREE_PATH):
+            if os.path.exists(path):
+                os.remove(path)
+
+        conn = sqlite3.connect(TEST_DB_PATH)
+        conn.execute('CREATE TABLE profile (User_Account_ID INTEGER NOT NULL PRIMARY KEY, Last_Name VARCHAR, '
+                     'Dob VARCHAR, Block_Hash VARCHAR NOT NULL)')
+        conn.execute('CREATE TABLE account (Email VARCHAR NOT NULL PRIMARY KEY, Password VARCHAR, '
+                     'User_Account_ID INTEGER, Salt VARCHAR, Username VARCHAR)')
+        conn.commit()
+
+        yield conn
+
+        conn.close()
+        for path in (TEST_DB_PATH, TEST_HIST_LOG_PATH, TEST_TREE_PATH):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_append(self, db):
+        #=== Test Inputs ===#
+        history_log, tree = HistoryLog(TEST_HIST_LOG_PATH), MerkleTree(TEST_TREE_PATH)
+        writer = ChainWriter(TEST_DB_PATH, history_log, tree, hash_block=fast_block_hash, hash_0=HASH_0)
+
+        #=== Trigger Output ===#
+        assert writer.append('1@cvp.com', 'pw', b'salt1', 'A B', ['Doe', '01/01/2000']) == 1
+        assert writer.append('2@cvp.com', 'pw', b'salt2', 'C D', ['Roe', '02/02/2000']) == 2
+        with pytest.raises(DuplicateAccount):
+            writer.append('1@cvp.com', 'pw', b'salt3', 'E F', ['Poe', '03/03/2000'])
+        writer.shutdown()
+
+        first, second = db.execute('SELECT * FROM profile ORDER BY User_Account_ID').fetchall()
+        assert first[-1] == fast_block_hash([HASH_0, 1, 'Doe', '01/01/2000', HASH_0], b'salt1')
+        assert second[-1] == fast_block_hash([first[-1], 2, 'Roe', '02/02/2000', first[-1]], b'salt2')
+        assert db.execute('SELECT * FROM account WHERE User_Account_ID = 2').fetchone()[:3] == ('2@cvp.com', 'pw', 2)
+        assert history_log.get(2) == second[-1]
+        assert tree.size == 2
+        history_log.close()
+        tree.close()
+
+    def test_append_side_store_failure(self, db):
+        #=== Test Inputs ===#
+        history_log, tree = HistoryLog(TEST_HIST_LOG_PATH), MerkleTree(TEST_TREE_PATH)
+        history_log.append(2, 'stale')  # left behind for the next id
+        writer = ChainWriter(TEST_DB_PATH, history_log, tree, hash_block=fast_block_hash, hash_0=HASH_0)
+
+        #=== Trigger Output ===#
+        assert writer.append('1@cvp.com', 'pw', b'salt1', 'A B', ['Doe', '01/01/2000']) == 1
+        assert writer.append('2@cvp.com', 'pw', b'salt2', 'C D', ['Roe', '02/02/2000']) == 2  # committed
+        assert writer.append('3@cvp.com', 'pw', b'salt3', 'E F', ['Poe', '03/03/2000']) == 3
+        writer.shutdown()
+
+        assert history_log.get(2) == 'stale'
+        assert history_log.get(3) == db.execute('SELECT Block_Hash FROM profile WHERE User_Account_ID = 3').fetchone()[0]
+        assert tree.size == 3
+        history_log.close()
+        tree.close()
+
+    def test_concurrent_append(self, db):
+        #=== Test Inputs ===#
+        writer = ChainWriter(TEST_DB_PATH, hash_block=fast_block_hash, max_batch=8, hash_0=HASH_0)
+        ids = []
+
+        def register(worker):
+            for num in range(10):
+                ids.append(writer.append(f'{worker}.{num}@cvp.com', 'pw', b'salt', 'A B', [f'N{worker}', 'dob']))
+
+        #=== Trigger Output ===#
+        threads = [threading.Thread(target=register, args=(worker,)) for worker in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        writer.shutdown()
+
+        assert sorted(ids) == list(range(1, 81))
+        prev_hash = HASH_0
+        for account_id, last_name, dob, block_hash in db.execute('SELECT * FROM profile ORDER BY User_Account_ID'):
+            assert block_hash == fast_block_hash([prev_hash, account_id, last_name, dob, prev_hash], b'salt')
+            prev_hash = block_hash
+
+        stats = writer.stats
+        assert stats['blocks'] == 80 and stats['queue_depth'] == 0
+        assert stats['batches'] < 80 and 1 < stats['max_batch_size'] <= 8  # blocks were committed together
+
+    def test_append_timeout(self, db):
+        #=== Test Inputs ===#
+        gate = threading.Semaphore(0)  # each release lets one block be hashed
+
+        def slow_block_hash(items, salt):
+            gate.acquire(timeout=10)
+            return fast_block_hash(items, salt)
+
+        writer = ChainWriter(TEST_DB_PATH, hash_block=slow_block_hash, max_batch=1, hash_0=HASH_0)
+        first = writer.submit('1@cvp.com', 'pw', b'salt1', 'A B', ['Doe', '01/01/2000'])
+        while not first.running():  # taken by the writer, hashing
+            time.sleep(0.01)
+
+        #=== Trigger Output ===#
+        # still queued when append gives up: cancelled, never committed
+        with pytest.raises(concurrent.futures.TimeoutError):
+            writer.append('2@cvp.com', 'pw', b'salt2', 'C D', ['Roe', '02/02/2000'], timeout=0.1)
+        gate.release()
+        assert first.result(timeout=5) == 1
+
+        # taken by the writer when append gives up: it waits for the outcome instead of reporting a failure
+        threading.Timer(0.3, gate.release).start()
+        assert writer.append('3@cvp.com', 'pw', b'salt3', 'E F', ['Poe', '03/03/2000'], timeout=0.1) == 2
+        writer.shutdown()
+
+        emails = [row[0] for row in db.execute('SELECT Email FROM account ORDER BY User_Account_ID')]
+        assert emails == ['1@cvp.com', '3@cvp.com']
+
+    def test_writer_crash(self, db):
+        #=== Test Inputs ===#
+        writer = ChainWriter('tests/app/missing/test_chain_writer.db', hash_block=fast_block_hash, hash_0=HASH_0)
+
+        #=== Trigger Output ===#
+        # the writer cannot open the database: the registration fails right away instead of timing out
+        start = time.perf_counter()
+        with pytest.raises(sqlite3.OperationalError):
+            writer.append('1@cvp.com', 'pw', b'salt1', 'A B', ['Doe', '01/01/2000'], timeout=5)
+        assert time.perf_counter() - start < 5
+
+        # the next registration starts a new writer
+        writer.db_path = TEST_DB_PATH
+        assert writer.append('1@cvp.com', 'pw', b'salt1', 'A B', ['Doe', '01/01/2000'], timeout=5) == 1
+        writer.shutdown()
+
+    def test_hash_outside_write_lock(self, db):
+        #=== Test Inputs ===#
+        other = sqlite3.connect(TEST_DB_PATH, timeout=0, isolation_level=None, check_same_thread=False)
+        appended = []
+
+        def checking_block_hash(items, salt):
+            # the write lock is free while hashing, another writer gets it without waiting
+            other.execute('BEGIN IMMEDIATE')
+            if not appended:  # something else appends to the chain once meanwhile
+                other.execute("INSERT INTO profile VALUES (1, 'Other', 'dob', 'other_hash')")
+                appended.append(True)
+            other.execute('COMMIT')
+            return fast_block_hash(items, salt)
+
+        writer = ChainWriter(TEST_DB_PATH, hash_block=checking_block_hash, hash_0=HASH_0)
+
+        #=== Trigger Output ===#
+        # hashed again after the block appended meanwhile, so the chain does not fork
+        assert writer.append('1@cvp.com', 'pw', b'salt1', 'A B', ['Doe', '01/01/2000']) == 2
+        writer.shutdown()
+        other.close()
+
+        block_hash = db.execute('SELECT Block_Hash FROM profile WHERE User_Account_ID = 2').fetchone()[0]
+        assert block_hash == fast_block_hash(['other_hash', 2, 'Doe', '01/01/2000', 'other_hash'], b'salt1')
@@ -0,0 +1,73 @@
+import asyncio
+import hmac
+import logging
+import os
+import threading
+
+# Standard Dist
+import pytest
+
+# Project Level Imports
+from cvp.app.services.hashing import *
+
+
+class TestHashingService:
+
+    def test_generate_hash(self):
+        #=== Test Inputs ===#
+        hashing = HashingService(max_workers=2)
+        salt = os.urandom(16)
+
+        #=== Trigger Output ===#
+        password_hash, _ = hashing.generate_hash('Correct&Password.101', salt)
+
+        assert hmac.compare_digest(password_hash, generate_hash('Correct&Password.101', salt)[0])
+        assert hashing.generate_block_hash(['a', 1], salt) == generate_block_hash(['a', 1], salt)
+
+        async def hash_many():
+            return await asyncio.gather(*[hashing.generate_hash_async(str(i), salt) for i in range(4)])
+
+        results = asyncio.run(hash_many())
+        assert [result[0] for result in results] == [generate_hash(str(i), salt)[0] for i in range(4)]
+
+        stats = hashing.stats
+        assert stats['workers'] == 2
+        assert stats['submitted'] == stats['completed'] == 6
+        assert stats['queue_depth'] == 0
+        assert 1 <= stats['max_queue_depth'] <= 4
+
+        with pytest.raises(TypeError):
+            hashing.generate_hash('Correct&Password.101', 'WRONG_SALT')
+
+        hashing.shutdown()
+
+    def test_generate_hash_logging_lock_held(self):
+        #=== Test Inputs ===#
+        hashing = HashingService(max_workers=1)
+        handler = logging.getLogger('cvp.features.transform').handlers[0]  # the workers log through it
+        held, release = threading.Event(), threading.Event()
+        results = []
+
+        def hold_lock():
+            with handler.lock:
+                held.set()
+                release.wait()
+
+        #=== Trigger Output ===#
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        held.wait()
+        try:
+            # The pool starts while another thread holds the lock, a forked child would inherit it held
+            worker = threading.Thread(target=lambda: results.append(hashing.generate_hash('pw', b'salt')),
+                                      daemon=True)
+            worker.start()
+            worker.join(timeout=60)
+            assert results, 'hashing process blocked on a logging lock'
+        finally:
+            release.set()
+            holder.join()
+            hashing.shutdown()
+
+        assert results[0][0] == generate_hash('pw', b'salt')[0]
+        assert START_METHOD != 'fork'
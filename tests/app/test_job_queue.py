@@ -0,0 +1,71 @@
+import threading
+import time
+
+# Standard Dist
+import pytest
+
+# Project Level Imports
+from cvp.app.services.job_queue import *
+
+
+class TestJobQueue:
+
+    def test_submit(self):
+        #=== Test Inputs ===#
+        jobs = JobQueue(max_workers=2)
+
+        #=== Trigger Output ===#
+        done_id = jobs.submit(lambda x, y=0: x + y, 1, y=2)
+        failed_id = jobs.submit(lambda: 1 / 0)
+        jobs.shutdown()
+
+        assert jobs.status(done_id) == {'status': DONE, 'result': 3, 'error': None}
+        assert jobs.status(failed_id)['status'] == FAILED
+        assert 'division' in jobs.status(failed_id)['error']
+        assert jobs.status('unknown') is None
+        assert jobs.stats['in_flight'] == 0
+
+    def test_backpressure(self):
+        #=== Test Inputs ===#
+        release = threading.Event()
+        jobs = JobQueue(max_workers=1, max_pending=2)
+
+        #=== Trigger Output ===#
+        running_id = jobs.submit(release.wait)
+        waiting_id = jobs.submit(release.wait)
+        with pytest.raises(QueueFull):
+            jobs.submit(release.wait)
+
+        time.sleep(0.05)
+        assert jobs.status(running_id)['status'] == RUNNING
+        assert jobs.status(waiting_id)['status'] == PENDING
+
+        release.set()
+        jobs.shutdown()
+        assert jobs.stats[DONE] == 2
+
+    def test_timeout(self):
+        #=== Test Inputs ===#
+        release = threading.Event()
+        jobs = JobQueue(max_workers=1, timeout=0.1, ttl=0.1)
+
+        #=== Trigger Output ===#
+        running_id = jobs.submit(release.wait)
+        waiting_id = jobs.submit(lambda: 'never started')
+        time.sleep(0.2)
+
+        assert jobs.status(running_id)['status'] == TIMED_OUT
+        assert jobs.status(waiting_id)['status'] == TIMED_OUT
+
+        # the result of a timed out job is dropped, its worker is busy until the call returns
+        assert jobs.stats['in_flight'] == 2
+        release.set()
+        time.sleep(0.05)
+        assert jobs.status(running_id)['result'] is None
+        assert jobs.stats['in_flight'] == 0
+
+        # finished jobs are forgotten after ttl
+        time.sleep(0.2)
+        jobs.submit(int)
+        assert jobs.status(running_id) is None
+        jobs.shutdown()
@@ -43,6 +43,16 @@ class TestRoutes:
         response = test_client.get('/register')
         assert response.status_code == 200, f'{response.data.decode()}'
 
+    def test_register_status(self, test_client):
+        """
+        GIVEN a flask app configuration as test client
+        WHEN the status of an OCR job that is not the one of the session is requested (GET)
+        THEN check that it is not found
+        """
+        response = test_client.get('/register/status/unknown')
+        assert response.status_code == 404
+        assert response.get_json() == {'status': None}
+
     def test_register_post(self, test_client):
         """
         GIVEN a flask app configuration as test client
@@ -1,4 +1,5 @@
 from cvp.app.utils import *
+from cvp.app.services.job_queue import DONE
 import time
 import pytest
 
@@ -58,6 +59,37 @@ class TestUtils():
         assert get_file_ext(pdf_file) == 'pdf', f'Should return \'pdf\' for {pdf_file}'
         assert get_file_ext(other_file) is None, f'Should return None for {other_file}'
 
+    def test_submit_ocr(self, monkeypatch):
+        # === Test Inputs ===#
+        import io
+        import threading
+        from PIL import Image
+
+        image = Image.linear_gradient('L').resize((800, 600))
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG')
+        content = buffer.getvalue()
+        email = 'submit_ocr@cvp.com'
+        release = threading.Event()
+
+        class SlowModel:
+            def predict(self, content):
+                release.wait(10)
+                return {'valid': True}
+
+        monkeypatch.setattr('cvp.app.utils.model', SlowModel())
+
+        # === Trigger Outputs ===#
+        first_job = submit_ocr(content, email)
+        assert submit_ocr(content, email) == first_job  # double submit while it is read, same job
+
+        release.set()
+        deadline = time.time() + 10
+        while ocr_jobs.status(first_job)['status'] != DONE and time.time() < deadline:
+            time.sleep(0.01)
+        assert ocr_jobs.status(first_job)['status'] == DONE
+        assert submit_ocr(content, email) != first_job  # read again once finished, Ex: to fix a bad read
+
     def test_check_cdc(self):
         # === Test Inputs ===#
         db_path = 'tests/data/test_cdc.db'
@@ -208,6 +240,35 @@ class TestUtils():
         assert not is_tampered, f'User_Account_ID 1 is tampered'
         assert len(acc) == 13
 
+    def test_lookups_indexed(self):
+        # === Test Inputs ===#
+        cdc_path = 'tests/data/test_cdc.db'
+        db = Database(db_path)
+        try:
+            email, _, acc_id, _, _ = db.select('*', account_table, f'User_Account_ID = \"1\"')[0]
+        finally:
+            db.close_connection()
+
+        # === Trigger Outputs ===#
+        # the statements the *_by calls issue, not a list of the lookups kept by hand, so a new query is checked too
+        is_user(email)
+        authenticate('wrong_pass', email=email)
+        authenticate('wrong_pass', account_id=acc_id)
+        get_profile(2)
+        get_inclusion_proof(1)
+        paths = [db_path]
+        if os.path.exists(cdc_path):  # made by test_main of tests/data/test_rel_database.py
+            check_cdc({}, 'fake email', db_path=cdc_path)
+            paths.append(cdc_path)
+
+        for path in paths:
+            db = Database(path)
+            try:
+                assert db.pool.statements.sql, f'No statement issued on {path}'
+                assert db.full_scans() == [], f'Full table scan on {path}'
+            finally:
+                db.close_connection()
+
     def test_encode_decode_token(self):
         to_be_encrypted = 'Super Secret'
         test_key = 'TEST_KEY'
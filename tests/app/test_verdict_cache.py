@@ -0,0 +1,43 @@
+# Project Level Imports
+from cvp.app.services.verdict_cache import *
+
+
+class TestVerdictCache:
+
+    def test_fingerprint(self):
+        #=== Test Inputs ===#
+        record = (2, '0002', 'Doe', 'John')
+
+        #=== Trigger Output ===#
+        assert fingerprint(record, 'prev', 'salt') == fingerprint(record, 'prev', 'salt')
+        assert fingerprint(record, 'prev', 'salt') != fingerprint(record, 'other', 'salt')
+        assert fingerprint('ab', 'c') != fingerprint('a', 'bc')
+
+    def test_get_put(self):
+        #=== Test Inputs ===#
+        verdicts = VerdictCache()
+        key = fingerprint((2, 'Doe'), 'prev')
+
+        #=== Trigger Output ===#
+        assert verdicts.get(2, 'hash_2', key) is None
+        verdicts.put(2, 'hash_2', key, False)
+        assert verdicts.get(2, 'hash_2', key) is False
+        assert verdicts.get(2, 'hash_2', fingerprint((2, 'Roe'), 'prev')) is None  # row changed
+        assert verdicts.get(2, 'other_hash', key) is None  # block hash changed
+
+        assert verdicts.stats == {'hits': 1, 'misses': 3, 'hit_rate': 0.25, 'size': 1}
+
+    def test_invalidate(self):
+        #=== Test Inputs ===#
+        verdicts = VerdictCache()
+        for account_id in (1, 2, 3):
+            verdicts.put(account_id, f'hash_{account_id}', 'key', False)
+
+        #=== Trigger Output ===#
+        verdicts.invalidate(2)
+        assert verdicts.get(1, 'hash_1', 'key') is False
+        assert verdicts.get(2, 'hash_2', 'key') is None
+        assert verdicts.get(3, 'hash_3', 'key') is None  # chains to the block hash of 2
+
+        verdicts.clear()
+        assert verdicts.stats['size'] == 0
@@ -0,0 +1,146 @@
+import json
+import os
+import sqlite3
+from base64 import b64encode
+
+# Standard Dist
+import pytest
+
+# Project Level Imports
+from cvp.data.audit import *
+from cvp.data.history_log import HistoryLog
+from cvp.features.transform import generate_block_hash
+
+TEST_DB_PATH = 'tests/data/test_audit.db'
+TEST_HIST_LOG_PATH = 'tests/data/test_audit_hist_log.db'
+TEST_REPORT_PATH = 'tests/data/test_audit_report.json'
+TEST_TREE_PATH = 'tests/data/test_audit_merkle.db'
+HASH_0 = 'hash_0'
+
+
+def write_history_log(rows):
+    """ Replace the history log, it is append-only """
+    if os.path.exists(TEST_HIST_LOG_PATH):
+        os.remove(TEST_HIST_LOG_PATH)
+    history_log = HistoryLog(TEST_HIST_LOG_PATH)
+    history_log.extend(rows)
+    history_log.close()
+
+
+class TestAudit:
+
+    @pytest.fixture
+    def chain(self):
+        """ Chain of 5 profiles, with the history log and removed afterwards """
+        for path in (TEST_DB_PATH, TEST_HIST_LOG_PATH, TEST_REPORT_PATH, TEST_TREE_PATH):
+            if os.path.exists(path):
+                os.remove(path)
+
+        conn = sqlite3.connect(TEST_DB_PATH)
+        conn.execute('CREATE TABLE profile (User_Account_ID INTEGER NOT NULL PRIMARY KEY, Last_Name VARCHAR, '
+                     'Dob VARCHAR, Block_Hash VARCHAR NOT NULL)')
+        conn.execute('CREATE TABLE account (Email VARCHAR NOT NULL PRIMARY KEY, User_Account_ID INTEGER, '
+                     'Salt VARCHAR)')
+
+        prev_hash = HASH_0
+        for account_id in range(1, 6):
+            salt = os.urandom(16)
+            record = [account_id, f'Name{account_id}', '01/01/2000']
+            block_hash = generate_block_hash([prev_hash] + record + [prev_hash], salt)
+            conn.execute('INSERT INTO profile VALUES (?, ?, ?, ?)', record + [block_hash])
+            conn.execute('INSERT INTO account VALUES (?, ?, ?)',
+                         (f'{account_id}@cvp.com', account_id, b64encode(salt).decode('utf-8')))
+            prev_hash = block_hash
+        conn.commit()
+        write_history_log(conn.execute('SELECT User_Account_ID, Block_Hash FROM profile').fetchall())
+
+        yield conn
+
+        conn.close()
+        for path in (TEST_DB_PATH, TEST_HIST_LOG_PATH, TEST_REPORT_PATH, TEST_TREE_PATH):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_iter_chunks(self, chain):
+        #=== Trigger Output ===#
+        chunks = list(iter_chunks(chain, HASH_0, chunk_size=2))
+
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        first_record, _, first_prev = chunks[0][0]
+        second_record, _, second_prev = chunks[0][1]
+        third_record, _, third_prev = chunks[1][0]
+        assert first_prev == HASH_0
+        assert second_prev == first_record[-1]
+        assert third_prev == second_record[-1]  # across chunks
+
+    def test_audit_chain(self, chain):
+        #=== Trigger Output ===#
+        report = audit_chain(TEST_DB_PATH, TEST_HIST_LOG_PATH, HASH_0, max_workers=2, chunk_size=2)
+
+        assert report['blocks'] == 5
+        assert report['broken'] == []
+        assert report['blocks_per_second'] > 0
+
+    def test_audit_chain_broken(self, chain):
+        #=== Test Inputs ===#
+        chain.execute("UPDATE profile SET Last_Name = 'Tampered' WHERE User_Account_ID = 2")
+        chain.execute("DELETE FROM account WHERE User_Account_ID = 3")
+        chain.execute("DELETE FROM profile WHERE User_Account_ID = 4")
+        chain.commit()
+        write_history_log([(1, 'forged')] + chain.execute('SELECT User_Account_ID, Block_Hash FROM profile '
+                                                          'WHERE User_Account_ID > 1').fetchall())
+
+        #=== Trigger Output ===#
+        report = audit_chain(TEST_DB_PATH, TEST_HIST_LOG_PATH, HASH_0, max_workers=2, chunk_size=2)
+
+        assert report['blocks'] == 4
+        assert report['broken'] == [
+            {'User_Account_ID': 1, 'reason': HISTORY_LOG_MISMATCH},
+            {'User_Account_ID': 2, 'reason': HASH_MISMATCH},
+            {'User_Account_ID': 3, 'reason': MISSING_SALT},
+            {'User_Account_ID': 5, 'reason': MISSING_PREDECESSOR}
+        ]
+
+    def test_audit_chain_malformed(self, chain):
+        #=== Test Inputs ===#
+        chain.execute("UPDATE profile SET Block_Hash = 'x' WHERE User_Account_ID = 2")
+        chain.execute("UPDATE account SET Salt = 'not base64!' WHERE User_Account_ID = 4")
+        chain.commit()
+        salt = chain.execute('SELECT Salt FROM account WHERE User_Account_ID = 1').fetchone()[0]
+
+        #=== Trigger Output ===#
+        assert verify_chunk([((1, 'Doe', '01/01/2000', 'x'), salt, HASH_0)]) == [(1, MALFORMED)]
+
+        report = audit_chain(TEST_DB_PATH, TEST_HIST_LOG_PATH, HASH_0, max_workers=2, chunk_size=2)
+
+        assert report['blocks'] == 5
+        assert report['broken'] == [
+            {'User_Account_ID': 2, 'reason': HISTORY_LOG_MISMATCH},
+            {'User_Account_ID': 2, 'reason': MALFORMED},
+            {'User_Account_ID': 3, 'reason': HASH_MISMATCH},  # chained to the malformed hash
+            {'User_Account_ID': 4, 'reason': MALFORMED}
+        ]
+
+    def test_audit_chain_merkle(self, chain):
+        #=== Test Inputs ===#
+        tree = MerkleTree(TEST_TREE_PATH)
+        tree.sync(TEST_DB_PATH)
+        tree.close()
+        chain.execute("UPDATE profile SET Dob = '02/02/2000' WHERE User_Account_ID = 5")
+        chain.commit()
+
+        #=== Trigger Output ===#
+        report = audit_chain(TEST_DB_PATH, TEST_HIST_LOG_PATH, HASH_0, max_workers=2, tree_path=TEST_TREE_PATH)
+
+        assert report['merkle_root'] is not None
+        assert report['broken'] == [
+            {'User_Account_ID': 5, 'reason': HASH_MISMATCH},
+            {'User_Account_ID': 5, 'reason': MERKLE_MISMATCH}
+        ]
+
+    def test_main(self, chain):
+        #=== Trigger Output ===#
+        report = main(TEST_DB_PATH, TEST_HIST_LOG_PATH, TEST_REPORT_PATH, max_workers=1, hash_0=HASH_0)
+
+        with open(TEST_REPORT_PATH) as report_file:
+            assert json.load(report_file)['blocks'] == report['blocks'] == 5
@@ -0,0 +1,30 @@
+# Standard Dist
+import pytest
+
+# Project Level Imports
+from cvp.data.benchmark import *
+
+
+class TestBenchmark():
+
+    def test_benchmark_profile(self):
+        #=== Test Inputs ===#
+        files = set(os.listdir('tests/data'))
+
+        #=== Trigger Output ===#
+        report = benchmark_profile('read_heavy', readers=2, writers=1, seconds=0.2, rows=50, folder_path='tests/data')
+
+        assert report['reads'] > 0 and report['writes'] > 0
+        assert report['reads_per_second'] == report['reads'] / report['seconds']
+        assert report['busy_errors'] == 0
+        assert set(os.listdir('tests/data')) == files  # database and its WAL files removed
+
+        with pytest.raises(ValueError):
+            benchmark_profile('fast')
+
+    def test_benchmark_profiles(self):
+        #=== Trigger Output ===#
+        report = benchmark_profiles(readers=1, writers=1, seconds=0.1, rows=10)
+
+        assert list(report) == [BASELINE] + list(PRAGMA_PROFILES)
+        assert all(profile['writes'] > 0 for profile in report.values())
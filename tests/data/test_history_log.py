@@ -0,0 +1,94 @@
+import os
+import sqlite3
+import threading
+
+# Standard Dist
+import pytest
+
+# Project Level Imports
+from cvp.data.history_log import *
+
+TEST_HIST_LOG_PATH = 'tests/data/test_history_log.db'
+TEST_TSV_PATH = 'tests/data/test_history_log.csv'
+
+
+class TestHistoryLog:
+
+    @pytest.fixture
+    def history_log(self):
+        for path in (TEST_HIST_LOG_PATH, TEST_TSV_PATH):
+            if os.path.exists(path):
+                os.remove(path)
+        history_log = HistoryLog(TEST_HIST_LOG_PATH)
+
+        yield history_log
+
+        history_log.close()
+        for path in (TEST_HIST_LOG_PATH, TEST_TSV_PATH):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_append(self, history_log):
+        #=== Trigger Output ===#
+        history_log.append(1, 'hash1')
+        history_log.extend([(2, 'hash2'), (3, 'hash3')])
+
+        assert len(history_log) == 3
+        assert history_log.get(2) == 'hash2'
+        assert history_log.get(4) is None
+
+        with pytest.raises(ValueError):
+            history_log.append(1, 'forged')
+        with pytest.raises(ValueError):
+            history_log.extend([(4, 'hash4'), (2, 'forged')])
+        assert history_log.get(1) == 'hash1'
+        assert history_log.get(4) is None  # rolled back with the conflicting row
+
+    def test_append_only(self, history_log):
+        #=== Test Inputs ===#
+        history_log.append(1, 'hash1')
+
+        #=== Trigger Output ===#
+        with pytest.raises(sqlite3.IntegrityError):
+            history_log.conn.execute("UPDATE history_log SET Block_Hash = 'forged'")
+        with pytest.raises(sqlite3.IntegrityError):
+            history_log.conn.execute('DELETE FROM history_log')
+        with pytest.raises(sqlite3.IntegrityError):
+            history_log.conn.execute("INSERT OR REPLACE INTO history_log VALUES (1, 'forged')")
+        with pytest.raises(sqlite3.IntegrityError):
+            history_log.conn.execute("REPLACE INTO history_log VALUES (1, 'forged')")
+        assert history_log.get(1) == 'hash1'
+
+    def test_concurrent_append(self, history_log):
+        #=== Test Inputs ===#
+        other = HistoryLog(TEST_HIST_LOG_PATH)  # other connection, as another process would have
+
+        def append(log, start):
+            for account_id in range(start, 100, 2):
+                log.append(account_id, f'hash{account_id}')
+
+        #=== Trigger Output ===#
+        threads = [threading.Thread(target=append, args=(history_log, 0)),
+                   threading.Thread(target=append, args=(other, 1))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        other.close()
+
+        assert len(history_log) == 100
+        assert all(history_log.get(account_id) == f'hash{account_id}' for account_id in range(100))
+
+    def test_migrate(self, history_log):
+        #=== Test Inputs ===#
+        with open(TEST_TSV_PATH, 'w') as tsv_file:
+            tsv_file.write('User_Account_ID\tBlock_Hash\n1\thash1\n2\thash2\n')
+        history_log.append(3, 'hash3')
+
+        #=== Trigger Output ===#
+        assert history_log.migrate(TEST_TSV_PATH) == 2
+        assert history_log.migrate(TEST_TSV_PATH) == 0
+        assert len(history_log) == 3 and history_log.get(1) == 'hash1'
+
+        with pytest.raises(FileNotFoundError):
+            history_log.migrate('WRONG/PATH')
@@ -0,0 +1,111 @@
+import os
+import sqlite3
+
+# Standard Dist
+import pytest
+
+# Project Level Imports
+from cvp.data.merkle import *
+
+TEST_TREE_PATH = 'tests/data/test_merkle.db'
+TEST_CVP_PATH = 'tests/data/test_merkle_cvp.db'
+KEY = b'key'
+
+
+def records(count):
+    return [(account_id, f'Name{account_id}', '01/01/2000', f'hash{account_id}') for account_id in range(1, count + 1)]
+
+
+def full_root(leaves):
+    """ Root computed from scratch, promoting the odd nodes """
+    while len(leaves) > 1:
+        leaves = [node_hash(leaves[i], leaves[i + 1]) if i + 1 < len(leaves) else leaves[i]
+                  for i in range(0, len(leaves), 2)]
+    return leaves[0]
+
+
+class TestMerkle:
+
+    @pytest.fixture
+    def tree(self):
+        for path in (TEST_TREE_PATH, TEST_CVP_PATH):
+            if os.path.exists(path):
+                os.remove(path)
+        tree = MerkleTree(TEST_TREE_PATH)
+
+        yield tree
+
+        tree.close()
+        for path in (TEST_TREE_PATH, TEST_CVP_PATH):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_hashes(self):
+        #=== Test Inputs ===#
+        record = (1, 'Name1', '01/01/2000', 'hash1')
+
+        #=== Trigger Output ===#
+        assert leaf_hash(record) == leaf_hash([str(value) for value in record])
+        assert leaf_hash(record) != leaf_hash((1, 'Name1', '01/01/2001', 'hash1'))
+        assert node_hash(leaf_hash(record), leaf_hash(record)) != leaf_hash(record)
+
+    def test_append(self, tree):
+        #=== Test Inputs ===#
+        rows = records(7)
+
+        #=== Trigger Output ===#
+        assert tree.root is None
+        for count, row in enumerate(rows, start=1):
+            assert tree.append(row[0], row) == count - 1
+            assert tree.root == full_root([leaf_hash(row) for row in rows[:count]])
+        assert tree.leaf(3) == leaf_hash(rows[2])
+        assert tree.leaf(8) is None
+
+        reopened = MerkleTree(TEST_TREE_PATH)
+        assert reopened.size == 7 and reopened.root == tree.root
+        reopened.close()
+
+    def test_proof(self, tree):
+        #=== Test Inputs ===#
+        rows = records(6)
+        for row in rows:
+            tree.append(row[0], row)
+
+        #=== Trigger Output ===#
+        root = tree.root
+        for row in rows:
+            proof = tree.proof(row[0])
+            assert len(proof['path']) <= 3
+            assert verify_proof(row, proof, root)
+            assert not verify_proof((row[0], 'Tampered') + row[2:], proof, root)
+        assert tree.proof(7) is None
+
+    def test_signed_root(self, tree):
+        #=== Test Inputs ===#
+        tree.append(1, records(1)[0])
+
+        #=== Trigger Output ===#
+        signed_root = tree.signed_root(KEY)
+        assert signed_root['size'] == 1 and signed_root['root'] == tree.root.hex()
+        assert verify_root(signed_root, KEY)
+        assert not verify_root(signed_root, b'other')
+        assert not verify_root(dict(signed_root, size=2), KEY)
+
+    def test_sync(self, tree):
+        #=== Test Inputs ===#
+        conn = sqlite3.connect(TEST_CVP_PATH)
+        assert tree.sync(TEST_CVP_PATH) == 0  # database without tables yet
+        conn.execute('CREATE TABLE profile (User_Account_ID INTEGER PRIMARY KEY, Last_Name VARCHAR, Dob VARCHAR, '
+                     'Block_Hash VARCHAR)')
+        conn.executemany('INSERT INTO profile VALUES (?, ?, ?, ?)', records(5)[:3])
+        conn.commit()
+
+        #=== Trigger Output ===#
+        assert tree.sync(TEST_CVP_PATH) == 3
+        conn.executemany('INSERT INTO profile VALUES (?, ?, ?, ?)', records(5)[3:])
+        conn.commit()
+        conn.close()
+        assert tree.sync(TEST_CVP_PATH) == 2
+        assert tree.sync(TEST_CVP_PATH) == 0
+        assert tree.root == full_root([leaf_hash(row) for row in records(5)])
+        assert merkle_path('dataset/external/cvp.db') == os.path.join('dataset/external', 'merkle.db')
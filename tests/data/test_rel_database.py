@@ -11,8 +11,7 @@ import sqlalchemy
 from cvp.data.rel_database import *
 
 TEST_DB_PATH = 'tests/data/test.db'
-if os.path.exists(TEST_DB_PATH):
-    os.remove(TEST_DB_PATH)
+remove_database(TEST_DB_PATH)
 
 class TestRelDatabase():
 
@@ -186,10 +185,186 @@ class TestRelDatabase():
             WRONG_CONDITION = 'WRONG_CONDITION'
             db.delete(table_name2, WRONG_CONDITION)
 
+    def test_parameterized(self, db):
+        #=== Test Inputs ===#
+        table_name = 'table3'
+        db.create_table({'id': 'INTEGER NOT NULL PRIMARY KEY', 'email': 'VARCHAR'}, table_name)
+        db.insert((1, 'a@cvp.com'), table_name)
+        db.insert((2, 'b@cvp.com'), table_name)
+        injection = 'a@cvp.com" OR "1" = "1'
+
+        #=== Trigger Output ===#
+        assert db.select_by('*', table_name, {'email': 'a@cvp.com'}) == [(1, 'a@cvp.com')]
+        assert db.select_by('*', table_name, {'email': injection}) == []
+        assert db.select_by('id', table_name, {'id': '2'}) == [(2,)]  # column affinity applies
+        assert len(db.select_by('*', table_name)) == 2
+
+        db.update_by({'email': 'c@cvp.com'}, table_name, {'id': 2})
+        assert db.select_by('email', table_name, {'id': 2}) == [('c@cvp.com',)]
+        db.delete_by(table_name, {'email': injection})
+        db.delete_by(table_name, {'id': 1})
+        assert db.select_by('id', table_name) == [(2,)]
+
+        with pytest.raises(ValueError):
+            db.select_by('*', table_name, {'id = 1 OR 1': 1})
+        with pytest.raises(ValueError):
+            db.update_by({'email': 'x'}, 'table3; DROP TABLE table3', {'id': 1})
+        with pytest.raises(Exception):
+            db.select_by('*', table_name, {'wrong_column': 1})
+
+        db.close_connection()
+
+    def test_create_index(self, db):
+        #=== Test Inputs ===#
+        table_name = 'table4'
+        attr = {'email': 'VARCHAR NOT NULL PRIMARY KEY', 'id': 'INTEGER NOT NULL', 'name': 'VARCHAR'}
+        db.create_table(attr, table_name, indexes=[('id',)])
+        lookup = 'SELECT * FROM table4 WHERE name = ?'
+
+        #=== Trigger Output ===#
+        assert db.full_scans([lookup]) == [{'sql': lookup, 'table': table_name, 'detail': 'SCAN table4'}]
+        assert db.full_scans(['SELECT * FROM table4 WHERE id = ?', 'SELECT * FROM table4 WHERE email = ?']) == []
+
+        assert db.create_index(table_name, 'name') == 'idx_table4_name'
+        assert db.create_index(table_name, 'name') == 'idx_table4_name'  # already exists
+        assert db.full_scans([lookup]) == []
+        assert 'USING INDEX idx_table4_name' in db.explain(lookup)[0]
+
+        db.select_by('*', table_name, {'id': 1})
+        assert [scan for scan in db.full_scans() if scan['table'] == table_name] == []  # issued by select_by
+
+        db.create_index(table_name, ('id', 'name'), unique=True, index_name='idx_table4_unique')
+        db.insert(('a@cvp.com', 1, 'a'), table_name)
+        with pytest.raises(Exception):
+            db.insert(('b@cvp.com', 1, 'a'), table_name)
+        with pytest.raises(ValueError):
+            db.create_index(table_name, ('id; DROP TABLE table4',))
+
+        db.close_connection()
+
+    def test_statement_cache(self):
+        #=== Test Inputs ===#
+        statements = StatementCache(size=2)
+        built = []
+
+        def build(sql):
+            return lambda: built.append(sql) or sql
+
+        #=== Trigger Output ===#
+        assert statements.get(('a',), build('A')) == 'A'
+        assert statements.get(('a',), build('A')) == 'A'
+        statements.get(('b',), build('B'))
+        statements.get(('c',), build('C'))  # evicts a, the least recently used
+        statements.get(('a',), build('A'))
+
+        assert built == ['A', 'B', 'C', 'A']
+        assert statements.stats == {'hits': 1, 'misses': 4, 'hit_rate': 0.2, 'size': 2}
+
+    def test_connection_pool(self):
+        #=== Test Inputs ===#
+        pool_path = 'tests/data/test_pool.db'
+        pool = ConnectionPool(pool_path, size=1, idle_timeout=60)
+
+        #=== Trigger Output ===#
+        with pool.connection() as conn:
+            with pool.connection() as nested_conn:  # same thread, same connection
+                assert nested_conn is conn
+            conn.execute('CREATE TABLE t (x INTEGER)')
+        assert pool.stats == {'created': 1, 'reused': 0, 'idle': 1}
+
+        with pool.connection() as reused_conn:
+            assert reused_conn is conn
+            other = []
+            thread = threading.Thread(target=lambda: other.append(pool.acquire()))
+            thread.start()
+            thread.join()
+            assert other[0] is not conn  # another thread gets another connection
+        pool.release(other[0])  # released after the thread holding it ended, closed
+        assert pool.stats == {'created': 2, 'reused': 1, 'idle': 1}
+
+        # released by another thread while the one holding it still runs: refused, it keeps working there
+        acquired, done = threading.Event(), threading.Event()
+        held = []
+
+        def hold():
+            held.append(pool.acquire())
+            acquired.set()
+            done.wait(10)
+            held.append(pool.acquire().execute('SELECT 1').fetchone())
+            pool.release(held[0])
+            pool.release(held[0])
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        acquired.wait(10)
+        with pytest.raises(ValueError):
+            pool.release(held[0])
+        done.set()
+        thread.join()
+        assert held[1] == (1,)
+        assert pool.stats['idle'] == 1
+
+        os.remove(pool_path)  # idle connection to a deleted file is not reused
+        with pool.connection() as new_conn:
+            assert new_conn is not conn
+            assert new_conn.execute('SELECT count(*) FROM sqlite_master').fetchone()[0] == 0
+
+        pool.idle_timeout = 0
+        time.sleep(0.01)
+        pool.close()
+        assert pool.stats['idle'] == 0
+        os.remove(pool_path)
+
+    def test_get_pool(self, db):
+        #=== Trigger Output ===#
+        assert get_pool(TEST_DB_PATH) is get_pool(os.path.abspath(TEST_DB_PATH))
+
+        conn = db.conn
+        db.close_connection()
+        db = Database(TEST_DB_PATH)
+        assert db.conn is conn  # reused, not connected again
+        assert db._Database__engine is None  # created only when pandas needs it
+        db.close_connection()
+
+    def test_pragma_profile(self, db):
+        #=== Test Inputs ===#
+        profile_path = 'tests/data/test_profile.db'
+        remove_database(profile_path)
+        conn = apply_profile(sqlite3.connect(profile_path), 'write_heavy')
+
+        #=== Trigger Output ===#
+        expected = {'busy_timeout': 30000, 'journal_mode': 'wal', 'synchronous': 2,  # FULL
+                    'cache_size': -16384, 'mmap_size': 67108864}
+        assert {name: conn.execute(f'PRAGMA {name}').fetchone()[0] for name in expected} == expected
+        conn.close()
+
+        assert db.pool.profile == DEFAULT_PROFILE
+        assert db.conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert db.conn.execute('PRAGMA busy_timeout').fetchone()[0] == PRAGMA_PROFILES[DEFAULT_PROFILE]['busy_timeout']
+        assert db.engine.connect().exec_driver_sql('PRAGMA cache_size').scalar() == \
+               PRAGMA_PROFILES[DEFAULT_PROFILE]['cache_size']
+        db.close_connection()
+
+        with pytest.raises(ValueError):
+            ConnectionPool(profile_path, profile='fast')
+        with pytest.raises(ValueError):
+            apply_profile(sqlite3.connect(':memory:'), 'fast')
+
+        pool = get_pool(profile_path, profile='bulk_load')
+        with pool.connection() as pooled_conn:
+            assert pooled_conn.execute('PRAGMA synchronous').fetchone()[0] == 0  # OFF
+            pooled_conn.execute('CREATE TABLE t (x INTEGER)')
+            pooled_conn.commit()
+        assert os.path.exists(profile_path + '-wal')
+
+        remove_database(profile_path)
+        assert not any(os.path.exists(profile_path + suffix) for suffix in ('', '-wal', '-shm'))
+        assert get_pool(profile_path) is not pool
+
     def test_main(self):
         #=== Test Inputs ===#
         account_path = 'tests/data/test_accounts.txt'
-        hist_log_path = 'tests/data/hist_log.csv'
+        hist_log_path = 'tests/data/hist_log.db'
         test_db_path = {
             'cvp': 'tests/data/test_cvp.db',
             'cdc': 'tests/data/test_cdc.db'
@@ -217,12 +392,19 @@ class TestRelDatabase():
         assert profile_size == cvp_expected_size
         assert account_size == cvp_expected_size
 
+        tree = MerkleTree(merkle_path(test_db_path.get('cvp')))
+        assert tree.size == cvp_expected_size
+        tree.close()
+
         db = Database(test_db_path.get('cdc'))
         selection1 = db.select('COUNT(*)', 'profile')
         profile_size = selection1[0][0]
         assert profile_size == cdc_expected_size
 
-        assert os.path.exists(hist_log_path)
+        assert len(HistoryLog(hist_log_path)) == cvp_expected_size
+
+        assert check_lookups(test_db_path.get('cvp'), LOOKUPS['cvp']) == []
+        assert check_lookups(test_db_path.get('cdc'), LOOKUPS['cdc']) == []
 
 
         with pytest.raises(FileNotFoundError):
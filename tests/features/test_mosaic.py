@@ -0,0 +1,74 @@
+import io
+
+# Standard Dist
+import pytest
+
+# Third Party Imports
+from PIL import Image
+
+# Project Level Imports
+from cvp.features.mosaic import *
+
+
+class TestMosaic():
+
+    def test_merge_regions(self):
+        #=== Test Inputs ===#
+        regions = {'a': [0, 0, 10, 10], 'b': [5, 5, 20, 20], 'c': [15, 15, 30, 30], 'd': [100, 100, 110, 110]}
+
+        #=== Trigger Output ===#
+        tiles = merge_regions(regions)
+
+        # a and b overlap, their union overlaps c
+        assert sorted((boundary, sorted(names)) for boundary, names in tiles) == [
+            ([0, 0, 30, 30], ['a', 'b', 'c']),
+            ([100, 100, 110, 110], ['d'])
+        ]
+
+        # touching edges do not overlap
+        assert len(merge_regions({'a': [0, 0, 10, 10], 'b': [10, 0, 20, 10]})) == 2
+
+    def test_pack_tiles(self):
+        #=== Test Inputs ===#
+        sizes = [(100, 20), (50, 40), (30, 10)]
+
+        #=== Trigger Output ===#
+        offsets, size = pack_tiles(sizes, gap=2)
+
+        boxes = [(x, y, x + w, y + h) for (x, y), (w, h) in zip(offsets, sizes)]
+        for i in range(len(boxes)):
+            assert boxes[i][0] >= 2 and boxes[i][1] >= 2
+            assert boxes[i][2] <= size[0] - 2 and boxes[i][3] <= size[1] - 2
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                assert a[2] + 2 <= b[0] or b[2] + 2 <= a[0] or a[3] + 2 <= b[1] or b[3] + 2 <= a[1]
+
+        assert pack_tiles([]) == ([], (0, 0))
+
+    def test_build_mosaic(self):
+        #=== Test Inputs ===#
+        image = Image.new('L', (400, 300), color=255)
+        image.paste(0, (50, 50, 100, 80))  # black block inside region 'a'
+        content = io.BytesIO()
+        image.save(content, format='PNG')
+        regions = {'a': [40, 40, 110, 90], 'b': [300, 200, 380, 260], 'c': [390, 290, 500, 400]}
+
+        #=== Trigger Output ===#
+        mosaic = build_mosaic(content.getvalue(), regions, gap=8)
+
+        assert set(mosaic.regions) == set(regions)
+        assert mosaic.size[0] * mosaic.size[1] < image.width * image.height
+
+        # the block was moved with its region
+        output = Image.open(io.BytesIO(mosaic.content))
+        assert output.size == mosaic.size
+        x1, y1, x2, y2 = mosaic.regions['a']
+        assert (x2 - x1, y2 - y1) == (70, 50)
+        assert output.getpixel((x1 + 30, y1 + 25)) < 64
+        assert output.getpixel((x1 + 2, y1 + 2)) > 192
+
+        # region 'c' runs past the image, it is clipped to it
+        x1, y1, x2, y2 = mosaic.regions['c']
+        assert (x2 - x1, y2 - y1) == (10, 10)
+
+        assert build_mosaic(b'not an image', regions) is None
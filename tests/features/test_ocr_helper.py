@@ -12,6 +12,25 @@ from cvp.features.ocr_helper import *
 from cvp.model.ocr_model import OCR_Model
 
 
+def make_document(words, pages=1):
+    """Build a TextAnnotation with one symbol per character of each word.
+    :param words: list of (text, x, y) of each word, every character is 10x20 pixels.
+    :param pages: number of pages, each page holds the same words.
+    :return: google.cloud.vision_v1.types.text_annotation.TextAnnotation
+    """
+    def box(x1, y1, x2, y2):
+        return {'vertices': [{'x': x1, 'y': y1}, {'x': x2, 'y': y1}, {'x': x2, 'y': y2}, {'x': x1, 'y': y2}]}
+
+    page_words = []
+    for text, x, y in words:
+        symbols = [{'text': char, 'bounding_box': box(x + i * 10, y, x + i * 10 + 10, y + 20)}
+                   for i, char in enumerate(text)]
+        page_words.append({'symbols': symbols, 'bounding_box': box(x, y, x + len(text) * 10, y + 20)})
+
+    page = {'width': 1201, 'height': 907, 'blocks': [{'paragraphs': [{'words': page_words}]}]}
+    return vision.TextAnnotation(pages=[page] * pages)
+
+
 class TestOCRHelper():
 
     def test_assemble_word(self):
@@ -89,4 +108,77 @@ class TestOCRHelper():
         text = text_within(document, x1=15, y1=115, x2=110, y2=160)
 
         assert isinstance(text, str)
-        assert text == expected
\ No newline at end of file
+        assert text == expected
+
+    def test_symbol_index(self):
+        # === Test Inputs ===#
+        words = [('NO', 20, 30), ('PASSING', 20, 70), ('ZONE', 20, 120), ('LATE', 600, 400)]
+        document = make_document(words)
+
+        # === Trigger Output ===#
+        index = SymbolIndex(document, cell_size=32)
+
+        assert len(index) == 17
+        assert index.boxes.shape == (17, 4)
+        assert list(index.boxes[0]) == [20, 30, 30, 50]
+        assert list(index.query(15, 115, 110, 160)) == [9, 10, 11, 12]
+        assert not len(index.query(0, 0, 5, 5))
+
+        # Same output as traversing the document, including the spaces between words
+        for boundary in [(15, 115, 110, 160), (0, 0, 1000, 1000), (25, 25, 90, 150), (0, 0, 5, 5)]:
+            assert text_within(index, *boundary) == text_within(document, *boundary)
+
+        assert text_within(index, 0, 0, 1000, 1000) == 'NO PASSING ZONE LATE'
+        assert text_within(index, 15, 25, 50, 145) == 'NO PAS ZON'
+        assert text_within(make_document([], pages=0), 0, 0, 10, 10) is None
+
+        # every page is searched
+        assert text_within(make_document(words, pages=2), 15, 115, 110, 160) == 'ZONE ' + ' ' * 3 + 'ZONE'
+
+        # several boundaries, overlapping, empty or inverted, give the same symbols as one query each
+        regions = [(15, 115, 110, 160), (0, 0, 1000, 1000), (25, 25, 90, 150), (0, 0, 5, 5), (100, 100, 50, 50),
+                   (590, 390, 700, 430)]
+        for page in (None, 0, 1):
+            two_pages = SymbolIndex(make_document(words, pages=2), cell_size=32)
+            results = two_pages.query_regions(regions, page=page)
+            assert len(results) == len(regions)
+            for region, indices in zip(regions, results):
+                assert list(indices) == list(two_pages.query(*region, page=page))
+        assert index.query_regions([]) == []
+        assert [list(indices) for indices in SymbolIndex(make_document([])).query_regions(regions[:2])] == [[], []]
+
+        # boxes with normalized vertices only (file annotation responses) are scaled by the page size
+        box = {'normalized_vertices': [{'x': 0.1, 'y': 0.5}, {'x': 0.2, 'y': 0.5}, {'x': 0.2, 'y': 0.6},
+                                       {'x': 0.1, 'y': 0.6}]}
+        word = {'symbols': [{'text': 'A', 'bounding_box': box}], 'bounding_box': box}
+        page = {'width': 600, 'height': 800, 'blocks': [{'paragraphs': [{'words': [word]}]}]}
+        normalized = vision.TextAnnotation(pages=[page])
+        assert list(SymbolIndex(normalized).boxes[0]) == [60, 400, 120, 480]
+        assert list(WordIndex(normalized).boxes[0]) == [60, 400, 120, 480]
+
+    def test_word_index(self):
+        # === Test Inputs ===#
+        words = [('NO', 20, 30), ('PASSING', 20, 70), ('ZONE', 20, 120), ('No', 300, 30), ('Passing', 300, 70)]
+        document = make_document(words, pages=2)
+
+        # === Trigger Output ===#
+        index = WordIndex(document)
+
+        assert len(index) == 10
+        assert 'NO' in index and 'no' not in index
+
+        locations = index.find('NO')
+        assert len(locations) == 2
+        assert isinstance(locations[0], google.cloud.vision_v1.types.geometry.BoundingPoly)
+        assert locations[0].vertices[0].x == 20 and locations[0].vertices[2].y == 50
+        assert len(index.find('no', ignore_case=True)) == 4
+        assert not index.find('YES')
+
+        assert index.find_phrase('NO PASSING') == [(20, 30, 90, 90), (20, 30, 90, 90)]
+        assert index.find_phrase('no  passing', ignore_case=True) == [(20, 30, 90, 90), (300, 30, 370, 90)] * 2
+        assert index.find_phrase('ZONE No', ignore_case=True) == [(20, 30, 320, 140), (20, 30, 320, 140)]
+        assert not index.find_phrase('No Passing ZONE')
+
+        assert find_word_location(index, 'PASSING').vertices[0].y == 70
+        assert find_word_location(document, 'Passing').vertices[0].x == 300
+        assert find_word_location(index, 'YES') is None
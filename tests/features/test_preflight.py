@@ -0,0 +1,93 @@
+import io
+import struct
+import zlib
+
+# Standard Dist
+import pytest
+
+# Third Party Imports
+from PIL import Image
+
+# Project Level Imports
+from cvp.features.preflight import *
+
+
+def encode(image, image_format='PNG', **params):
+    output = io.BytesIO()
+    image.save(output, format=image_format, **params)
+    return output.getvalue()
+
+
+def png_header(width, height):
+    """ PNG of the given size without pixel data, Pillow reads its size from the header """
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0)) + \
+        chunk(b'IEND', b'')
+
+
+class TestPreflight():
+
+    def test_sniff_format(self):
+        #=== Test Inputs ===#
+        image = Image.new('RGB', (10, 10))
+
+        #=== Trigger Output ===#
+        assert sniff_format(encode(image, 'PNG')) == 'png'
+        assert sniff_format(encode(image, 'JPEG')) == 'jpeg'
+        assert sniff_format(encode(image, 'GIF')) == 'gif'
+        assert sniff_format(encode(image, 'BMP')) == 'bmp'
+        assert sniff_format(encode(image, 'TIFF')) == 'tiff'
+        assert sniff_format(b'RIFF\x00\x00\x00\x00WEBPVP8 ') == 'webp'
+        assert sniff_format(b'\n%PDF-1.4') == 'pdf'
+        assert sniff_format(b'<html>card.png</html>') is None
+
+    def test_check_upload(self):
+        #=== Test Inputs ===#
+        with open('tests/model/Vaccine.png', 'rb') as image_file:
+            content = image_file.read()
+
+        #=== Trigger Output ===#
+        upload = check_upload(content)
+
+        assert upload.format == 'png'
+        assert upload.size == (1201, 907)
+        assert check_upload(b'%PDF-1.4 card') == ('pdf', None, None)
+
+        # recompressed or resized copies of the card are near-duplicates
+        image = Image.open(io.BytesIO(content)).convert('RGB')
+        recompressed = check_upload(encode(image, 'JPEG', quality=40))
+        resized = check_upload(encode(image.resize((900, 680)), 'JPEG'))
+        assert hamming_distance(upload.dhash, recompressed.dhash) <= MAX_DISTANCE
+        assert hamming_distance(upload.dhash, resized.dhash) <= MAX_DISTANCE
+
+        other = check_upload(encode(image.transpose(Image.FLIP_TOP_BOTTOM)))
+        assert hamming_distance(upload.dhash, other.dhash) > MAX_DISTANCE
+
+        with pytest.raises(PreflightError, match='empty'):
+            check_upload(b'')
+        with pytest.raises(PreflightError, match='not an image'):
+            check_upload(b'GIF is not a card')
+        with pytest.raises(PreflightError, match='too small'):
+            check_upload(encode(image.resize((300, 227))))
+        with pytest.raises(PreflightError, match='corrupt'):
+            check_upload(content[:len(content) // 2])
+        with pytest.raises(PreflightError, match='too large'):  # decompression bomb
+            check_upload(png_header(50000, 50000))
+
+    def test_duplicate_detector(self):
+        #=== Test Inputs ===#
+        detector = DuplicateDetector(max_distance=2)
+
+        #=== Trigger Output ===#
+        detector.add('kujo@cvp.org', 0b1111, 'job-1')
+        detector.add('kujo@cvp.org', 0b11110000, 'job-2')
+
+        assert detector.find('kujo@cvp.org', 0b1111) == 'job-1'
+        assert detector.find('kujo@cvp.org', 0b0111) == 'job-1'
+        assert detector.find('kujo@cvp.org', 0b11111111) is None
+        assert detector.find('kujo@cvp.org', None) is None
+
+        # uploads of other emails are never matched
+        assert detector.find('dio@cvp.org', 0b1111) is None
@@ -24,6 +24,34 @@ class TestTransform():
         with pytest.raises(TypeError):
             password_hash, _ = generate_hash(USER_INPUT_PASSWORD, "WRONG_SALT")
 
+    def test_password_hash_record(self):
+        #=== Test Inputs ===#
+        password_hash, salt = generate_hash("Correct&Password.101", iterations=1000)
+
+        #=== Trigger Output ===#
+        record = encode_password_hash(password_hash, 1000)
+
+        assert record.startswith('pbkdf2_sha256$1000$')
+        assert decode_password_hash(record) == (1000, password_hash)
+        assert not needs_rehash(record, 1000)
+        assert needs_rehash(record, 2000)
+
+        # legacy records are base64 hashes of DEFAULT_ITERATIONS iterations
+        legacy_hash, _ = generate_hash("Correct&Password.101", salt)
+        legacy = b64encode(legacy_hash).decode('utf-8')
+        assert decode_password_hash(legacy) == (DEFAULT_ITERATIONS, legacy_hash)
+        assert needs_rehash(legacy, DEFAULT_ITERATIONS)
+
+        with pytest.raises(ValueError):
+            decode_password_hash('md5$1$AAAA')
+
+    def test_calibrate_iterations(self):
+        #=== Trigger Output ===#
+        iterations = calibrate_iterations(0.01, minimum=10000)
+
+        assert iterations >= 10000 and iterations % 10000 == 0
+        assert calibrate_iterations(0.001) == DEFAULT_ITERATIONS
+
     def test_generate_QR_code(self):
         #=== Test Inputs ===#
         LINK = 'https://www.youtube.com/'
@@ -0,0 +1,56 @@
+# Standard Dist
+import time
+
+import pytest
+
+# Project Level Imports
+from cvp.model.benchmark import *
+from cvp.model.ocr_backend import GoogleVisionBackend
+from tests.model.test_ocr_model import FakeClient
+
+
+class TestBenchmark():
+
+    def test_benchmark_preprocess(self):
+        #=== Test Inputs ===#
+        backend = GoogleVisionBackend(client=FakeClient())
+
+        #=== Trigger Output ===#
+        report = benchmark_preprocess(['Vaccine.png'], 'tests/model', backend=backend, repeat=2)
+
+        assert report['raw']['bytes_sent'] == os.path.getsize('tests/model/Vaccine.png')
+        assert 0 < report['preprocessed']['bytes_sent'] < report['raw']['bytes_sent']
+        assert report['bytes_saved'] == report['raw']['bytes_sent'] - report['preprocessed']['bytes_sent']
+        assert 'mean_latency_saved' in report
+
+        with pytest.raises(FileNotFoundError):
+            main('WRONG/PATH')
+
+    def test_benchmark_mosaic(self):
+        #=== Test Inputs ===#
+        backend = GoogleVisionBackend(client=FakeClient())
+
+        #=== Trigger Output ===#
+        report = benchmark_mosaic(['Vaccine.png'], 'tests/model', backend=backend)
+
+        assert 0 < report['mosaic']['bytes_sent'] < report['preprocessed']['bytes_sent']
+        assert report['bytes_saved'] == report['preprocessed']['bytes_sent'] - report['mosaic']['bytes_sent']
+        assert report['mosaic']['symbols_parsed'] > 0
+        assert 'symbols_saved' in report
+
+    def test_counting_backend(self, monkeypatch):
+        #=== Test Inputs ===#
+        class SlowSymbolIndex(SymbolIndex):
+            def __init__(self, document):
+                time.sleep(0.2)
+                super().__init__(document)
+
+        monkeypatch.setattr('cvp.model.benchmark.SymbolIndex', SlowSymbolIndex)
+        backend = GoogleVisionBackend(client=FakeClient())
+
+        #=== Trigger Output ===#
+        report = benchmark_mosaic(['Vaccine.png'], 'tests/model', backend=backend)
+
+        # the symbols are counted after the timed predictions, not within them
+        assert report['mosaic']['symbols_parsed'] > 0
+        assert report['mosaic']['max_latency'] < 0.2 and report['preprocessed']['max_latency'] < 0.2
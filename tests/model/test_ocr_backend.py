@@ -0,0 +1,123 @@
+import asyncio
+import os
+import time
+
+# Standard Dist
+import pytest
+
+# Project Level Imports
+from cvp.model.ocr_backend import *
+from cvp.model.ocr_model import OCR_Model, extract_regions
+from tests.model.test_ocr_model import FakeClient, CARD_WORDS, PDF
+from tests.features.test_ocr_helper import make_document
+
+
+class TestOCRBackend():
+
+    def test_google_vision_backend(self):
+        #=== Trigger Output ===#
+        backend = GoogleVisionBackend(client=FakeClient())
+        responses = backend.annotate([b'card', b'error'])
+
+        assert len(responses) == 2
+        assert responses[0].full_text_annotation == make_document(CARD_WORDS)
+        assert responses[1].error.message == 'Bad image data.'
+
+        with pytest.raises(FileNotFoundError):
+            GoogleVisionBackend('WRONG/PATH')
+
+    def test_google_vision_backend_async(self, monkeypatch):
+        #=== Test Inputs ===#
+        created = []
+
+        class LoopBoundClient(FakeClient):
+            """Stand-in of vision.ImageAnnotatorAsyncClient, failing like grpc.aio on another event loop"""
+
+            def __init__(self):
+                super().__init__()
+                self.loop = asyncio.get_running_loop()
+                created.append(self)
+
+            async def batch_annotate_images(self, requests):
+                assert asyncio.get_running_loop() is self.loop, 'client used on another event loop'
+                return super().batch_annotate_images(requests)
+
+        monkeypatch.setattr(vision, 'ImageAnnotatorAsyncClient', LoopBoundClient)
+        backend = GoogleVisionBackend(client=FakeClient())
+
+        async def annotate_twice():
+            return [await backend.annotate_async([b'card']), await backend.annotate_async([b'card'])]
+
+        #=== Trigger Output ===#
+        for _ in range(2):  # one asyncio.run after the other, Ex: two calls of predict_async
+            for responses in asyncio.run(annotate_twice()):
+                assert responses[0].full_text_annotation == make_document(CARD_WORDS)
+
+        assert len(created) == 2  # one client per event loop
+
+    def test_record_replay(self, tmp_path):
+        #=== Test Inputs ===#
+        record_dir = str(tmp_path / 'recordings')
+        client = FakeClient()
+        recorder = RecordingBackend(GoogleVisionBackend(client=client), record_dir)
+
+        #=== Trigger Output ===#
+        recorded = recorder.annotate([b'card', b'error'])
+
+        assert len(os.listdir(record_dir)) == 2
+        assert os.path.exists(os.path.join(record_dir, image_key(b'card') + RECORD_FILE_EXT))
+
+        replay = ReplayBackend(record_dir, latency=0.2)
+        start = time.perf_counter()
+        replayed = replay.annotate([b'card', b'error', b'unknown'])
+        assert time.perf_counter() - start >= 0.2
+
+        assert len(client.requests) == 1
+        assert replayed[:2] == list(recorded)
+        assert 'No recording' in replayed[2].error.message
+        assert asyncio.run(replay.annotate_async([b'card']))[0] == recorded[0]
+
+        # The whole model runs offline on the replayed responses
+        (tmp_path / 'card.png').write_bytes(b'card')
+        model = OCR_Model(backend=replay)
+        assert model.client is None
+        assert model.predict('card.png', str(tmp_path)) == extract_regions(make_document(CARD_WORDS))
+
+        with pytest.raises(FileNotFoundError):
+            ReplayBackend('WRONG/PATH')
+
+    def test_iter_pages(self, tmp_path):
+        #=== Test Inputs ===#
+        client = FakeClient(total_pages=12)
+        recorder = RecordingBackend(GoogleVisionBackend(client=client), str(tmp_path))
+
+        #=== Trigger Output ===#
+        pages = iter_pages(recorder, PDF)
+
+        assert client.file_requests == []  # nothing is sent before the first page is read
+        assert next(pages).full_text_annotation == make_document(CARD_WORDS)
+        assert client.file_requests == [[]]
+        assert len(list(pages)) == 11
+        assert client.file_requests == [[], [6, 7, 8, 9, 10], [11, 12]]
+
+        replayed = list(iter_pages(ReplayBackend(str(tmp_path)), PDF))
+        assert len(replayed) == 12 and len(client.file_requests) == 3
+
+        responses = list(iter_pages(ReplayBackend(str(tmp_path)), b'%PDF-unknown'))
+        assert len(responses) == 1 and 'No recording' in responses[0].error.message
+
+    def test_create_backend(self, tmp_path, monkeypatch):
+        #=== Test Inputs ===#
+        monkeypatch.setenv('OCR_BACKEND', 'replay')
+        monkeypatch.setenv('OCR_RECORD_DIR', str(tmp_path))
+        monkeypatch.setenv('OCR_REPLAY_LATENCY', '0.5')
+
+        #=== Trigger Output ===#
+        backend = create_backend()
+
+        assert isinstance(backend, ReplayBackend)
+        assert backend.latency == 0.5
+
+        monkeypatch.setenv('OCR_BACKEND', 'WRONG')
+        with pytest.raises(ValueError):
+            create_backend()
@@ -0,0 +1,95 @@
+import os
+import time
+
+# Standard Dist
+import pytest
+
+# Project Level Imports
+from cvp.model.ocr_cache import *
+from tests.features.test_ocr_helper import make_document
+
+CACHE_DIR = 'tests/model/ocr_cache'
+
+
+class TestOCRCache():
+
+    @pytest.fixture
+    def document(self):
+        return make_document([('Kujo', 40, 250), ('Jotaro', 460, 250)])
+
+    def test_image_key(self):
+        #=== Trigger Output ===#
+        key = image_key(b'image')
+
+        assert key == image_key(b'image')
+        assert key != image_key(b'other image')
+        assert len(key) == 64
+
+    def test_memory(self, document):
+        #=== Test Inputs ===#
+        cache = OCRCache(max_size=2)
+        keys = [image_key(bytes([i])) for i in range(3)]
+
+        #=== Trigger Output ===#
+        assert cache.get(keys[0]) is None
+        cache.put(keys[0], document)
+        assert cache.get(keys[0]) == document
+
+        # keys[1] is the least recently used when keys[2] is added
+        cache.put(keys[1], document)
+        cache.get(keys[0])
+        cache.put(keys[2], document)
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[0]) is not None
+
+        stats = cache.stats
+        assert stats['hits'] == stats['memory_hits'] == 3
+        assert stats['misses'] == 2
+        assert stats['size'] == 2
+        assert stats['hit_rate'] == 3 / 5
+
+    def test_ttl(self, document):
+        #=== Test Inputs ===#
+        cache = OCRCache(ttl=1, cache_dir=CACHE_DIR)
+        key = image_key(b'image')
+
+        #=== Trigger Output ===#
+        cache.put(key, document)
+        time.sleep(1.5)
+
+        assert cache.get(key) is None
+        assert not os.path.exists(os.path.join(CACHE_DIR, key + DISK_FILE_EXT))
+
+        # reading a document marks it as recently used but does not extend its ttl, in either tier
+        cache.put(key, document)
+        for _ in range(2):
+            time.sleep(0.3)
+            assert OCRCache(ttl=1, cache_dir=CACHE_DIR).get(key) == document  # from disk
+            assert cache.get(key) == document
+        time.sleep(0.6)
+        assert OCRCache(ttl=1, cache_dir=CACHE_DIR).get(key) is None
+        assert cache.get(key) is None
+        cache.clear()
+
+    def test_disk(self, document):
+        #=== Test Inputs ===#
+        keys = [image_key(bytes([i])) for i in range(3)]
+        cache = OCRCache(cache_dir=CACHE_DIR, disk_max_size=2)
+        cache.clear()
+
+        #=== Trigger Output ===#
+        for key in keys:
+            cache.put(key, document)
+            time.sleep(0.05)
+
+        # A new cache only finds the documents on disk, the oldest one was evicted
+        cache = OCRCache(cache_dir=CACHE_DIR, disk_max_size=2)
+        assert cache.get(keys[0]) is None
+        assert cache.get(keys[2]) == document
+        assert cache.get(keys[2]) == document
+
+        stats = cache.stats
+        assert stats['disk_hits'] == 1 and stats['memory_hits'] == 1 and stats['misses'] == 1
+
+        cache.clear()
+        assert not os.listdir(CACHE_DIR)
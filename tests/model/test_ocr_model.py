@@ -1,4 +1,7 @@
+import asyncio
 import io
+import threading
+import time
 
 # Standard Dist
 import pytest
@@ -7,7 +10,83 @@ import pytest
 import google
 
 # Project Level Imports
-from cvp.model.ocr_model import OCR_Model
+from cvp.model.ocr_model import *
+from tests.features.test_ocr_helper import make_document
+from cvp.model.ocr_cache import OCRCache
+from google.cloud import vision
+
+CARD_WORDS = [('Kujo', 40, 250), ('Jotaro', 460, 250), ('J', 1010, 250)]
+# the fields CARD_WORDS leaves empty
+REST_WORDS = [('01/01/70', 40, 340), ('123', 600, 340), ('Pfizer', 200, 520), ('010121', 615, 520),
+              ('CVS', 820, 560), ('Moderna', 200, 640), ('020121', 615, 640), ('Walgreens', 820, 700)]
+PDF = b'%PDF-1.4 card'
+
+
+class FakeClient():
+    """Local stand-in of vision.ImageAnnotatorClient, answers every image with the same card."""
+
+    def __init__(self, total_pages=12, rest_page=7):
+        self.requests = []
+        self.sent = []
+        self.file_requests = []  # pages of each file annotation request
+        self.total_pages = total_pages
+        self.rest_page = rest_page  # page of the PDF holding REST_WORDS, the first one holds CARD_WORDS
+
+    def batch_annotate_images(self, requests):
+        self.requests.append(len(requests))
+        self.sent.extend(request.image.content for request in requests)
+        responses = []
+        for request in requests:
+            if request.image.content == b'error':
+                responses.append(vision.AnnotateImageResponse(error={'message': 'Bad image data.'}))
+            else:
+                responses.append(vision.AnnotateImageResponse(full_text_annotation=make_document(CARD_WORDS)))
+        return vision.BatchAnnotateImagesResponse(responses=responses)
+
+    def batch_annotate_files(self, requests):
+        pages = list(requests[0].pages) or list(range(1, min(5, self.total_pages) + 1))
+        self.file_requests.append(list(requests[0].pages))
+        responses = []
+        for page in pages:
+            words = CARD_WORDS if page == 1 else REST_WORDS if page == self.rest_page else []
+            responses.append(vision.AnnotateImageResponse(full_text_annotation=make_document(words)))
+        response = vision.AnnotateFileResponse(responses=responses, total_pages=self.total_pages)
+        return vision.BatchAnnotateFilesResponse(responses=[response])
+
+
+class FakeAsyncClient(FakeClient):
+    """Local stand-in of vision.ImageAnnotatorAsyncClient, records the most requests in flight."""
+
+    def __init__(self):
+        super().__init__()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def batch_annotate_images(self, requests):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return super().batch_annotate_images(requests)
+
+
+class CountingFileClient(FakeClient):
+    """FakeClient recording the most file annotation requests in flight, from several threads."""
+
+    def __init__(self):
+        super().__init__(total_pages=3, rest_page=2)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def batch_annotate_files(self, requests):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.01)
+        with self.lock:
+            self.in_flight -= 1
+        return super().batch_annotate_files(requests)
 
 
 class TestOCRModel():
@@ -55,3 +134,216 @@ class TestOCRModel():
         with pytest.raises(Exception):
             info = model.predict(PHOTO, FOLDER_PATH, False)
 
+    def test_extract_regions(self):
+        #=== Test Inputs ===#
+        words = [('Kujo', 40, 250), ('Jotaro', 460, 250), ('J', 1010, 250), ('01', 615, 520), ('/', 635, 520),
+                 ('01', 645, 520), ('/', 665, 520), ('21', 675, 520), ('TKYH', 800, 620), ('Dr.', 850, 620)]
+        document = make_document(words)
+
+        #=== Expected Outputs ===#
+        expected = {
+            'last': 'Kujo',
+            'first': 'Jotaro',
+            'mi': 'J',
+            'dob': '',
+            'ssn': '',
+            'product_1': '',
+            'date_1': '01/01/21',
+            'site_1': 'TKYH Dr.',
+            'product_2': '',
+            'date_2': '',
+            'site_2': 'TKYH Dr.'
+        }
+
+        #=== Trigger Output ===#
+        info = extract_regions(document)
+
+        assert list(info) == list(COORDINATE)
+        assert info == expected
+        assert extract_regions(document, {'name': [0, 0, 1200, 300]}) == {'name': 'Kujo Jotaro J'}
+
+    def test_predict_batch(self, tmp_path):
+        #=== Test Inputs ===#
+        photos = [f'{i}.png' for i in range(5)] + ['error.png', 'missing.png']
+        for i in range(5):
+            (tmp_path / f'{i}.png').write_bytes(bytes([i]))
+        (tmp_path / 'error.png').write_bytes(b'error')
+        client = FakeClient()
+        model = OCR_Model(client=client, cache=OCRCache())
+
+        #=== Trigger Output ===#
+        results = model.predict_batch(photos, str(tmp_path), batch_size=2, max_workers=2)
+
+        assert [result.photo for result in results] == photos
+        assert sorted(client.requests) == [2, 2, 2]
+        for result in results[:5]:
+            assert result.error is None
+            assert result.info['last'] == 'Kujo' and result.info['first'] == 'Jotaro'
+
+        assert results[5].info is None and 'Bad image data.' in str(results[5].error)
+        assert results[6].info is None and isinstance(results[6].error, FileNotFoundError)
+
+        # Cached photos are not sent again
+        results = model.predict_batch(photos[:5], str(tmp_path))
+        assert all(result.error is None for result in results)
+        assert len(client.requests) == 3
+
+    def test_predict_async(self, tmp_path):
+        #=== Test Inputs ===#
+        for i in range(10):
+            (tmp_path / f'{i}.png').write_bytes(bytes([i]))
+        (tmp_path / 'error.png').write_bytes(b'error')
+        async_client = FakeAsyncClient()
+        model = OCR_Model(client=FakeClient(), async_client=async_client, max_in_flight=3)
+
+        async def predict_all():
+            return await asyncio.gather(*[model.predict_async(f'{i}.png', str(tmp_path)) for i in range(10)])
+
+        #=== Trigger Output ===#
+        infos = asyncio.run(predict_all())
+
+        assert len(async_client.requests) == 10
+        assert async_client.max_in_flight == 3
+        for info in infos:
+            assert info == extract_regions(make_document(CARD_WORDS))
+
+        with pytest.raises(FileNotFoundError):
+            asyncio.run(model.predict_async('0.png', 'WRONG/PATH'))
+
+        with pytest.raises(Exception):
+            asyncio.run(model.predict_async('error.png', str(tmp_path)))
+
+    def test_predict_in_memory(self):
+        #=== Test Inputs ===#
+        client = FakeClient()
+        model = OCR_Model(client=client, cache=OCRCache())
+        expected = extract_regions(make_document(CARD_WORDS))
+
+        #=== Trigger Output ===#
+        assert model.predict(b'card') == expected
+        assert model.predict(io.BytesIO(b'card')) == expected
+        assert model.predict(bytearray(b'card')) == expected
+        assert len(client.requests) == 1
+
+        with pytest.raises(Exception):
+            model.predict(io.BytesIO(b'error'))
+
+    def test_preprocess_image(self):
+        #=== Test Inputs ===#
+        with io.open('tests/model/Vaccine.png', 'rb') as image_file:
+            content = image_file.read()
+
+        #=== Trigger Output ===#
+        image = preprocess_image(content)
+        small = preprocess_image(content, max_side=600)
+
+        assert image.scale == 1.0
+        assert image.original_size == len(content)
+        assert 0 < len(image.content) < len(content)
+        assert image.bytes_saved == len(content) - len(image.content)
+        assert small.scale == 600 / 1201
+        assert len(small.content) < len(image.content)
+
+        # Not an image, sent as it is
+        assert preprocess_image(b'%PDF-1.4') == (b'%PDF-1.4', 1.0, 8)
+
+    def test_scale_regions(self):
+        #=== Trigger Output ===#
+        regions = scale_regions(COORDINATE, 0.5)
+
+        assert list(regions) == list(COORDINATE)
+        assert regions['last'] == [16, 106, 225, 154]
+        assert scale_regions(COORDINATE, 1.0) == COORDINATE
+
+    def test_predict_preprocess(self):
+        #=== Test Inputs ===#
+        with io.open('tests/model/Vaccine.png', 'rb') as image_file:
+            content = image_file.read()
+        client = FakeClient()
+        model = OCR_Model(client=client, preprocess=True)
+
+        #=== Trigger Output ===#
+        model.predict(content)
+
+        assert client.requests == [1]
+        assert len(client.sent[0]) == len(preprocess_image(content).content)
+
+    def test_predict_mosaic(self):
+        #=== Test Inputs ===#
+        with io.open('tests/model/Vaccine.png', 'rb') as image_file:
+            content = image_file.read()
+        client = FakeClient()
+        model = OCR_Model(client=client, mosaic=True)
+
+        #=== Trigger Output ===#
+        info = model.predict(content)
+
+        mosaic = build_mosaic(content, COORDINATE)
+        assert client.sent == [mosaic.content]
+        assert len(client.sent[0]) < len(content)
+        assert set(info) == set(COORDINATE)
+
+        # Not an image Pillow can decode, sent as is
+        model.predict(b'not an image')
+        assert client.sent[-1] == b'not an image'
+
+    def test_predict_mosaic_template(self):
+        #=== Test Inputs ===#
+        image = Image.open('tests/model/Vaccine.png')
+        output = io.BytesIO()
+        image.resize((image.width * 2, image.height * 2)).save(output, format='PNG')  # twice the reference scan
+        content = output.getvalue()
+        client = FakeClient()
+        registry = default_registry()
+        model = OCR_Model(client=client, mosaic=True, preprocess=True, templates=registry)
+
+        #=== Trigger Output ===#
+        model.predict(content)
+
+        # same boxes as without a mosaic: the template scaled to the image, then to the preprocessed image
+        preprocessed = preprocess_image(content)
+        regions = registry[registry.default].regions(image.width * 2, image.height * 2)
+        assert client.sent == [build_mosaic(preprocessed.content, scale_regions(regions, preprocessed.scale)).content]
+
+    def test_predict_pdf(self):
+        #=== Test Inputs ===#
+        client = FakeClient(total_pages=12, rest_page=7)
+        model = OCR_Model(client=client)
+
+        #=== Trigger Output ===#
+        info = model.predict(io.BytesIO(PDF))
+
+        # every field is filled by page 7, pages 11 and 12 are never sent
+        assert client.file_requests == [[], [6, 7, 8, 9, 10]]
+        assert client.sent == []
+        assert info == extract_regions(make_document(CARD_WORDS + REST_WORDS))
+        assert info['date_1'] == '01/01/21' and info['site_2'] == 'Walgreens'
+
+        # the fields never found are empty once every page is read
+        client = FakeClient(total_pages=3, rest_page=4)
+        info = OCR_Model(client=client).predict_pdf(PDF)
+        assert client.file_requests == [[]]
+        assert info['last'] == 'Kujo' and info['ssn'] == ''
+
+        assert asyncio.run(OCR_Model(client=FakeClient()).predict_async(PDF)) == model.predict(PDF)
+        assert is_pdf(b'\n%PDF-1.7') and not is_pdf(b'card')
+
+    def test_predict_pdf_in_flight(self):
+        #=== Test Inputs ===#
+        client = CountingFileClient()
+        model = OCR_Model(client=client, max_in_flight=2)
+        expected = model.predict_pdf(PDF)
+        client.max_in_flight = 0
+
+        async def predict_all():
+            return await asyncio.gather(*[model.predict_async(PDF) for _ in range(8)])
+
+        #=== Trigger Output ===#
+        assert asyncio.run(predict_all()) == [expected] * 8
+        assert client.max_in_flight == 2
+
+        client.max_in_flight = 0
+        results = model.predict_batch([PDF] * 6 + [b'error'], max_workers=3)
+        assert [result.info for result in results[:6]] == [expected] * 6
+        assert results[6].info is None and 'Bad image data.' in str(results[6].error)
+        assert client.max_in_flight <= 3
@@ -0,0 +1,83 @@
+# Standard Dist
+import pytest
+
+# Project Level Imports
+from cvp.model.templates import *
+from cvp.model.ocr_model import OCR_Model, COORDINATE
+from cvp.model.ocr_backend import GoogleVisionBackend
+from tests.features.test_ocr_helper import make_document
+from google.cloud import vision
+
+STATE_FIELDS = {'name': [0, 0, 600, 100], 'date': [600, 0, 1201, 100]}
+STATE_TEMPLATE = CardTemplate('state', ('Immunization', 'Department', 'Health'), STATE_FIELDS)
+
+
+class StateCardClient():
+    """Local stand-in of vision.ImageAnnotatorClient, answers every image with a card of the state layout."""
+
+    def batch_annotate_images(self, requests):
+        words = [('Department', 20, 850), ('of', 130, 850), ('Health', 160, 850), ('IMMUNIZATION', 20, 880),
+                 ('Kujo', 40, 40), ('01/02/21', 640, 40)]
+        responses = [vision.AnnotateImageResponse(full_text_annotation=make_document(words)) for _ in requests]
+        return vision.BatchAnnotateImagesResponse(responses=responses)
+
+
+class TestTemplates():
+
+    def test_card_template(self):
+        #=== Test Inputs ===#
+        template = CardTemplate('half', ('A', 'a', 'B'), {'field': [100, 100, 200, 300]}, size=(1000, 1000))
+
+        assert template.anchors == ('a', 'b')
+        assert template.regions() == {'field': [100, 100, 200, 300]}
+        assert template.regions(1000, 1000) == {'field': [100, 100, 200, 300]}
+        assert template.regions(500, 2000) == {'field': [50, 200, 100, 600]}
+        assert template.regions(999, 1001) == {'field': [99, 100, 200, 301]}  # rounded outward
+
+        # regions are measured on REFERENCE_SIZE and scaled to the page, not absolute pixels
+        reference = CardTemplate('reference', ('a',), {'field': [120, 90, 240, 180]})
+        assert reference.size == REFERENCE_SIZE
+        assert reference.regions(*REFERENCE_SIZE) == {'field': [120, 90, 240, 180]}
+        assert reference.regions(REFERENCE_SIZE[0] * 2, REFERENCE_SIZE[1] * 2) == {'field': [240, 180, 480, 360]}
+
+        with pytest.raises(ValueError):
+            CardTemplate('empty', (), {})
+
+    def test_classify(self):
+        #=== Test Inputs ===#
+        registry = default_registry()
+        registry.register(STATE_TEMPLATE)
+        for i in range(50):  # templates sharing no anchor with the documents do not change the result
+            registry.register(CardTemplate(f'other_{i}', (f'anchor_{i}', f'word_{i}'), STATE_FIELDS))
+
+        cdc = make_document([('COVID-19', 0, 0), ('Vaccination', 100, 0), ('Record', 300, 0), ('Card', 400, 0),
+                             ('Patient', 0, 100), ('Vaccine', 0, 400), ('Manufacturer', 200, 400)])
+        state = make_document([('Department', 0, 0), ('of', 110, 0), ('health', 140, 0), ('Record', 0, 100)])
+        unknown = make_document([('Library', 0, 0), ('Card', 100, 0)])
+
+        #=== Trigger Output ===#
+        assert registry.classify(cdc) is CDC_TEMPLATE
+        assert registry.classify(state) is STATE_TEMPLATE
+        assert registry.classify(unknown) is None
+        assert registry.scores(unknown) == {'cdc': 1 / len(CDC_ANCHORS)}
+
+        # unknown layouts fall back to the default template
+        assert registry.regions(unknown) == CDC_FIELDS
+        assert registry.regions(state) == STATE_FIELDS
+        assert registry.regions(vision.TextAnnotation()) == CDC_FIELDS
+
+        with pytest.raises(ValueError):
+            registry.register(STATE_TEMPLATE)
+
+    def test_predict_templates(self):
+        #=== Test Inputs ===#
+        registry = TemplateRegistry([CDC_TEMPLATE, STATE_TEMPLATE])
+        model = OCR_Model(backend=GoogleVisionBackend(client=StateCardClient()), templates=registry)
+
+        #=== Trigger Output ===#
+        info = model.predict(b'card')
+        results = model.predict_batch([b'card'])
+
+        assert info == {'name': 'Kujo', 'date': '01/02/21'}
+        assert results[0].info == info
+        assert COORDINATE == CDC_FIELDS